@@ -4,12 +4,25 @@ Main application entry point
 """
 
 import os
+import time
+import secrets
+import urllib.parse
 import multiprocessing
 import streamlit as st
 import pandas as pd
 
-from video_processor import VideoProcessor
-from charts import create_comparison_chart, create_speedup_visualization, create_segment_timeline
+from scheduler import get_scheduler, PRIORITIES
+from video_processor import DEFAULT_SEGMENT_TIMEOUT
+from file_server import get_file_server
+from broker import get_broker
+from render_jobs import (
+    JOBS_DIR, ACTIVE_STATUSES, create_render_job, save_upload, save_effect_file, start_render_job,
+    get_job, list_jobs, recover_interrupted_jobs, can_resume, resume_render_job
+)
+from charts import (
+    create_comparison_chart, create_speedup_visualization, create_segment_timeline,
+    create_worker_timeline
+)
 from styles import get_custom_css
 
 
@@ -40,29 +53,221 @@ def render_header():
     st.markdown("---")
 
 
+def render_effect_settings():
+    """
+    Render effect chain selection and per-effect parameters
+    
+    Returns:
+        tuple: (effect specs in the selected order (see effects.EffectChain), uploaded
+            overlay image or None); the overlay spec gets its image path once the
+            upload is stored with the job (see render_jobs.save_effect_file)
+    """
+    selected = st.multiselect(
+        "Effect Chain",
+        ["grayscale", "resize", "crop", "blur", "lut", "denoise", "overlay"],
+        default=["grayscale"],
+        help="Effects are applied in the order selected, all in one decode/encode pass"
+    )
+    
+    specs = []
+    overlay_image = None
+    for name in selected:
+        if name == "resize":
+            height = st.selectbox("Resize height", [1080, 720, 480, 360], index=2)
+            specs.append({'name': 'resize', 'height': height})
+        elif name == "crop":
+            crop_col1, crop_col2 = st.columns(2)
+            with crop_col1:
+                x = st.number_input("Crop x", min_value=0, value=0, step=2)
+                width = st.number_input("Crop width (0 = full)", min_value=0, value=0, step=2)
+            with crop_col2:
+                y = st.number_input("Crop y", min_value=0, value=0, step=2)
+                height = st.number_input("Crop height (0 = full)", min_value=0, value=0, step=2)
+            specs.append({'name': 'crop', 'x': x, 'y': y, 'width': width or None, 'height': height or None})
+        elif name == "blur":
+            specs.append({'name': 'blur', 'radius': st.slider("Blur radius", 1, 10, 2)})
+        elif name == "lut":
+            specs.append({
+                'name': 'lut',
+                'gamma': st.slider("Gamma", 0.3, 3.0, 1.0, 0.1),
+                'contrast': st.slider("Contrast", 0.5, 2.0, 1.0, 0.1),
+                'invert': st.checkbox("Invert colors")
+            })
+        elif name == "denoise":
+            specs.append({'name': 'denoise', 'strength': st.slider("Denoise strength", 0.0, 0.9, 0.5, 0.1)})
+        elif name == "overlay":
+            overlay_image = st.file_uploader(
+                "Overlay image", type=["png"], help="PNG with transparency, drawn bottom-right"
+            )
+            if overlay_image is not None:
+                specs.append({'name': 'overlay'})
+        else:
+            specs.append({'name': name})
+    
+    return specs, overlay_image
+
+
 def render_sidebar():
     """
     Render sidebar with settings and info
     
     Returns:
-        int: Selected segment duration
+        dict: Selected settings (segment_duration, split_mode, effects, output_height,
+            encoder_profile, grayscale_engine, pipeline, distributed, baseline,
+            compare_frame_pipeline, priority, segment_timeout, use_cache), plus the
+            uploaded overlay_image, which is stored with the job rather than in its settings
     """
     with st.sidebar:
         st.markdown("## ⚙️ SETTINGS")
         st.markdown("---")
         
+        auto_segments = st.checkbox(
+            "Auto segment sizing",
+            value=True,
+            help="Pick segment sizes from duration, resolution, keyframe spacing and core count"
+        )
+        
         segment_duration = st.slider(
             "Segment Duration (seconds)",
             min_value=1,
             max_value=30,
             value=10,
-            help="Duration of each video segment"
+            help="Duration of each video segment",
+            disabled=auto_segments
+        )
+        if auto_segments:
+            segment_duration = "auto"
+        
+        split_label = st.selectbox(
+            "Split Mode",
+            ["Keyframe (stream copy)", "Re-encode (exact)", "Direct (no segment files)"],
+            help="Stream copy snaps cuts to the nearest keyframe and skips re-encoding; "
+                 "direct mode lets each worker seek into the source and skips the split stage"
+        )
+        split_mode = {
+            "Keyframe (stream copy)": "keyframe",
+            "Re-encode (exact)": "reencode",
+            "Direct (no segment files)": "direct"
+        }[split_label]
+        
+        effects, overlay_image = render_effect_settings()
+        
+        resolution_label = st.selectbox(
+            "Output Resolution",
+            ["Source", "1080p", "720p", "480p"],
+            help="Downscaled outputs are scaled first, while decoding, so effects and the "
+                 "encoder only see the smaller frames"
+        )
+        output_height = None if resolution_label == "Source" else int(resolution_label[:-1])
+        
+        encoder_profile = st.selectbox(
+            "Encoder Profile",
+            ["standard", "preview", "archival", "fast-intermediate"],
+            help="x264 preset and CRF for the rendered video: preview is fast and small, "
+                 "archival is slow and high quality. Encoder threads are shared out so all "
+                 "parallel workers together use one thread per core"
+        )
+        
+        engine_label = st.selectbox(
+            "Grayscale Engine",
+            ["NumPy (batched fixed-point)", "MoviePy (BlackAndWhite)"],
+            help="The NumPy kernel converts batches of frames in place with integer math; "
+                 "MoviePy is only used when grayscale is the whole chain"
+        )
+        grayscale_engine = "numpy" if engine_label.startswith("NumPy") else "moviepy"
+        
+        pipeline_label = st.selectbox(
+            "Pipeline",
+            ["Streaming (overlap stages)", "Staged (one stage at a time)"],
+            help="Streaming hands each segment to a worker as soon as it is split and "
+                 "stitches processed segments in order as they arrive; staged waits for "
+                 "each stage to finish before starting the next"
+        )
+        pipeline = "streaming" if pipeline_label.startswith("Streaming") else "staged"
+        
+        distributed = st.checkbox(
+            "Render on remote workers",
+            value=False,
+            disabled=split_mode == "direct",
+            help="Hand processed segments to render workers on other hosts through the broker "
+                 "(start them with `python render_worker.py <host>:<port>`); splitting and "
+                 "stitching stay on this machine. Needs written segments, so not direct mode"
+        ) and split_mode != "direct"
+        
+        baseline_label = st.selectbox(
+            "Sequential Baseline",
+            ["Full run", "Sampled estimate", "Skip"],
+            help="The baseline only feeds the speedup comparison: a full run roughly doubles "
+                 "the job time, a sampled estimate times a few segments spread over the video "
+                 "and extrapolates with a 95% confidence interval"
+        )
+        baseline = {
+            "Full run": "full",
+            "Sampled estimate": "sampled",
+            "Skip": "skip"
+        }[baseline_label]
+        
+        compare_frame_pipeline = st.checkbox(
+            "Compare frame pipeline",
+            value=False,
+            help="Also render with the shared-memory decode/effect/encode frame pipeline "
+                 "and compare its throughput with segment-level parallel processing "
+                 "(skipped for chains with temporal effects such as denoise)"
+        )
+        
+        priority_label = st.selectbox(
+            "Job Priority",
+            ["Normal", "High", "Low"],
+            help="Segments from higher-priority jobs are scheduled first when several "
+                 "renders share the machine"
+        )
+        
+        segment_timeout = st.number_input(
+            "Segment Timeout (seconds)",
+            min_value=0,
+            value=DEFAULT_SEGMENT_TIMEOUT,
+            step=60,
+            help="Minimum time one attempt at a segment may run before it is stopped and "
+                 "retried; longer, larger and slower-profile segments get proportionally "
+                 "more. 0 disables the limit"
+        )
+        
+        use_cache = st.checkbox(
+            "Reuse cached results",
+            value=True,
+            help="Serve processed segments and final outputs rendered before with the same "
+                 "input and settings from an on-disk cache"
         )
         
         st.markdown("---")
         st.markdown("### 💻 SYSTEM INFO")
         cpu_cores = multiprocessing.cpu_count()
         st.metric("CPU Cores", cpu_cores)
+        scheduler_status = get_scheduler().status()
+        st.metric("Warm Workers", scheduler_status['workers'])
+        st.caption(
+            f"Scheduler: {scheduler_status['running']} running, "
+            f"{scheduler_status['queued']} queued across {scheduler_status['jobs']} jobs · "
+            f"{scheduler_status['retried']} retried, {scheduler_status['timed_out']} timed out, "
+            f"{scheduler_status['lost']} lost, {scheduler_status['speculated']} speculative "
+            f"({scheduler_status['cancelled']} cancelled)"
+        )
+        if distributed:
+            try:
+                broker_status = get_broker().status()
+                st.caption(
+                    f"Broker {broker_status['address']}: {broker_status['workers']} workers "
+                    f"({broker_status['slots']} slots), {broker_status['running']} leased, "
+                    f"{broker_status['queued']} queued · {broker_status['retried']} retried, "
+                    f"{broker_status['lost']} lost"
+                )
+                if not broker_status['workers']:
+                    st.warning(
+                        "⚠️ No render workers connected. Jobs fail until one is started with "
+                        f"`python render_worker.py {broker_status['address']}`"
+                    )
+            except RuntimeError as e:
+                st.error(f"❌ {e}")
         
         st.markdown("---")
         st.markdown("### 📊 FEATURES")
@@ -71,10 +276,25 @@ def render_sidebar():
         • Sequential processing  
         • Parallel processing  
         • Performance comparison  
-        • Grayscale conversion  
+        • Effect chains (grayscale, resize, blur, ...)  
         """)
     
-    return segment_duration
+    return {
+        'segment_duration': segment_duration,
+        'split_mode': split_mode,
+        'effects': effects,
+        'output_height': output_height,
+        'encoder_profile': encoder_profile,
+        'grayscale_engine': grayscale_engine,
+        'pipeline': pipeline,
+        'distributed': distributed,
+        'baseline': baseline,
+        'compare_frame_pipeline': compare_frame_pipeline,
+        'priority': PRIORITIES[priority_label.lower()],
+        'segment_timeout': segment_timeout,
+        'use_cache': use_cache,
+        'overlay_image': overlay_image
+    }
 
 
 def render_file_upload():
@@ -105,7 +325,29 @@ def render_file_upload():
     return uploaded_file
 
 
-def render_performance_metrics(seq_time, par_time, workers, num_segments):
+def format_seq_time(seq_time, seq_estimate=None):
+    """
+    Format the sequential time, marking sampled estimates and their confidence interval
+    
+    Args:
+        seq_time (float): Sequential processing time (measured or estimated)
+        seq_estimate (dict): Optional sampled estimate (see baseline.extrapolate)
+        
+    Returns:
+        str: Formatted time
+    """
+    if not seq_estimate:
+        return f'{seq_time:.2f}s'
+    if seq_estimate['low'] is None:
+        return f'~{seq_time:.2f}s (est.)'
+    confidence = int(seq_estimate['confidence'] * 100)
+    return (
+        f"~{seq_time:.2f}s (est., {confidence}% CI "
+        f"{seq_estimate['low']:.2f}-{seq_estimate['high']:.2f}s)"
+    )
+
+
+def render_performance_metrics(seq_time, par_time, workers, num_segments, seq_estimate=None):
     """
     Render performance metrics section
     
@@ -114,6 +356,7 @@ def render_performance_metrics(seq_time, par_time, workers, num_segments):
         par_time (float): Parallel processing time
         workers (int): Number of CPU workers used
         num_segments (int): Number of video segments
+        seq_estimate (dict): Optional sampled estimate when seq_time is extrapolated
     """
     speedup = seq_time / par_time if par_time > 0 else 0
     time_saved = seq_time - par_time
@@ -123,13 +366,24 @@ def render_performance_metrics(seq_time, par_time, workers, num_segments):
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("SEQUENTIAL TIME", f"{seq_time:.2f}s")
+        if seq_estimate:
+            st.metric(
+                "SEQUENTIAL TIME (EST.)", f"~{seq_time:.2f}s",
+                help=f"Extrapolated from {seq_estimate['sampled']} of {seq_estimate['segments']} "
+                     f"segments: {format_seq_time(seq_time, seq_estimate)}"
+            )
+        else:
+            st.metric("SEQUENTIAL TIME", f"{seq_time:.2f}s")
     
     with col2:
         st.metric("PARALLEL TIME", f"{par_time:.2f}s", delta=f"-{time_saved:.2f}s")
     
     with col3:
-        st.metric("SPEEDUP FACTOR", f"{speedup:.2f}x", delta=f"{percent_faster:.1f}% faster")
+        st.metric(
+            "SPEEDUP FACTOR (EST.)" if seq_estimate else "SPEEDUP FACTOR",
+            f"{speedup:.2f}x",
+            delta=f"{percent_faster:.1f}% faster"
+        )
     
     with col4:
         st.metric("SEGMENTS", num_segments)
@@ -152,7 +406,7 @@ def render_performance_metrics(seq_time, par_time, workers, num_segments):
         st.metric("TOTAL SEGMENTS", f"{num_segments}")
 
 
-def render_performance_charts(seq_time, par_time, speedup):
+def render_performance_charts(seq_time, par_time, speedup, seq_estimate=None):
     """
     Render performance visualization charts
     
@@ -160,6 +414,7 @@ def render_performance_charts(seq_time, par_time, speedup):
         seq_time (float): Sequential processing time
         par_time (float): Parallel processing time
         speedup (float): Speedup factor
+        seq_estimate (dict): Optional sampled estimate when seq_time is extrapolated
     """
     st.markdown("---")
     
@@ -167,14 +422,16 @@ def render_performance_charts(seq_time, par_time, speedup):
     
     with chart_col1:
         st.markdown("### PROCESSING TIME COMPARISON")
-        st.plotly_chart(create_comparison_chart(seq_time, par_time), use_container_width=True)
+        st.plotly_chart(create_comparison_chart(seq_time, par_time, seq_estimate),
+                        use_container_width=True)
     
     with chart_col2:
         st.markdown("### TIME DISTRIBUTION")
-        st.plotly_chart(create_speedup_visualization(speedup), use_container_width=True)
+        st.plotly_chart(create_speedup_visualization(speedup, bool(seq_estimate)),
+                        use_container_width=True)
 
 
-def render_performance_table(seq_time, par_time, workers, num_segments, speedup):
+def render_performance_table(seq_time, par_time, workers, num_segments, speedup, seq_estimate=None):
     """
     Render detailed performance statistics table
     
@@ -184,9 +441,16 @@ def render_performance_table(seq_time, par_time, workers, num_segments, speedup)
         workers (int): Number of workers used
         num_segments (int): Number of segments
         speedup (float): Speedup factor
+        seq_estimate (dict): Optional sampled estimate when seq_time is extrapolated
     """
     st.markdown("### 📈 DETAILED STATISTICS")
     
+    seq_column = 'Sequential (estimated)' if seq_estimate else 'Sequential'
+    seq_method = 'One by One'
+    if seq_estimate:
+        seq_method = f"Sampled {seq_estimate['sampled']} of {seq_estimate['segments']} segments"
+    estimate_mark = '~' if seq_estimate else ''
+    
     perf_data = {
         'Metric': [
             'Processing Method',
@@ -195,10 +459,10 @@ def render_performance_table(seq_time, par_time, workers, num_segments, speedup)
             'CPU Cores Used',
             'Efficiency'
         ],
-        'Sequential': [
-            'One by One',
-            f'{seq_time:.2f}s',
-            f'{seq_time/num_segments:.2f}s',
+        seq_column: [
+            seq_method,
+            format_seq_time(seq_time, seq_estimate),
+            f'{estimate_mark}{seq_time/num_segments:.2f}s',
             '1',
             '100%'
         ],
@@ -207,7 +471,7 @@ def render_performance_table(seq_time, par_time, workers, num_segments, speedup)
             f'{par_time:.2f}s',
             f'{par_time/num_segments:.2f}s',
             str(workers),
-            f'{(speedup/workers)*100:.1f}%'
+            f'{estimate_mark}{(speedup/workers)*100:.1f}%'
         ]
     }
     
@@ -215,6 +479,23 @@ def render_performance_table(seq_time, par_time, workers, num_segments, speedup)
     st.dataframe(df, use_container_width=True, hide_index=True)
 
 
+def browser_host():
+    """
+    Get the host name the current browser reached the app on
+    
+    Returns:
+        str: Host name from the request's Host header, or None if unknown
+    """
+    try:
+        headers = st.context.headers
+    except AttributeError:
+        # Streamlit before 1.37 only exposes the headers through this helper
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        headers = _get_websocket_headers()
+    host = (headers or {}).get("Host")
+    return urllib.parse.urlsplit(f"//{host}").hostname if host else None
+
+
 def render_output_preview(duration, final_output):
     """
     Render output preview and download section
@@ -234,26 +515,37 @@ def render_output_preview(duration, final_output):
             <div style='text-align: center; padding: 40px; background: rgba(0,20,0,0.3); 
                         border: 1px solid rgba(0,255,0,0.15); border-radius: 12px;'>
                 <div style='font-size: 3rem; margin-bottom: 10px;'>📹</div>
-                <p style='color: #888; font-size: 0.9rem;'>output/final_rendered.mp4</p>
+                <p style='color: #888; font-size: 0.9rem;'>{os.path.basename(final_output)}</p>
                 <p style='color: #666; font-size: 0.8rem;'>Duration: {duration:.2f}s</p>
             </div>
             """, unsafe_allow_html=True)
     
     with download_col2:
         if os.path.exists(final_output):
-            with open(final_output, "rb") as file:
-                st.download_button(
-                    label="⬇️ DOWNLOAD PROCESSED VIDEO",
-                    data=file,
-                    file_name="processed_video.mp4",
-                    mime="video/mp4",
-                    use_container_width=True
+            file_server = get_file_server()
+            host = browser_host()
+            if not file_server.reachable_from(host):
+                # Sending the video through Streamlit would buffer the whole file in the
+                # server, which is what the endpoint exists to avoid
+                st.warning(
+                    f"⚠️ The download endpoint only listens on {file_server.host}, which this "
+                    "browser cannot reach. Set RENDER_FILE_HOST to an interface it can reach "
+                    "(or RENDER_FILE_URL behind a proxy) and restart the app."
                 )
+                return
+            
+            # Served by the range-request endpoint under a random token, so neither
+            # the download nor the seeking preview is buffered in the Streamlit server
+            st.link_button(
+                "⬇️ DOWNLOAD PROCESSED VIDEO",
+                file_server.url_for(final_output, download=True, browser_host=host),
+                use_container_width=True
+            )
             st.markdown("<br>", unsafe_allow_html=True)
-            st.button("▶️ PREVIEW OUTPUT", use_container_width=True, disabled=True)
+            st.video(file_server.url_for(final_output, browser_host=host))
 
 
-def render_performance_insights(speedup, time_saved, percent_faster):
+def render_performance_insights(speedup, time_saved, percent_faster, estimated=False):
     """
     Render performance insights and interpretation
     
@@ -261,10 +553,14 @@ def render_performance_insights(speedup, time_saved, percent_faster):
         speedup (float): Speedup factor
         time_saved (float): Time saved in seconds
         percent_faster (float): Percentage improvement
+        estimated (bool): The sequential baseline was extrapolated from a sample
     """
     st.markdown("---")
     st.markdown("### 💡 PERFORMANCE INSIGHTS")
     
+    if estimated:
+        st.caption("Figures below compare against an estimated sequential baseline.")
+    
     if speedup > 1.5:
         st.success(f"""
         🎉 **Excellent Performance!**
@@ -352,100 +648,285 @@ def render_landing_page():
         """, unsafe_allow_html=True)
 
 
+STAGE_TITLES = {
+    'split': "### 🔪 STEP 1: SPLITTING VIDEO",
+    'sequential': "### ⏳ STEP 2: SEQUENTIAL PROCESSING",
+    'parallel': "### ⚡ STEP 3: PARALLEL PROCESSING",
+    'frame_pipeline': "### 🧵 STEP 3B: SHARED-MEMORY FRAME PIPELINE",
+    'stitch': "### 🔗 STEP 4: STITCHING FINAL VIDEO"
+}
+
+# Streaming jobs run split, parallel and stitch together, then the comparisons
+STREAMING_STAGE_TITLES = {
+    'split': "### 🔪 STEP 1: SPLITTING VIDEO",
+    'parallel': "### ⚡ STEP 1: PARALLEL PROCESSING (as segments are split)",
+    'stitch': "### 🔗 STEP 1: STITCHING (as segments are processed)",
+    'sequential': "### ⏳ STEP 2: SEQUENTIAL PROCESSING",
+    'frame_pipeline': "### 🧵 STEP 3: SHARED-MEMORY FRAME PIPELINE"
+}
+
+
+@st.cache_resource
+def recover_jobs_once():
+    """
+    Mark jobs orphaned by a previous server process as interrupted (once per process)
+    
+    Returns:
+        int: Number of jobs marked interrupted
+    """
+    return recover_interrupted_jobs()
+
+
+def session_owner():
+    """
+    Get the token that identifies this browser's jobs
+    
+    The token is kept in the URL next to the job id so it survives refreshes.
+    Jobs created with another token are neither listed nor reattached.
+    
+    Returns:
+        str: Owner token
+    """
+    owner = st.session_state.get('owner') or st.query_params.get('owner')
+    if not owner:
+        owner = secrets.token_urlsafe(16)
+    st.session_state['owner'] = owner
+    st.query_params['owner'] = owner
+    return owner
+
+
+def render_job_list(current_job_id, owner):
+    """
+    Render this browser's recent jobs in the sidebar so any of them can be reattached
+    
+    Args:
+        current_job_id (str): Job currently shown, or None
+        owner (str): Owner token from session_owner
+    """
+    jobs = list_jobs(owner, limit=10)
+    if not jobs:
+        return
+    
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### 🗂️ RENDER JOBS")
+        for job in jobs:
+            label = f"{job['input_name']} · {job['status']}"
+            if st.button(label, key=f"job_{job['id']}", use_container_width=True,
+                         disabled=job['id'] == current_job_id):
+                st.query_params['job'] = job['id']
+                st.rerun()
+
+
+def render_job_progress(job):
+    """
+    Render the persisted per-stage progress of a job
+    
+    Args:
+        job (dict): Job from render_jobs.get_job
+    """
+    st.markdown("---")
+    st.markdown(f"### 🎞️ JOB `{job['id']}` — {job['input_name']}")
+    
+    progress = job['progress'] or {}
+    streaming = job['settings'].get('pipeline') == 'streaming'
+    titles = STREAMING_STAGE_TITLES if streaming else STAGE_TITLES
+    for stage, title in titles.items():
+        if stage in progress:
+            st.markdown(title)
+            st.progress(min(1.0, progress[stage]))
+    
+    queues = job.get('queues')
+    if queues and job['status'] in ACTIVE_STATUSES:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("TO SPLIT", queues['split'])
+        with col2:
+            st.metric("WAITING FOR WORKERS", queues['parallel'])
+        with col3:
+            st.metric("WAITING TO STITCH", queues['stitch'])
+
+
+def render_job_results(job):
+    """
+    Render analytics and the output preview of a finished job
+    
+    Args:
+        job (dict): Finished job from render_jobs.get_job
+    """
+    result = job['result']
+    final_output = job['output_path']
+    
+    if result.get('cached'):
+        st.success("♻️ Cache hit: this video was already rendered with these settings")
+        render_output_preview(result['duration'], final_output)
+        return
+    
+    segments = result['segments']
+    seq_time = result['seq_time']
+    par_time = result['par_time']
+    workers = result['workers']
+    seq_estimate = result.get('seq_estimate')
+    
+    st.success(f"✅ Split into {segments} segments ({result['duration']:.2f}s total)")
+    resumed = result.get('resumed')
+    if resumed:
+        st.info(
+            f"🔁 Resumed: reused {resumed['split']} split and {resumed['processed']} processed "
+            f"segments of {segments} from the earlier run; timings only cover the redone work, "
+            f"so the baseline and comparisons were skipped"
+        )
+    st.plotly_chart(create_segment_timeline(segments), use_container_width=True)
+    if seq_time is None:
+        st.info("⏭️ Sequential baseline skipped")
+    elif seq_estimate:
+        st.success(
+            f"✅ Sequential time estimated from {seq_estimate['sampled']} of {segments} segments: "
+            f"{format_seq_time(seq_time, seq_estimate)}"
+        )
+    else:
+        st.success(f"✅ Sequential processing completed in {seq_time:.2f}s")
+    st.success(f"✅ Parallel processing completed in {par_time:.2f}s using {workers} cores")
+    if job['settings']['use_cache']:
+        st.caption(f"♻️ Cache hits: {result['cache_hits']}/{segments} segments")
+    st.plotly_chart(create_worker_timeline(result['segment_stats']), use_container_width=True)
+    
+    if 'frame_time' in result:
+        st.success(
+            f"✅ Frame pipeline completed in {result['frame_time']:.2f}s "
+            f"({result['frame_fps']:.1f} frames/s, {result['frame_workers']} effect workers) "
+            f"vs {par_time:.2f}s for segment-level parallel processing"
+        )
+    
+    if result['stitch_method'] == "concat":
+        st.success("✅ Final video created! (lossless concat, no re-encode)")
+    else:
+        st.success("✅ Final video created!")
+    
+    if 'pipeline_time' in result:
+        stage_times = result['stage_times']
+        st.success(
+            f"✅ Streamed split → process → stitch in {result['pipeline_time']:.2f}s; "
+            f"run one after another the stages would take {sum(stage_times.values()):.2f}s "
+            f"(split {stage_times['split']:.2f}s + process {stage_times['parallel']:.2f}s "
+            f"+ stitch {stage_times['stitch']:.2f}s)"
+        )
+        peaks = result['queue_peaks']
+        st.caption(
+            f"Deepest queues: {peaks['split']} to split, {peaks['parallel']} waiting for "
+            f"workers, {peaks['stitch']} waiting to stitch"
+        )
+    
+    # Performance Analytics
+    st.markdown("---")
+    st.markdown("## 📊 PERFORMANCE ANALYTICS")
+    st.markdown(
+        "<p style='color: #888888; margin-top: -10px;'>"
+        "Detailed metrics from the parallel rendering pipeline</p>",
+        unsafe_allow_html=True
+    )
+    
+    # Without a baseline there is nothing to compare against
+    if seq_time is None:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("PARALLEL TIME", f"{par_time:.2f}s")
+        with col2:
+            st.metric("CPU CORES", f"{workers}")
+        with col3:
+            st.metric("SEGMENTS", segments)
+        render_output_preview(result['duration'], final_output)
+        return
+    
+    # Calculate metrics
+    speedup = seq_time / par_time if par_time > 0 else 0
+    time_saved = seq_time - par_time
+    percent_faster = (time_saved / seq_time * 100) if seq_time > 0 else 0
+    
+    # Render all sections
+    render_performance_metrics(seq_time, par_time, workers, segments, seq_estimate)
+    render_performance_charts(seq_time, par_time, speedup, seq_estimate)
+    render_performance_table(seq_time, par_time, workers, segments, speedup, seq_estimate)
+    render_output_preview(result['duration'], final_output)
+    render_performance_insights(speedup, time_saved, percent_faster, bool(seq_estimate))
+
+
+def render_job(job_id, owner):
+    """
+    Render a background job, polling until it finishes
+    
+    Args:
+        job_id (str): Job id
+        owner (str): Owner token from session_owner; other owners' jobs are not shown
+    """
+    job = get_job(job_id, owner=owner)
+    if job is None:
+        st.warning(f"Job `{job_id}` was not found")
+        return
+    
+    render_job_progress(job)
+    
+    if job['status'] in ACTIVE_STATUSES:
+        st.info("⏳ Rendering in the background — you can refresh or leave this page and come back")
+        time.sleep(1)
+        st.rerun()
+    elif job['status'] == 'done':
+        render_job_results(job)
+    elif job['status'] == 'interrupted':
+        st.warning(f"⚠️ Job was interrupted: {job['error']}")
+    elif job['status'] == 'failed':
+        # The first line names the failure (e.g. which segment gave up and why);
+        # the traceback is only there for debugging
+        summary, _, details = job['error'].partition("\n")
+        st.error(f"❌ Error during processing: {summary}")
+        if details.strip():
+            with st.expander("Details"):
+                st.code(details)
+    
+    if can_resume(job):
+        if st.button("🔁 RESUME", key=f"resume_{job_id}",
+                     help="Render again, reusing every segment that was already split or "
+                          "processed and still matches its checksum"):
+            resume_render_job(job_id)
+            st.rerun()
+
+
 def main():
     """Main application function"""
+    # Start the shared scheduler and its worker pool on first page load so the
+    # first job does not pay for it
+    get_scheduler()
+    recover_jobs_once()
+    
     render_header()
     
-    segment_duration = render_sidebar()
+    owner = session_owner()
+    settings = render_sidebar()
     uploaded_file = render_file_upload()
     
     if uploaded_file is not None:
-        # Save uploaded file
-        video_path = f"temp_{uploaded_file.name}"
-        with open(video_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        
         st.success(f"✅ Video uploaded: {uploaded_file.name}")
         
         # Process button
         if st.button("🚀 START PROCESSING", use_container_width=True):
-            try:
-                processor = VideoProcessor(segment_duration)
-                
-                # Step 1: Split video
-                st.markdown("---")
-                st.markdown("### 🔪 STEP 1: SPLITTING VIDEO")
-                split_progress = st.progress(0)
-                split_status = st.empty()
-                
-                segments, duration = processor.split_video(
-                    video_path,
-                    lambda p: split_progress.progress(p)
-                )
-                
-                split_status.success(f"✅ Split into {len(segments)} segments ({duration:.2f}s total)")
-                st.plotly_chart(create_segment_timeline(len(segments)), use_container_width=True)
-                
-                # Step 2: Sequential processing
-                st.markdown("### ⏳ STEP 2: SEQUENTIAL PROCESSING")
-                seq_progress = st.progress(0)
-                seq_status = st.empty()
-                
-                seq_results, seq_time = processor.process_sequential(
-                    segments,
-                    lambda p: seq_progress.progress(p)
-                )
-                
-                seq_status.success(f"✅ Sequential processing completed in {seq_time:.2f}s")
-                
-                # Step 3: Parallel processing
-                st.markdown("### ⚡ STEP 3: PARALLEL PROCESSING")
-                par_progress = st.progress(0)
-                par_status = st.empty()
-                
-                par_results, par_time, workers = processor.process_parallel(
-                    segments,
-                    lambda p: par_progress.progress(p)
-                )
-                
-                par_status.success(f"✅ Parallel processing completed in {par_time:.2f}s using {workers} cores")
-                
-                # Step 4: Stitch video
-                st.markdown("### 🔗 STEP 4: STITCHING FINAL VIDEO")
-                stitch_progress = st.progress(0)
-                final_output = "final_output.mp4"
-                
-                with st.spinner("Merging segments..."):
-                    processor.stitch_segments(par_results, final_output)
-                    stitch_progress.progress(1.0)
-                
-                st.success("✅ Final video created!")
-                
-                # Performance Analytics
-                st.markdown("---")
-                st.markdown("## 📊 PERFORMANCE ANALYTICS")
-                st.markdown(
-                    "<p style='color: #888888; margin-top: -10px;'>"
-                    "Detailed metrics from the parallel rendering pipeline</p>",
-                    unsafe_allow_html=True
-                )
-                
-                # Calculate metrics
-                speedup = seq_time / par_time if par_time > 0 else 0
-                time_saved = seq_time - par_time
-                percent_faster = (time_saved / seq_time * 100) if seq_time > 0 else 0
-                
-                # Render all sections
-                render_performance_metrics(seq_time, par_time, workers, len(segments))
-                render_performance_charts(seq_time, par_time, speedup)
-                render_performance_table(seq_time, par_time, workers, len(segments), speedup)
-                render_output_preview(duration, final_output)
-                render_performance_insights(speedup, time_saved, percent_faster)
-                
-            except Exception as e:
-                st.error(f"❌ Error during processing: {str(e)}")
-                st.exception(e)
-    else:
+            overlay_image = settings.pop('overlay_image')
+            job_id, _ = create_render_job(uploaded_file.name, settings, owner=owner)
+            if overlay_image is not None:
+                overlay_image.seek(0)
+                save_effect_file(job_id, 'overlay', overlay_image)
+            uploaded_file.seek(0)
+            save_upload(job_id, uploaded_file)
+            start_render_job(job_id)
+            
+            # The job id in the URL survives reruns and browser refreshes
+            st.query_params['job'] = job_id
+    
+    job_id = st.query_params.get('job')
+    render_job_list(job_id, owner)
+    
+    if job_id:
+        render_job(job_id, owner)
+    elif uploaded_file is None:
         render_landing_page()
 
 
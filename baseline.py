@@ -0,0 +1,119 @@
+"""
+Baseline Module
+Estimates the sequential processing time from a stratified sample of timed segments
+"""
+
+import math
+import random
+
+
+CONFIDENCE = 0.95
+
+# Two-sided 95% Student t critical values by degrees of freedom; larger samples use the normal value
+T_CRITICAL_95 = {
+    1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306,
+    9: 2.262, 10: 2.228, 12: 2.179, 15: 2.131, 20: 2.086, 25: 2.060, 30: 2.042
+}
+Z_CRITICAL_95 = 1.960
+
+
+def default_sample_size(num_segments):
+    """
+    Pick how many segments to time for an estimate
+
+    Args:
+        num_segments (int): Number of segments in the video
+
+    Returns:
+        int: About the square root of the segment count, at least 2 (for a
+            confidence interval) and never more than the segment count
+    """
+    return min(num_segments, max(2, math.ceil(math.sqrt(num_segments))))
+
+
+def choose_sample(num_segments, sample_size, seed=None):
+    """
+    Choose segments to time, one at random from each of sample_size equal strata
+
+    Stratifying spreads the sample over the whole video, so a slow scene at
+    the start or end cannot be missed or over-represented by chance.
+
+    Args:
+        num_segments (int): Number of segments in the video
+        sample_size (int): Number of segments to choose
+        seed (int): Optional random seed for a reproducible sample
+
+    Returns:
+        list: Sorted segment indices
+    """
+    sample_size = max(1, min(sample_size, num_segments))
+    rng = random.Random(seed)
+    sample = []
+    for stratum in range(sample_size):
+        low = stratum * num_segments // sample_size
+        high = (stratum + 1) * num_segments // sample_size
+        sample.append(rng.randrange(low, high))
+    return sample
+
+
+def _t_critical(degrees_of_freedom):
+    """
+    Get the two-sided 95% t critical value, rounding the degrees of freedom down to a tabulated one
+
+    Args:
+        degrees_of_freedom (int): Degrees of freedom (at least 1)
+
+    Returns:
+        float: Critical value
+    """
+    if degrees_of_freedom > max(T_CRITICAL_95):
+        return Z_CRITICAL_95
+    return T_CRITICAL_95[max(df for df in T_CRITICAL_95 if df <= degrees_of_freedom)]
+
+
+def extrapolate(sample_times, sample_durations, total_duration, num_segments):
+    """
+    Extrapolate the full sequential time from timed segments with a ratio estimator
+
+    Processing time is roughly proportional to segment length, so the estimate
+    is (seconds of processing per second of video in the sample) x (video
+    duration), which stays unbiased when segments differ in length. The
+    interval uses the ratio estimator's standard error with a finite
+    population correction.
+
+    Args:
+        sample_times (list): Processing time of each sampled segment in seconds
+        sample_durations (list): Video duration of each sampled segment in seconds
+        total_duration (float): Duration of the whole video in seconds
+        num_segments (int): Number of segments in the whole video
+
+    Returns:
+        dict: time (estimate), low and high (confidence bounds, None for a single
+            sample), confidence, sampled and segments counts, estimated (True)
+    """
+    n = len(sample_times)
+    ratio = sum(sample_times) / sum(sample_durations)
+    estimate = ratio * total_duration
+    low = high = None
+
+    if n == num_segments:
+        low = high = estimate
+    elif n > 1:
+        residuals = [t - ratio * d for t, d in zip(sample_times, sample_durations)]
+        residual_variance = sum(r * r for r in residuals) / (n - 1)
+        mean_duration = sum(sample_durations) / n
+        population_correction = 1 - n / num_segments
+        ratio_error = math.sqrt(population_correction * residual_variance / n) / mean_duration
+        margin = _t_critical(n - 1) * ratio_error * total_duration
+        low = max(sum(sample_times), estimate - margin)
+        high = estimate + margin
+
+    return {
+        'time': estimate,
+        'low': low,
+        'high': high,
+        'confidence': CONFIDENCE,
+        'sampled': n,
+        'segments': num_segments,
+        'estimated': True
+    }
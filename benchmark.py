@@ -0,0 +1,383 @@
+"""
+Benchmark Module
+Headless benchmark of the sequential, parallel and frame-pipeline engines on synthetic videos
+
+Usage:
+    python benchmark.py --resolutions 640x360,1280x720 --durations 10,30 \\
+        --workers 1,2,4 --trials 3 --output bench_results
+"""
+
+import os
+import csv
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+import multiprocessing
+
+import numpy as np
+from moviepy import VideoClip
+from moviepy.audio.AudioClip import AudioClip
+
+from video_processor import VideoProcessor
+from scheduler import shutdown_schedulers
+
+
+ENGINES = ("sequential", "parallel", "frame_pipeline")
+
+# Interval between resident memory samples, in seconds
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def generate_test_video(path, width, height, duration, fps=24):
+    """
+    Render a synthetic test video (moving gradient, noise and a tone) without any network access
+
+    Args:
+        path (str): Output file path
+        width (int): Frame width in pixels
+        height (int): Frame height in pixels
+        duration (float): Length in seconds
+        fps (int): Frames per second
+
+    Returns:
+        str: Path to the generated video
+    """
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 32, (height, width, 3), dtype=np.uint8)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    ys = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+
+    def make_frame(t):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[..., 0] = (xs + 40 * t) % 256
+        frame[..., 1] = (ys + 25 * t) % 256
+        frame[..., 2] = (xs[::-1] + ys) % 256
+        return frame + noise
+
+    def make_tone(t):
+        tone = 0.2 * np.sin(2 * np.pi * 440 * t)
+        return np.stack([tone, tone], axis=-1)
+
+    clip = VideoClip(make_frame, duration=duration).with_fps(fps)
+    clip = clip.with_audio(AudioClip(make_tone, duration=duration, fps=44100))
+    clip.write_videofile(path, codec='libx264', logger=None)
+    clip.close()
+    return path
+
+
+def _process_tree_rss(root_pid):
+    """
+    Sum the resident memory of a process and all of its descendants (Linux /proc)
+
+    Args:
+        root_pid (int): Process id at the root of the tree
+
+    Returns:
+        int: Resident set size in bytes (0 if /proc is unavailable)
+    """
+    parents = {}
+    rss = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{entry}/statm") as f:
+                pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents[int(entry)] = int(fields[1])
+        rss[int(entry)] = pages * os.sysconf("SC_PAGE_SIZE")
+
+    total = 0
+    for pid in rss:
+        current = pid
+        while current in parents and current != root_pid:
+            current = parents[current]
+        if current == root_pid:
+            total += rss[pid]
+    return total
+
+
+class PeakRSSMonitor:
+    """Background sampler of the peak resident memory of this process tree"""
+
+    def __init__(self):
+        """Initialize PeakRSSMonitor"""
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._available = os.path.isdir("/proc")
+
+    def _run(self):
+        """Sample until stopped"""
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _process_tree_rss(os.getpid()))
+            self._stop.wait(RSS_SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        if self._available:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._available:
+            self._thread.join()
+
+
+def run_trial(engine, video_path, workers, split_mode, grayscale_engine, segment_duration):
+    """
+    Run one engine end to end in a scratch directory and time each stage
+
+    Args:
+        engine (str): "sequential", "parallel" or "frame_pipeline"
+        video_path (str): Absolute path to the input video
+        workers (int): Worker count for the parallel engines
+        split_mode (str): VideoProcessor split mode
+        grayscale_engine (str): VideoProcessor grayscale engine
+        segment_duration (int or str): VideoProcessor segment duration
+
+    Returns:
+        dict: Stage times (split, process, stitch, total), frames, segments and peak RSS
+    """
+    processor = VideoProcessor(
+        segment_duration,
+        split_mode=split_mode,
+        grayscale_engine=grayscale_engine,
+        max_workers=workers
+    )
+    split_time = stitch_time = 0.0
+    num_segments = 0
+
+    with PeakRSSMonitor() as monitor:
+        start = time.time()
+
+        if engine == "frame_pipeline":
+            _, process_time, workers = processor.process_frame_pipeline(video_path, "output.mp4")
+        else:
+            segments, _ = processor.split_video(video_path)
+            split_time = time.time() - start
+            num_segments = len(segments)
+
+            if engine == "sequential":
+                results, process_time = processor.process_sequential(segments)
+                workers = 1
+            else:
+                results, process_time, workers = processor.process_parallel(segments)
+
+            stitch_start = time.time()
+            processor.stitch_segments(results, "output.mp4")
+            stitch_time = time.time() - stitch_start
+
+        total_time = time.time() - start
+
+    processor.cleanup()
+    return {
+        'split_time': split_time,
+        'process_time': process_time,
+        'stitch_time': stitch_time,
+        'total_time': total_time,
+        'workers': workers,
+        'segments': num_segments,
+        'peak_rss_mb': monitor.peak / (1024 * 1024)
+    }
+
+
+def _git_commit():
+    """
+    Get the commit being benchmarked
+
+    Returns:
+        str: Commit hash, or None outside a git checkout
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(resolutions, durations, engines, worker_counts, trials, warmup,
+                   split_mode, grayscale_engine, segment_duration, fps=24):
+    """
+    Benchmark every engine on every synthetic video configuration
+
+    Args:
+        resolutions (list): (width, height) tuples
+        durations (list): Video lengths in seconds
+        engines (list): Engine names from ENGINES
+        worker_counts (list): Worker counts tried for the parallel engines
+        trials (int): Measured trials per configuration
+        warmup (int): Unrecorded trials run first per configuration
+        split_mode (str): VideoProcessor split mode
+        grayscale_engine (str): VideoProcessor grayscale engine
+        segment_duration (int or str): VideoProcessor segment duration
+        fps (int): Frame rate of the synthetic videos
+
+    Returns:
+        list: One record per measured trial
+    """
+    records = []
+    scratch = tempfile.mkdtemp(prefix="render_bench_")
+    original_cwd = os.getcwd()
+
+    try:
+        os.chdir(scratch)
+        for width, height in resolutions:
+            for duration in durations:
+                video_path = os.path.join(scratch, f"synthetic_{width}x{height}_{duration}s.mp4")
+                generate_test_video(video_path, width, height, duration, fps)
+                frames = int(duration * fps)
+
+                for engine in engines:
+                    counts = [1] if engine == "sequential" else worker_counts
+                    for workers in counts:
+                        for trial in range(-warmup, trials):
+                            result = run_trial(engine, video_path, workers, split_mode,
+                                               grayscale_engine, segment_duration)
+                            if trial < 0:
+                                continue
+                            result.update({
+                                'engine': engine,
+                                'resolution': f"{width}x{height}",
+                                'duration': duration,
+                                'trial': trial,
+                                'frames': frames,
+                                'fps': frames / result['total_time'] if result['total_time'] > 0 else 0
+                            })
+                            records.append(result)
+                            print(
+                                f"{engine:>15} {width}x{height} {duration:>4}s "
+                                f"workers={result['workers']} trial={trial} "
+                                f"total={result['total_time']:.2f}s fps={result['fps']:.1f} "
+                                f"rss={result['peak_rss_mb']:.0f}MB"
+                            )
+                        # Peak RSS covers the whole process tree, so the warm pool of
+                        # this configuration must not linger into the next one
+                        shutdown_schedulers()
+    finally:
+        os.chdir(original_cwd)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    _add_speedups(records)
+    return records
+
+
+def _add_speedups(records):
+    """
+    Annotate records with speedup against the median sequential time of the same video
+
+    Args:
+        records (list): Trial records, updated in place
+    """
+    baselines = {}
+    for record in records:
+        if record['engine'] == "sequential":
+            baselines.setdefault((record['resolution'], record['duration']), []).append(record['total_time'])
+
+    for record in records:
+        baseline = baselines.get((record['resolution'], record['duration']))
+        record['speedup'] = (
+            statistics.median(baseline) / record['total_time']
+            if baseline and record['total_time'] > 0 else None
+        )
+
+
+def write_results(records, output_prefix, metadata):
+    """
+    Write trial records to <prefix>.json (with run metadata) and <prefix>.csv
+
+    Args:
+        records (list): Trial records
+        output_prefix (str): Output path without extension
+        metadata (dict): Run metadata stored alongside the JSON records
+    """
+    with open(f"{output_prefix}.json", "w") as f:
+        json.dump({'metadata': metadata, 'results': records}, f, indent=2)
+
+    if records:
+        with open(f"{output_prefix}.csv", "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=sorted(records[0].keys()))
+            writer.writeheader()
+            writer.writerows(records)
+
+
+def _parse_list(value, cast=int):
+    """Parse a comma-separated command line list"""
+    return [cast(item) for item in value.split(",") if item]
+
+
+def _parse_resolution(value):
+    """Parse a WIDTHxHEIGHT string"""
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the video rendering engines")
+    parser.add_argument("--resolutions", default="640x360,1280x720",
+                        help="Comma-separated WIDTHxHEIGHT list")
+    parser.add_argument("--durations", default="10,30", help="Comma-separated durations in seconds")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="Comma-separated engines")
+    parser.add_argument("--workers", default=str(multiprocessing.cpu_count()),
+                        help="Comma-separated worker counts for the parallel engines")
+    parser.add_argument("--trials", type=int, default=3, help="Measured trials per configuration")
+    parser.add_argument("--warmup", type=int, default=1, help="Unrecorded warmup trials")
+    parser.add_argument("--split-mode", default="keyframe", help="reencode, keyframe or direct")
+    parser.add_argument("--grayscale-engine", default="numpy", help="moviepy or numpy")
+    parser.add_argument("--segment-duration", default="auto", help="Seconds, or auto")
+    parser.add_argument("--output", default="bench_results", help="Output path prefix")
+    args = parser.parse_args()
+
+    engines = _parse_list(args.engines, str)
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"unknown engines: {', '.join(sorted(unknown))}")
+
+    segment_duration = args.segment_duration
+    if segment_duration != "auto":
+        segment_duration = float(segment_duration)
+
+    metadata = {
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'commit': _git_commit(),
+        'cpu_count': multiprocessing.cpu_count(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'split_mode': args.split_mode,
+        'grayscale_engine': args.grayscale_engine,
+        'segment_duration': args.segment_duration
+    }
+
+    try:
+        records = run_benchmarks(
+            _parse_list(args.resolutions, _parse_resolution),
+            _parse_list(args.durations, float),
+            engines,
+            _parse_list(args.workers),
+            args.trials,
+            args.warmup,
+            args.split_mode,
+            args.grayscale_engine,
+            segment_duration
+        )
+    finally:
+        shutdown_schedulers()
+
+    write_results(records, args.output, metadata)
+    print(f"Wrote {len(records)} results to {args.output}.json and {args.output}.csv")
+
+
+if __name__ == "__main__":
+    main()
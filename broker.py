@@ -0,0 +1,611 @@
+"""
+Broker Module
+Network job queue that hands processing segments to render workers on other hosts
+"""
+
+import os
+import time
+import threading
+import itertools
+from collections import deque
+from multiprocessing.managers import BaseManager
+
+from effects import effect_files
+from result_cache import ResultCache
+from scheduler import JobHandle, TaskFailedError
+
+
+# Address the broker listens on; workers connect to it as host:port
+DEFAULT_HOST = os.environ.get("RENDER_BROKER_HOST", "127.0.0.1")
+DEFAULT_PORT = int(os.environ.get("RENDER_BROKER_PORT", "8503"))
+
+# Shared secret workers authenticate with. Connections carry pickled data, so
+# it must be set before the broker listens beyond this machine
+AUTHKEY = os.environ.get("RENDER_BROKER_AUTHKEY")
+LOCAL_AUTHKEY = "parallel-video-renderer"
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+# Workers send a heartbeat every HEARTBEAT_INTERVAL seconds; a worker silent for
+# HEARTBEAT_TIMEOUT seconds is considered lost and its segments are reassigned
+HEARTBEAT_INTERVAL = 2.0
+HEARTBEAT_TIMEOUT = 10.0
+
+# Queued tasks fail once no worker has been connected for this many seconds
+NO_WORKER_TIMEOUT = 60.0
+
+# Bytes per fetch or upload call
+TRANSFER_CHUNK_SIZE = 4 * 1024 * 1024
+
+# Methods remote workers may call
+WORKER_METHODS = (
+    'register', 'heartbeat', 'lease', 'fetch', 'fetch_asset', 'upload', 'complete', 'fail', 'unregister'
+)
+
+
+class _BrokerServer(BaseManager):
+    """Manager serving the broker to workers"""
+
+
+class _BrokerClient(BaseManager):
+    """Manager connecting a worker to a broker"""
+
+
+_BrokerClient.register("broker", exposed=WORKER_METHODS)
+
+
+class _Task:
+    """One task of a job, leased to at most one worker at a time"""
+
+    def __init__(self, job, args):
+        self.job = job
+        self.args = args
+        self.failures = 0
+
+
+class _Lease:
+    """A task handed to a worker, with its upload in progress"""
+
+    def __init__(self, token, task, worker_id):
+        self.token = token
+        self.task = task
+        self.worker_id = worker_id
+        self.input_path, self.output_path = task.args[1][:2]
+        # Local files the task's effects read, e.g. overlay images
+        self.asset_paths = []
+        directory, name = os.path.split(os.path.abspath(self.output_path))
+        stem, ext = os.path.splitext(name)
+        self.partial_path = os.path.join(directory, f".{stem}.upload-{token}{ext}")
+        self.received = 0
+
+
+class _Job:
+    """Book-keeping for one submitted job"""
+
+    def __init__(self, job_id, func, priority, on_result, timeout, retries, label):
+        self.job_id = job_id
+        self.func = f"{func.__module__}:{func.__qualname__}"
+        self.queued = deque()
+        self.priority = priority
+        self.on_result = on_result
+        self.timeout = timeout
+        self.retries = retries
+        self.label = label
+        self.running = 0
+        self.total = 0
+        self.cancelled = False
+
+
+class SegmentBroker:
+    """
+    Queue of segment tasks leased to render workers over the network
+
+    Offers the same submit interface as RenderScheduler, so a VideoProcessor
+    can send its processing tasks here instead of to the local pool. Tasks
+    are (index, (input path, output path, options)) jobs for a module-level
+    function such as VideoProcessor._run_timed_job. A worker leases a task,
+    fetches the input in chunks, runs the function on local copies and
+    uploads the output, which is verified against its checksum and moved to
+    the output path on this machine. Files the effects read, such as overlay
+    images, are fetched the same way and the worker's copies replace their
+    paths in the options.
+
+    Workers send heartbeats. When one goes silent its leased tasks are
+    reassigned to the others, and a task that fails or is lost more often
+    than its retries allow fails its job with TaskFailedError. Queued tasks
+    fail too once no worker has been connected for NO_WORKER_TIMEOUT seconds.
+    """
+
+    def __init__(self):
+        """Initialize SegmentBroker (call listen to accept workers)"""
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._leases = {}
+        self._workers = {}
+        self._ids = itertools.count(1)
+        self._tokens = itertools.count(1)
+        self._server = None
+        self.address = None
+        self.counters = {'retried': 0, 'lost': 0}
+        # When the last worker left (None while workers are connected)
+        self._unstaffed_since = None
+
+        threading.Thread(target=self._reap, name="broker-reaper", daemon=True).start()
+
+    def listen(self, host=DEFAULT_HOST, port=DEFAULT_PORT, authkey=AUTHKEY):
+        """
+        Start accepting workers on a background thread
+
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on
+            authkey (str): Shared secret of the workers; defaults to a fixed key,
+                which is only allowed on a loopback interface
+
+        Raises:
+            RuntimeError: If no authkey is set for a non-loopback host, or the port is taken
+        """
+        if authkey is None:
+            if host not in LOOPBACK_HOSTS:
+                raise RuntimeError(
+                    f"Set RENDER_BROKER_AUTHKEY before listening on {host}: "
+                    "workers would otherwise connect with a well-known key"
+                )
+            authkey = LOCAL_AUTHKEY
+
+        _BrokerServer.register("broker", callable=lambda: self, exposed=WORKER_METHODS)
+        try:
+            self._server = _BrokerServer(address=(host, port), authkey=authkey.encode()).get_server()
+        except OSError as e:
+            raise RuntimeError(f"Broker could not listen on {host}:{port}: {e}")
+        self.address = self._server.address
+        threading.Thread(target=self._server.serve_forever, name="broker-server", daemon=True).start()
+
+    @property
+    def workers(self):
+        """Segments the connected workers can render at once"""
+        with self._lock:
+            return sum(worker['slots'] for worker in self._workers.values())
+
+    def submit(self, func, args_list, priority=0, on_result=None, timeout=None, retries=0,
+               speculative=False, label=None):
+        """
+        Queue a job made of independent segment tasks for the workers
+
+        Args:
+            func (callable): Module-level function the workers run on each task, with
+                the input and output paths replaced by local copies
+            args_list (list): (index, (input path, output path, options)) per task
+            priority (int): Higher values are leased first (see scheduler.PRIORITIES)
+            on_result (callable): Optional callback(result, error) per task, called from
+                the broker's threads; by default results are collected for
+                JobHandle.as_completed
+            timeout (float or callable): Seconds a worker lets one attempt run before
+                failing it, or a function of the task's argument returning them
+            retries (int): Further attempts allowed after a failure or a lost worker
+            speculative (bool): Accepted for compatibility with RenderScheduler;
+                tasks are never duplicated across workers
+            label (callable): Optional function naming a task's argument in error messages
+
+        Returns:
+            JobHandle: Handle for the submitted job
+        """
+        job_id = next(self._ids)
+        handle = JobHandle(self, job_id, 0)
+        job = _Job(job_id, func, priority, on_result or handle._put, timeout, retries, label)
+        handle._job = job
+        handle.total = self.extend(job, args_list)
+        return handle
+
+    def extend(self, job, args_list):
+        """
+        Queue more tasks for a submitted job
+
+        Args:
+            job (_Job): Job to extend
+            args_list (list): One argument per new task
+
+        Returns:
+            int: Number of tasks added (0 if the job was cancelled)
+        """
+        with self._lock:
+            if job.cancelled:
+                return 0
+            job.queued.extend(_Task(job, args) for args in args_list)
+            job.total += len(args_list)
+            if job.queued:
+                self._jobs[job.job_id] = job
+        return len(args_list)
+
+    def cancel(self, job_id):
+        """
+        Drop a job's queued tasks (leased tasks are left to finish)
+
+        Args:
+            job_id (int): Job to cancel
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.queued.clear()
+                self._retire(job)
+
+    def status(self):
+        """
+        Snapshot of the broker's load
+
+        Returns:
+            dict: address, connected workers and their slots, leased and queued task
+                counts, active job count, and the number of retried and lost tasks so far
+        """
+        with self._lock:
+            return {
+                'address': f"{self.address[0]}:{self.address[1]}" if self.address else None,
+                'workers': len(self._workers),
+                'slots': sum(worker['slots'] for worker in self._workers.values()),
+                'running': len(self._leases),
+                'queued': sum(len(job.queued) for job in self._jobs.values()),
+                'jobs': len(self._jobs),
+                **self.counters
+            }
+
+    def register(self, worker_id, slots):
+        """
+        Announce a worker (called remotely)
+
+        Args:
+            worker_id (str): Unique worker name, e.g. "host:pid"
+            slots (int): Segments the worker renders at once
+
+        Returns:
+            dict: heartbeat_interval and chunk_size the worker should use
+        """
+        with self._lock:
+            self._workers[worker_id] = {'slots': slots, 'last_seen': time.time()}
+        return {'heartbeat_interval': HEARTBEAT_INTERVAL, 'chunk_size': TRANSFER_CHUNK_SIZE}
+
+    def heartbeat(self, worker_id):
+        """
+        Mark a worker as alive (called remotely)
+
+        Args:
+            worker_id (str): Worker name
+
+        Returns:
+            bool: False if the worker was given up on (its leases were reassigned)
+                and has to register again
+        """
+        with self._lock:
+            worker = self._workers.get(worker_id)
+            if worker is None:
+                return False
+            worker['last_seen'] = time.time()
+            return True
+
+    def lease(self, worker_id):
+        """
+        Hand the next queued task to a worker (called remotely)
+
+        Args:
+            worker_id (str): Worker name
+
+        Returns:
+            dict: token, func ("module:qualname"), index, input and output file names,
+                input size, options, assets (effect position, parameter, file name and
+                size of each file the effects read) and timeout of the task, or None if
+                nothing is queued
+
+        Raises:
+            RuntimeError: If the worker is not registered
+        """
+        with self._lock:
+            if worker_id not in self._workers:
+                raise RuntimeError(f"Worker {worker_id} is not registered")
+            self._workers[worker_id]['last_seen'] = time.time()
+            job = self._next_job()
+            if job is None:
+                return None
+            task = job.queued.popleft()
+            lease = _Lease(next(self._tokens), task, worker_id)
+            self._leases[lease.token] = lease
+            job.running += 1
+
+        index, (input_path, output_path, *rest) = task.args
+        options = rest[0] if rest else {}
+        try:
+            size = os.path.getsize(input_path)
+            assets = []
+            for position, param, path in effect_files(options.get('effects') or []):
+                assets.append({
+                    'effect': position, 'param': param,
+                    'name': os.path.basename(path), 'size': os.path.getsize(path)
+                })
+                lease.asset_paths.append(os.path.abspath(path))
+        except OSError as e:
+            # A file the task needs is gone on this machine: count a failed attempt
+            # rather than leaving the lease (and its job) open forever
+            with self._lock:
+                report = self._settle(lease, None, RuntimeError(f"Cannot lease the task: {e}"))
+            self._report(report)
+            return None
+
+        return {
+            'token': lease.token,
+            'func': job.func,
+            'index': index,
+            'input_name': os.path.basename(input_path),
+            'output_name': os.path.basename(output_path),
+            'size': size,
+            'options': options,
+            'assets': assets,
+            'timeout': job.timeout(task.args) if callable(job.timeout) else job.timeout
+        }
+
+    def fetch(self, token, offset):
+        """
+        Read a chunk of a leased task's input (called remotely)
+
+        Args:
+            token (int): Lease token
+            offset (int): Byte offset to read from
+
+        Returns:
+            bytes: Up to TRANSFER_CHUNK_SIZE bytes; empty at the end of the file
+        """
+        return self._read_chunk(self._lease(token).input_path, offset)
+
+    def fetch_asset(self, token, number, offset):
+        """
+        Read a chunk of a file the leased task's effects read (called remotely)
+
+        Args:
+            token (int): Lease token
+            number (int): Position of the file in the lease's assets
+            offset (int): Byte offset to read from
+
+        Returns:
+            bytes: Up to TRANSFER_CHUNK_SIZE bytes; empty at the end of the file
+        """
+        return self._read_chunk(self._lease(token).asset_paths[number], offset)
+
+    @staticmethod
+    def _read_chunk(path, offset):
+        """Read up to TRANSFER_CHUNK_SIZE bytes of a file from an offset"""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            return f.read(TRANSFER_CHUNK_SIZE)
+
+    def upload(self, token, offset, data):
+        """
+        Append a chunk of a leased task's output (called remotely)
+
+        Args:
+            token (int): Lease token
+            offset (int): Byte offset of the chunk; chunks must arrive in order
+            data (bytes): Chunk contents
+
+        Raises:
+            RuntimeError: If the lease is no longer valid or the chunk is out of order
+        """
+        lease = self._lease(token)
+        if offset != lease.received:
+            raise RuntimeError(
+                f"Upload for lease {token} expected offset {lease.received}, got {offset}"
+            )
+        with open(lease.partial_path, "ab" if offset else "wb") as f:
+            f.write(data)
+        lease.received += len(data)
+
+    def complete(self, token, result):
+        """
+        Accept a leased task's uploaded output and report its result (called remotely)
+
+        The output is moved into place only if its SHA-256 matches the one the
+        worker computed; otherwise the attempt counts as failed.
+
+        Args:
+            token (int): Lease token
+            result (dict): Stats of the task, with the output's checksum, the worker's
+                started_at and its clock when reporting (reported_at)
+        """
+        lease = self._lease(token)
+        if ResultCache.file_hash(lease.partial_path) != result['checksum']:
+            self.fail(token, f"Upload of {lease.output_path} is corrupt (checksum mismatch)")
+            return
+
+        # Rebase the start onto this machine's clock: worker clocks may differ
+        result = dict(result, output=lease.output_path)
+        result['started_at'] = time.time() - (result.pop('reported_at') - result['started_at'])
+        with self._lock:
+            if self._leases.get(token) is not lease:
+                raise RuntimeError(f"Lease {token} is no longer valid")
+            os.replace(lease.partial_path, lease.output_path)
+            report = self._settle(lease, result, None)
+        self._report(report)
+
+    def fail(self, token, error):
+        """
+        Report that a leased task failed on its worker (called remotely)
+
+        Args:
+            token (int): Lease token
+            error (str): Description of the failure
+        """
+        with self._lock:
+            lease = self._leases.get(token)
+            report = self._settle(lease, None, RuntimeError(error)) if lease else None
+        self._report(report)
+
+    def unregister(self, worker_id):
+        """
+        Remove a worker that is shutting down and requeue its leased tasks (called remotely)
+
+        The tasks do not count as failed attempts.
+
+        Args:
+            worker_id (str): Worker name
+        """
+        with self._lock:
+            self._workers.pop(worker_id, None)
+            for lease in self._leases_of(worker_id):
+                self._release(lease)
+                lease.task.job.queued.appendleft(lease.task)
+
+    def _lease(self, token):
+        """
+        Look up a valid lease
+
+        Raises:
+            RuntimeError: If the lease was completed, failed or reassigned
+        """
+        with self._lock:
+            lease = self._leases.get(token)
+        if lease is None:
+            raise RuntimeError(f"Lease {token} is no longer valid")
+        return lease
+
+    def _leases_of(self, worker_id):
+        """List the leases held by a worker (caller holds the lock)"""
+        return [lease for lease in self._leases.values() if lease.worker_id == worker_id]
+
+    def _next_job(self):
+        """Pick the job whose task is leased next (caller holds the lock)"""
+        candidates = [job for job in self._jobs.values() if job.queued]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda job: (job.priority, -job.running, -job.job_id))
+
+    def _release(self, lease):
+        """Stop tracking a lease and drop its partial upload (caller holds the lock)"""
+        self._leases.pop(lease.token, None)
+        lease.task.job.running -= 1
+        if os.path.exists(lease.partial_path):
+            os.remove(lease.partial_path)
+
+    def _retire(self, job):
+        """Forget a job once it has nothing queued or leased (caller holds the lock)"""
+        if not job.queued and not job.running:
+            self._jobs.pop(job.job_id, None)
+
+    def _settle(self, lease, result, error):
+        """
+        Record the outcome of a lease (caller holds the lock)
+
+        Args:
+            lease (_Lease): Finished, failed or lost lease
+            result (object): Task stats, if it succeeded
+            error (Exception): Failure, if it failed
+
+        Returns:
+            tuple: (job, result, error) to report, or None if the task was requeued
+        """
+        self._release(lease)
+        task = lease.task
+        job = task.job
+        if error is None:
+            self._retire(job)
+            return job, result, None
+
+        task.failures += 1
+        if task.failures <= job.retries and not job.cancelled:
+            job.queued.appendleft(task)
+            self.counters['retried'] += 1
+            return None
+
+        self._retire(job)
+        name = job.label(task.args) if job.label else "Task"
+        failure = TaskFailedError(f"{name} failed after {task.failures} attempt(s): {error}")
+        failure.__cause__ = error
+        return job, None, failure
+
+    @staticmethod
+    def _report(report):
+        """Deliver a settled outcome to its job (without holding the lock)"""
+        if report:
+            report[0].on_result(report[1], report[2])
+
+    def _reap(self):
+        """
+        Every HEARTBEAT_INTERVAL seconds, give up on silent workers and reassign their
+        tasks, and fail queued tasks once no worker has been connected for NO_WORKER_TIMEOUT
+        """
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            reports = []
+            with self._lock:
+                now = time.time()
+                for worker_id, worker in list(self._workers.items()):
+                    if now - worker['last_seen'] < HEARTBEAT_TIMEOUT:
+                        continue
+                    del self._workers[worker_id]
+                    for lease in self._leases_of(worker_id):
+                        self.counters['lost'] += 1
+                        reports.append(self._settle(
+                            lease, None, RuntimeError(f"Worker {worker_id} stopped sending heartbeats")
+                        ))
+
+                if self._workers:
+                    self._unstaffed_since = None
+                elif self._unstaffed_since is None:
+                    self._unstaffed_since = now
+                elif now - self._unstaffed_since > NO_WORKER_TIMEOUT:
+                    for job in list(self._jobs.values()):
+                        reports += [(job, None, self._unleased_error(job, task)) for task in job.queued]
+                        job.queued.clear()
+                        self._retire(job)
+            for report in reports:
+                self._report(report)
+
+    @staticmethod
+    def _unleased_error(job, task):
+        """Failure of a task no worker was around to lease"""
+        name = job.label(task.args) if job.label else "Task"
+        return TaskFailedError(
+            f"{name} was never rendered: no render worker connected for {NO_WORKER_TIMEOUT:.0f}s "
+            "(start one with python render_worker.py <host>:<port>)"
+        )
+
+
+def connect_broker(address, authkey=AUTHKEY):
+    """
+    Connect a worker to a broker
+
+    Args:
+        address (str): Broker address as "host:port"
+        authkey (str): Shared secret (defaults to RENDER_BROKER_AUTHKEY, or the
+            local key when unset)
+
+    Returns:
+        BaseProxy: Proxy exposing the broker's worker methods
+
+    Raises:
+        RuntimeError: If the broker cannot be reached
+    """
+    host, _, port = address.rpartition(":")
+    manager = _BrokerClient(
+        address=(host or DEFAULT_HOST, int(port)), authkey=(authkey or LOCAL_AUTHKEY).encode()
+    )
+    try:
+        manager.connect()
+    except OSError as e:
+        raise RuntimeError(f"Could not connect to the broker at {address}: {e}")
+    return manager.broker()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Return the process-wide broker, listening on DEFAULT_HOST:DEFAULT_PORT from first use
+
+    Returns:
+        SegmentBroker: Shared broker
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            broker = SegmentBroker()
+            broker.listen()
+            _broker = broker
+        return _broker
@@ -6,29 +6,46 @@ Creates interactive visualizations using Plotly
 import plotly.graph_objects as go
 
 
-def create_comparison_chart(seq_time, par_time):
+def create_comparison_chart(seq_time, par_time, seq_estimate=None):
     """
     Create a bar chart comparing sequential vs parallel processing times
     
     Args:
         seq_time (float): Sequential processing time in seconds
         par_time (float): Parallel processing time in seconds
+        seq_estimate (dict): Optional sampled estimate (see baseline.extrapolate); the
+            sequential bar is then labelled as estimated and shows its confidence interval
         
     Returns:
         plotly.graph_objects.Figure: Comparison chart
     """
     fig = go.Figure()
     
+    seq_label = 'Sequential (est.)' if seq_estimate else 'Sequential'
+    seq_text = f'~{seq_time:.2f}s' if seq_estimate else f'{seq_time:.2f}s'
+    error_y = None
+    if seq_estimate and seq_estimate['low'] is not None:
+        error_y = dict(
+            type='data',
+            symmetric=False,
+            array=[seq_estimate['high'] - seq_time, 0],
+            arrayminus=[seq_time - seq_estimate['low'], 0],
+            color='rgba(255, 255, 255, 0.6)',
+            thickness=1.5
+        )
+    
     # Sequential bar
     fig.add_trace(go.Bar(
         name='Sequential',
-        x=['Sequential', 'Parallel'],
+        x=[seq_label, 'Parallel'],
         y=[seq_time, 0],
         marker=dict(
             color='rgba(100, 100, 100, 0.4)',
-            line=dict(color='rgba(150, 150, 150, 0.6)', width=1)
+            line=dict(color='rgba(150, 150, 150, 0.6)', width=1),
+            pattern=dict(shape='/') if seq_estimate else None
         ),
-        text=[f'{seq_time:.2f}s', ''],
+        error_y=error_y,
+        text=[seq_text, ''],
         textposition='outside',
         textfont=dict(size=14, color='#ffffff'),
         width=0.5
@@ -37,7 +54,7 @@ def create_comparison_chart(seq_time, par_time):
     # Parallel bar
     fig.add_trace(go.Bar(
         name='Parallel',
-        x=['Sequential', 'Parallel'],
+        x=[seq_label, 'Parallel'],
         y=[0, par_time],
         marker=dict(
             color='rgba(0, 255, 0, 0.4)',
@@ -73,12 +90,13 @@ def create_comparison_chart(seq_time, par_time):
     return fig
 
 
-def create_speedup_visualization(speedup):
+def create_speedup_visualization(speedup, estimated=False):
     """
     Create a visualization showing speedup factor
     
     Args:
         speedup (float): Speedup multiplier (seq_time / par_time)
+        estimated (bool): Label the speedup as estimated from a sampled baseline
         
     Returns:
         plotly.graph_objects.Figure: Speedup visualization
@@ -132,7 +150,10 @@ def create_speedup_visualization(speedup):
         margin=dict(t=80, b=20, l=20, r=20),
         annotations=[
             dict(
-                text=f"<b>{speedup:.2f}x</b><br>SPEEDUP",
+                text=(
+                    f"<b>~{speedup:.2f}x</b><br>ESTIMATED SPEEDUP" if estimated
+                    else f"<b>{speedup:.2f}x</b><br>SPEEDUP"
+                ),
                 x=0.5,
                 y=0.85,
                 xref='paper',
@@ -188,3 +209,60 @@ def create_segment_timeline(num_segments):
     )
     
     return fig
+
+
+def create_worker_timeline(segment_stats):
+    """
+    Create a Gantt-style timeline of which worker processed each segment and when
+    
+    Segments taking more than 1.5x the median segment time are highlighted as
+    stragglers, since they bound the achievable speedup.
+    
+    Args:
+        segment_stats (list): Per-segment dicts with index, started_at, duration and pid
+        
+    Returns:
+        plotly.graph_objects.Figure: Worker timeline visualization
+    """
+    fig = go.Figure()
+    
+    durations = sorted(s['duration'] for s in segment_stats)
+    median = durations[len(durations) // 2] if durations else 0
+    pids = sorted({s['pid'] for s in segment_stats})
+    
+    for stats in segment_stats:
+        straggler = median > 0 and stats['duration'] > 1.5 * median
+        color = 'rgba(255, 80, 80, 0.6)' if straggler else 'rgba(0, 255, 0, 0.4)'
+        fig.add_trace(go.Bar(
+            x=[stats['duration']],
+            y=[f"PID {stats['pid']}"],
+            base=[stats['started_at']],
+            orientation='h',
+            marker=dict(color=color, line=dict(color='rgba(0, 255, 0, 0.6)', width=1)),
+            text=[f"#{stats['index']}"],
+            textposition='inside',
+            textfont=dict(size=11, color='#ffffff'),
+            hovertemplate=(
+                f"Segment {stats['index']}<br>"
+                f"{stats['duration']:.2f}s on PID {stats['pid']}<extra></extra>"
+            ),
+            showlegend=False
+        ))
+    
+    # Layout
+    fig.update_layout(
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#a0a0a0', size=12),
+        barmode='overlay',
+        xaxis=dict(
+            title='Time since start (seconds)',
+            gridcolor='rgba(255, 255, 255, 0.05)',
+            color='#888888'
+        ),
+        yaxis=dict(color='#888888', categoryorder='array', categoryarray=[f"PID {p}" for p in pids]),
+        margin=dict(t=20, b=40, l=80, r=20),
+        height=max(200, 40 * len(pids) + 80)
+    )
+    
+    return fig
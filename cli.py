@@ -0,0 +1,412 @@
+"""
+Command Line Interface
+Headless batch rendering of files, directories or globs on one shared worker pool
+
+Usage:
+    python cli.py videos/ extra/*.mov --output-dir rendered --report report.json
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import queue
+import argparse
+import multiprocessing
+
+from video_processor import VideoProcessor, DEFAULT_SEGMENT_TIMEOUT
+from result_cache import ResultCache
+from worker_pool import shutdown_pool
+from scheduler import get_scheduler
+from broker import get_broker
+from workspace import create_workspace
+from effects import EffectChain
+from encoder_profiles import PROFILES, DEFAULT_PROFILE
+
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm')
+
+# Files split but not yet stitched at any one time. Each keeps its segments in
+# scratch space (tmpfs by default), so a long batch must not split everything up
+# front; two keep the next file's split overlapping the current file's render
+MAX_FILES_IN_FLIGHT = 2
+
+
+def collect_inputs(patterns, recursive=False):
+    """
+    Expand files, directories and glob patterns into a list of video files
+
+    Args:
+        patterns (list): File paths, directory paths or glob patterns
+        recursive (bool): Descend into subdirectories of directory arguments
+
+    Returns:
+        list: Sorted, de-duplicated absolute paths of video files
+    """
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            if recursive:
+                matches = glob.glob(os.path.join(pattern, "**", "*"), recursive=True)
+            else:
+                matches = glob.glob(os.path.join(pattern, "*"))
+        elif os.path.isfile(pattern):
+            matches = [pattern]
+        else:
+            matches = glob.glob(pattern, recursive=recursive)
+
+        for path in matches:
+            if os.path.isfile(path) and path.lower().endswith(VIDEO_EXTENSIONS):
+                found.add(os.path.abspath(path))
+
+    return sorted(found)
+
+
+def output_paths(inputs, output_dir):
+    """
+    Name the rendered video of every input so that no two outputs collide
+
+    Outputs mirror the inputs' directories below their common root, so
+    a/clip.mp4 and b/clip.mp4 render to a/clip_processed.mp4 and
+    b/clip_processed.mp4. Inputs that still share a name, such as clip.mp4
+    and clip.mov, keep their extension in it (clip_mp4_processed.mp4), and
+    any remaining duplicate gets a counter.
+
+    Args:
+        inputs (list): Input video paths
+        output_dir (str): Directory for rendered videos
+
+    Returns:
+        list: Output path of each input, in the same order
+    """
+    sources = [os.path.abspath(path) for path in inputs]
+    root = os.path.commonpath([os.path.dirname(path) for path in sources]) if sources else ""
+    stems = [os.path.splitext(os.path.relpath(path, root)) for path in sources]
+    distinct = set(stems)
+    shared = {stem for stem, _ in distinct if sum(other == stem for other, _ in distinct) > 1}
+
+    paths = []
+    for stem, ext in stems:
+        name = f"{stem}_{ext.lstrip('.').lower()}" if stem in shared else stem
+        path = os.path.join(output_dir, f"{name}_processed.mp4")
+        count = 2
+        while path in paths:
+            path = os.path.join(output_dir, f"{name}_{count}_processed.mp4")
+            count += 1
+        paths.append(path)
+    return paths
+
+
+def parse_effect(text):
+    """
+    Parse an --effect argument of the form name or name:key=value,key=value
+
+    Values are read as JSON when possible (numbers, booleans, lists) and kept
+    as strings otherwise, e.g. "resize:height=480" or "overlay:image=logo.png".
+
+    Args:
+        text (str): Effect argument
+
+    Returns:
+        dict: Effect spec for effects.EffectChain
+    """
+    name, _, params = text.partition(":")
+    spec = {'name': name}
+    for pair in filter(None, params.split(",")):
+        key, _, value = pair.partition("=")
+        try:
+            spec[key] = json.loads(value)
+        except ValueError:
+            spec[key] = value
+    return spec
+
+
+class BatchItem:
+    """One input video moving through the split/process/stitch pipeline"""
+
+    def __init__(self, number, input_path, output_path, processor):
+        """
+        Initialize BatchItem
+
+        Args:
+            number (int): Position of the file in the batch
+            input_path (str): Path to input video file
+            output_path (str): Path for the rendered video
+            processor (VideoProcessor): Processor with this file's own working directory
+        """
+        self.number = number
+        self.input_path = input_path
+        self.output_path = output_path
+        self.processor = processor
+        self.results = []
+        self.pending = 0
+        self.report = {
+            'input': input_path,
+            'output': output_path,
+            'status': 'pending'
+        }
+        self.submitted_at = None
+        self.handle = None
+
+
+def _settle_segment(item, stats, error, log):
+    """
+    Record one segment outcome of a file, stitching the file once its last segment is back
+
+    Args:
+        item (BatchItem): File the segment belongs to
+        stats (dict): Segment stats, if it succeeded
+        error (Exception): Failure, if it failed
+        log (callable): Receives human-readable progress lines
+
+    Returns:
+        bool: True if this outcome finished the file (stitched or failed)
+    """
+    if item.report['status'] == 'failed':
+        return False
+
+    if error is not None:
+        item.handle.cancel()
+        item.report.update(status='failed', error=str(error))
+        log(f"[failed] {item.input_path}: {error}")
+        item.processor.cleanup()
+        return True
+
+    item.processor.finish_parallel_job(stats)
+    item.results[stats['index']] = stats['output']
+    item.pending -= 1
+    if item.pending:
+        return False
+
+    item.report['process_time'] = time.time() - item.submitted_at
+    stitch_start = time.time()
+    try:
+        item.report['stitch_method'] = item.processor.stitch_segments(item.results, item.output_path)
+        item.processor.store_output(item.input_path, item.output_path)
+    except Exception as e:
+        item.report.update(status='failed', error=str(e))
+        log(f"[failed] {item.input_path}: {e}")
+        item.processor.cleanup()
+        return True
+
+    item.report.update(
+        status='done',
+        stitch_time=time.time() - stitch_start,
+        total_time=item.report['split_time'] + item.report['process_time']
+        + time.time() - stitch_start
+    )
+    item.processor.cleanup()
+    log(f"[done] {item.output_path} in {item.report['total_time']:.2f}s")
+    return True
+
+
+def run_batch(inputs, output_dir, work_dir=None, segment_duration="auto", split_mode="keyframe",
+              grayscale_engine="numpy", workers=None, cache=None, log=print, effects=None,
+              output_height=None, encoder_profile=DEFAULT_PROFILE,
+              segment_timeout=DEFAULT_SEGMENT_TIMEOUT, distributed=False,
+              max_in_flight=MAX_FILES_IN_FLIGHT):
+    """
+    Render many videos, scheduling every segment of every file onto one worker pool
+
+    Each file is split in this process and its segments are submitted to the
+    shared scheduler as soon as the split finishes, so workers move on to the
+    next file's segments while earlier files are still being split or stitched.
+    At most max_in_flight files are split but not yet stitched: before the
+    next split, finished files are stitched and their scratch space freed.
+    In distributed mode the segments go to the broker instead, for render
+    workers on other hosts (see render_worker.py).
+
+    Args:
+        inputs (list): Input video paths
+        output_dir (str): Directory for rendered videos
+        work_dir (str): Parent of the per-file scratch directories (defaults to the
+            scratch root chosen by workspace.default_scratch_root)
+        segment_duration (int or str): Segment duration in seconds, or "auto"
+        split_mode (str): VideoProcessor split mode
+        grayscale_engine (str): VideoProcessor grayscale engine
+        workers (int): Pool size (defaults to the CPU count)
+        cache (ResultCache): Optional result cache
+        log (callable): Receives human-readable progress lines
+        effects (list): Effect chain specs (defaults to grayscale only)
+        output_height (int): Optional output height; downscales run first, in the decoder
+        encoder_profile (str): Encoder profile for the rendered videos
+        segment_timeout (float): Seconds one attempt at a segment may run before it
+            is stopped and retried (None for no limit)
+        distributed (bool): Render segments on remote workers through the broker
+        max_in_flight (int): Files whose segments may sit in scratch space at once
+
+    Returns:
+        list: Per-file timing reports
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    broker = get_broker() if distributed else None
+    executor = broker or get_scheduler(workers)
+    completions = queue.Queue()
+    items = []
+    in_flight = 0
+
+    for number, (input_path, output_path) in enumerate(zip(inputs, output_paths(inputs, output_dir))):
+        # Stitch and clean up finished files first, and wait for one to finish
+        # while too many files' segments are still in scratch space
+        while in_flight >= max(1, max_in_flight) or not completions.empty():
+            if _settle_segment(*completions.get(), log):
+                in_flight -= 1
+
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        processor = VideoProcessor(
+            segment_duration,
+            split_mode=split_mode,
+            grayscale_engine=grayscale_engine,
+            cache=cache,
+            max_workers=workers,
+            work_dir=create_workspace(work_dir, prefix=f"{number:04d}_{stem}_"),
+            effects=effects,
+            output_height=output_height,
+            encoder_profile=encoder_profile,
+            segment_timeout=segment_timeout,
+            broker=broker
+        )
+        item = BatchItem(number, input_path, output_path, processor)
+        items.append(item)
+        start = time.time()
+
+        try:
+            if processor.fetch_cached_output(input_path, item.output_path):
+                item.report.update(status='cached', total_time=time.time() - start)
+                log(f"[cache] {input_path}")
+                processor.cleanup()
+                continue
+
+            segments, duration = processor.split_video(input_path)
+            jobs, cached = processor.prepare_parallel_jobs(segments)
+        except Exception as e:
+            item.report.update(status='failed', error=str(e))
+            log(f"[failed] {input_path}: {e}")
+            processor.cleanup()
+            continue
+
+        item.report.update(
+            duration=duration,
+            segments=len(segments),
+            split_time=time.time() - start,
+            cached_segments=len(cached)
+        )
+        item.results = [None] * len(segments)
+        item.pending = len(segments)
+        item.submitted_at = time.time()
+        log(f"[split] {input_path}: {len(segments)} segments in {item.report['split_time']:.2f}s")
+
+        for stats in cached:
+            completions.put((item, stats, None))
+        item.handle = executor.submit(
+            VideoProcessor._run_timed_job, jobs,
+            on_result=lambda stats, error, item=item: completions.put((item, stats, error)),
+            **processor.task_options
+        )
+        if item.pending:
+            in_flight += 1
+
+    # Stitch each remaining file as soon as its last segment comes back
+    while in_flight:
+        if _settle_segment(*completions.get(), log):
+            in_flight -= 1
+
+    return [item.report for item in items]
+
+
+def main(argv=None):
+    """
+    Command line entry point
+
+    Args:
+        argv (list): Arguments (defaults to sys.argv[1:])
+
+    Returns:
+        int: Exit status (1 if any file failed)
+    """
+    parser = argparse.ArgumentParser(description="Render videos to grayscale in parallel, headless")
+    parser.add_argument("inputs", nargs="+", help="Video files, directories or glob patterns")
+    parser.add_argument("--recursive", action="store_true", help="Descend into subdirectories")
+    parser.add_argument("--output-dir", default="rendered", help="Directory for rendered videos")
+    parser.add_argument("--work-dir", help="Parent directory for per-file intermediates "
+                        "(defaults to $RENDER_SCRATCH_DIR, /dev/shm or the system temp directory)")
+    parser.add_argument("--segment-duration", default="auto", help="Seconds per segment, or auto")
+    parser.add_argument("--split-mode", default="keyframe", choices=["reencode", "keyframe", "direct"])
+    parser.add_argument("--effect", action="append", type=parse_effect, dest="effects",
+                        help="Effect to apply, in order; repeatable (name or name:key=value,...). "
+                             "Defaults to grayscale")
+    parser.add_argument("--output-height", type=int,
+                        help="Resize outputs to this height (aspect kept); downscales happen first")
+    parser.add_argument("--encoder-profile", default=DEFAULT_PROFILE, choices=list(PROFILES),
+                        help="x264 preset/CRF profile for the rendered videos")
+    parser.add_argument("--segment-timeout", type=float, default=DEFAULT_SEGMENT_TIMEOUT,
+                        help="Minimum seconds a segment may run before it is stopped and retried; "
+                             "larger segments and slower profiles get more (0 for no limit)")
+    parser.add_argument("--grayscale-engine", default="numpy", choices=["moviepy", "numpy"])
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="Worker processes shared by all files")
+    parser.add_argument("--files-in-flight", type=int, default=MAX_FILES_IN_FLIGHT,
+                        help="Files split but not yet stitched at once; bounds scratch space use")
+    parser.add_argument("--distributed", action="store_true",
+                        help="Render segments on remote workers (render_worker.py) through the broker")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse or store cached results")
+    parser.add_argument("--report", help="Write the per-file timing report to this JSON file ('-' for stdout)")
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.recursive)
+    if not inputs:
+        parser.error("no video files matched the given inputs")
+
+    try:
+        EffectChain(args.effects)
+    except RuntimeError as e:
+        parser.error(str(e))
+
+    if args.distributed and args.split_mode == "direct":
+        parser.error("--distributed needs written segments; use --split-mode keyframe or reencode")
+
+    segment_duration = args.segment_duration
+    if segment_duration != "auto":
+        try:
+            segment_duration = float(segment_duration)
+        except ValueError:
+            parser.error("--segment-duration must be a number of seconds or auto")
+
+    # Keep stdout clean for a machine-readable report
+    log = (lambda line: print(line, file=sys.stderr)) if args.report == "-" else print
+
+    try:
+        reports = run_batch(
+            inputs,
+            args.output_dir,
+            work_dir=args.work_dir,
+            segment_duration=segment_duration,
+            split_mode=args.split_mode,
+            grayscale_engine=args.grayscale_engine,
+            workers=args.workers,
+            cache=None if args.no_cache else ResultCache(),
+            log=log,
+            effects=args.effects,
+            output_height=args.output_height,
+            encoder_profile=args.encoder_profile,
+            segment_timeout=args.segment_timeout or None,
+            distributed=args.distributed,
+            max_in_flight=args.files_in_flight
+        )
+    finally:
+        shutdown_pool()
+
+    if args.report == "-":
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    elif args.report:
+        with open(args.report, "w") as f:
+            json.dump(reports, f, indent=2)
+
+    return 1 if any(r['status'] == 'failed' for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
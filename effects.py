@@ -0,0 +1,487 @@
+"""
+Effects Module
+Registry of batched NumPy frame effects composed into a chain applied in one decode/encode pass
+"""
+
+import hashlib
+
+import numpy as np
+
+from frame_engine import GrayscaleKernel
+
+
+# Effect classes by name, filled by register_effect
+EFFECTS = {}
+
+# Chain used when none is configured
+DEFAULT_EFFECTS = [{'name': 'grayscale'}]
+
+# Frames converted to float at once by effects that need a wider working type
+FLOAT_CHUNK_FRAMES = 4
+
+# ffmpeg scaler used when plan_chain moves a downscale into the decoder
+DECODER_SCALE_ALGORITHM = "area"
+
+
+def register_effect(cls):
+    """
+    Class decorator adding an effect to the registry under its name
+
+    Args:
+        cls (type): Effect subclass
+
+    Returns:
+        type: The same class
+    """
+    EFFECTS[cls.name] = cls
+    return cls
+
+
+def _even(value):
+    """Round a frame dimension down to an even number (required by yuv420p encoding)"""
+    return max(2, int(value) // 2 * 2)
+
+
+class Effect:
+    """
+    Base class of frame effects
+
+    An effect transforms batches of uint8 RGB frames of shape (N, H, W, 3),
+    in place where it can, and returns the resulting batch. Effects whose
+    per_frame flag is True depend on nothing but the frame itself, so their
+    frames can be batched, vectorized and split across processes freely;
+    others (e.g. temporal filters) keep state and must see frames in order.
+    Pointwise effects map each pixel independently of its neighbours, so a
+    downscale can be moved in front of them (see plan_chain). Parameters
+    named in files hold paths of local files the effect reads; render
+    workers on other hosts receive copies of them.
+    """
+
+    name = None
+    per_frame = True
+    pointwise = False
+    files = ()
+
+    def __init__(self, **params):
+        """
+        Initialize Effect
+
+        Args:
+            **params: Effect parameters, kept for describe()
+        """
+        self.params = params
+
+    def output_size(self, size):
+        """
+        Get the frame size this effect produces
+
+        Args:
+            size (tuple): Input (width, height)
+
+        Returns:
+            tuple: Output (width, height)
+        """
+        return size
+
+    def apply(self, frames):
+        """
+        Transform a batch of frames
+
+        Args:
+            frames (numpy.ndarray): uint8 array of shape (N, H, W, 3)
+
+        Returns:
+            numpy.ndarray: Transformed batch (the input array when done in place)
+        """
+        raise NotImplementedError
+
+    def describe(self):
+        """
+        Describe the effect for cache keys
+
+        Returns:
+            dict: Name and parameters
+        """
+        return {'name': self.name, **self.params}
+
+
+@register_effect
+class Grayscale(Effect):
+    """Fixed-point luma conversion (see frame_engine.GrayscaleKernel)"""
+
+    name = "grayscale"
+    pointwise = True
+
+    def __init__(self, rgb_weights=(1, 1, 1)):
+        super().__init__(rgb_weights=list(rgb_weights))
+        self.kernel = GrayscaleKernel(rgb_weights)
+
+    def apply(self, frames):
+        return self.kernel.apply(frames)
+
+
+@register_effect
+class Resize(Effect):
+    """Bilinear resize; a missing width or height keeps the aspect ratio"""
+
+    name = "resize"
+
+    def __init__(self, width=None, height=None):
+        if width is None and height is None:
+            raise RuntimeError("resize needs a width or a height")
+        super().__init__(width=width, height=height)
+        self._plan = None
+
+    def output_size(self, size):
+        width, height = size
+        if self.params['width'] and self.params['height']:
+            return _even(self.params['width']), _even(self.params['height'])
+        if self.params['width']:
+            return _even(self.params['width']), _even(height * self.params['width'] / width)
+        return _even(width * self.params['height'] / height), _even(self.params['height'])
+
+    def _sampling_plan(self, in_height, in_width):
+        """
+        Compute source indices and weights for every output row and column
+
+        Args:
+            in_height (int): Input frame height
+            in_width (int): Input frame width
+
+        Returns:
+            tuple: (y0, y1, wy, x0, x1, wx) arrays, cached per input size
+        """
+        if self._plan is None or self._plan[0] != (in_height, in_width):
+            out_width, out_height = self.output_size((in_width, in_height))
+            axes = []
+            for n_in, n_out in ((in_height, out_height), (in_width, out_width)):
+                # Sample at output pixel centres mapped into the input
+                pos = np.clip((np.arange(n_out) + 0.5) * n_in / n_out - 0.5, 0, n_in - 1)
+                low = np.floor(pos).astype(np.intp)
+                high = np.minimum(low + 1, n_in - 1)
+                axes.append((low, high, (pos - low).astype(np.float32)))
+            (y0, y1, wy), (x0, x1, wx) = axes
+            self._plan = ((in_height, in_width), (y0, y1, wy[:, None, None], x0, x1, wx[:, None]))
+        return self._plan[1]
+
+    def apply(self, frames):
+        y0, y1, wy, x0, x1, wx = self._sampling_plan(*frames.shape[1:3])
+        out = np.empty((len(frames), len(y0), len(x0), 3), dtype=np.uint8)
+
+        for i in range(0, len(frames), FLOAT_CHUNK_FRAMES):
+            chunk = frames[i:i + FLOAT_CHUNK_FRAMES]
+            # Rows first: gathering output rows shrinks the data before the column pass
+            top = chunk[:, y0].astype(np.float32)
+            rows = top + (chunk[:, y1] - top) * wy
+            left = rows[:, :, x0]
+            out[i:i + FLOAT_CHUNK_FRAMES] = left + (rows[:, :, x1] - left) * wx + 0.5
+        return out
+
+
+@register_effect
+class Crop(Effect):
+    """Crop to a rectangle (a view of the input, no copy)"""
+
+    name = "crop"
+
+    def __init__(self, x=0, y=0, width=None, height=None):
+        super().__init__(x=x, y=y, width=width, height=height)
+
+    def _box(self, size):
+        """Clamp the rectangle to the frame and round its size down to even"""
+        width, height = size
+        x = min(self.params['x'], width - 2)
+        y = min(self.params['y'], height - 2)
+        crop_width = _even(min(self.params['width'] or width - x, width - x))
+        crop_height = _even(min(self.params['height'] or height - y, height - y))
+        return x, y, crop_width, crop_height
+
+    def output_size(self, size):
+        return self._box(size)[2:]
+
+    def apply(self, frames):
+        x, y, width, height = self._box((frames.shape[2], frames.shape[1]))
+        return frames[:, y:y + height, x:x + width]
+
+
+@register_effect
+class Blur(Effect):
+    """Separable box blur computed with running sums"""
+
+    name = "blur"
+
+    def __init__(self, radius=2):
+        super().__init__(radius=int(radius))
+
+    @staticmethod
+    def _box_sum(values, radius, axis):
+        """
+        Average each element with its neighbours along one axis, repeating edge values
+
+        Args:
+            values (numpy.ndarray): uint32 array
+            radius (int): Neighbours on each side
+            axis (int): Axis to blur along
+
+        Returns:
+            numpy.ndarray: Rounded uint32 averages, same shape as values
+        """
+        pad = [(0, 0)] * values.ndim
+        pad[axis] = (radius + 1, radius)
+        sums = np.cumsum(np.pad(values, pad, mode='edge'), axis=axis, dtype=np.uint32)
+        width = 2 * radius + 1
+        upper = np.take(sums, np.arange(width, sums.shape[axis]), axis=axis)
+        lower = np.take(sums, np.arange(0, sums.shape[axis] - width), axis=axis)
+        return (upper - lower + width // 2) // width
+
+    def apply(self, frames):
+        radius = self.params['radius']
+        if radius < 1:
+            return frames
+        for i in range(0, len(frames), FLOAT_CHUNK_FRAMES):
+            chunk = frames[i:i + FLOAT_CHUNK_FRAMES]
+            blurred = self._box_sum(chunk.astype(np.uint32), radius, axis=1)
+            np.copyto(chunk, self._box_sum(blurred, radius, axis=2), casting='unsafe')
+        return frames
+
+
+@register_effect
+class ColorLUT(Effect):
+    """Per-channel 256-entry lookup table built from gain, contrast, gamma and inversion"""
+
+    name = "lut"
+    pointwise = True
+
+    def __init__(self, gamma=1.0, contrast=1.0, brightness=0, gains=(1, 1, 1), invert=False):
+        super().__init__(gamma=gamma, contrast=contrast, brightness=brightness,
+                         gains=list(gains), invert=invert)
+        levels = np.arange(256, dtype=np.float32) / 255
+        curve = (levels - 0.5) * contrast + 0.5 + brightness / 255
+        curve = np.clip(curve, 0, 1) ** (1 / gamma)
+        if invert:
+            curve = 1 - curve
+        self.tables = [
+            np.clip(curve * gain * 255 + 0.5, 0, 255).astype(np.uint8) for gain in gains
+        ]
+
+    def apply(self, frames):
+        for channel, table in enumerate(self.tables):
+            frames[..., channel] = table[frames[..., channel]]
+        return frames
+
+
+@register_effect
+class TemporalDenoise(Effect):
+    """
+    Exponential moving average over consecutive frames
+
+    Not per-frame: each output depends on the previous ones, so frames must
+    arrive in order. State restarts at every segment boundary.
+    """
+
+    name = "denoise"
+    per_frame = False
+    pointwise = True
+
+    def __init__(self, strength=0.5):
+        if not 0 <= strength < 1:
+            raise RuntimeError("denoise strength must be in [0, 1)")
+        super().__init__(strength=strength)
+        self._state = None
+
+    def apply(self, frames):
+        strength = self.params['strength']
+        for frame in frames:
+            if self._state is None or self._state.shape != frame.shape:
+                self._state = frame.astype(np.float32)
+            else:
+                self._state *= strength
+                self._state += (1 - strength) * frame
+            np.copyto(frame, self._state + 0.5, casting='unsafe')
+        return frames
+
+
+@register_effect
+class Overlay(Effect):
+    """Alpha-blend an image (e.g. a PNG watermark); negative x/y count from the right/bottom edge"""
+
+    name = "overlay"
+    files = ('image',)
+
+    def __init__(self, image, x=-16, y=-16, opacity=1.0):
+        super().__init__(image=image, x=x, y=y, opacity=opacity)
+        from PIL import Image
+
+        with open(image, "rb") as f:
+            self._digest = hashlib.sha256(f.read()).hexdigest()
+        rgba = np.asarray(Image.open(image).convert("RGBA"), dtype=np.float32)
+        self.rgb = rgba[..., :3]
+        self.alpha = rgba[..., 3:] / 255 * opacity
+
+    def describe(self):
+        # The image's contents, not just its path, determine the output
+        return {**super().describe(), 'image_sha256': self._digest}
+
+    def apply(self, frames):
+        height, width = frames.shape[1:3]
+        over_height, over_width = self.alpha.shape[:2]
+        x = self.params['x'] if self.params['x'] >= 0 else width - over_width + self.params['x'] + 1
+        y = self.params['y'] if self.params['y'] >= 0 else height - over_height + self.params['y'] + 1
+
+        # Clip the overlay to the part that falls inside the frame
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + over_width, width), min(y + over_height, height)
+        if left >= right or top >= bottom:
+            return frames
+        rgb = self.rgb[top - y:bottom - y, left - x:right - x]
+        alpha = self.alpha[top - y:bottom - y, left - x:right - x]
+
+        region = frames[:, top:bottom, left:right]
+        blended = region * (1 - alpha) + rgb * alpha + 0.5
+        np.copyto(region, blended, casting='unsafe')
+        return frames
+
+
+def normalize_effects(specs):
+    """
+    Convert effect names or specs to a list of spec dicts
+
+    Args:
+        specs (list): Effect names or {'name': ..., **params} dicts
+
+    Returns:
+        list: Spec dicts
+    """
+    return [{'name': spec} if isinstance(spec, str) else dict(spec) for spec in specs]
+
+
+def effect_files(specs):
+    """
+    List the local files an effect chain reads
+
+    Args:
+        specs (list): Spec dicts
+
+    Returns:
+        list: (position in the chain, parameter name, path) of each file parameter
+    """
+    return [
+        (position, param, spec[param])
+        for position, spec in enumerate(specs)
+        for param in EFFECTS[spec['name']].files
+        if spec.get(param)
+    ]
+
+
+class EffectChain:
+    """Ordered effects applied to every batch in a single decode/encode pass"""
+
+    def __init__(self, specs=None):
+        """
+        Initialize EffectChain
+
+        Args:
+            specs (list): Effect names or {'name': ..., **params} dicts, applied in
+                order (defaults to DEFAULT_EFFECTS)
+
+        Raises:
+            RuntimeError: If an effect name is unknown or its parameters are invalid
+        """
+        self.effects = []
+        for spec in normalize_effects(specs or DEFAULT_EFFECTS):
+            params = dict(spec)
+            name = params.pop('name')
+            if name not in EFFECTS:
+                raise RuntimeError(f"Unknown effect '{name}' (available: {', '.join(sorted(EFFECTS))})")
+            try:
+                self.effects.append(EFFECTS[name](**params))
+            except TypeError as e:
+                raise RuntimeError(f"Invalid parameters for effect '{name}': {e}") from e
+
+    @property
+    def per_frame(self):
+        """bool: True if every effect depends only on the frame itself"""
+        return all(effect.per_frame for effect in self.effects)
+
+    def output_size(self, size):
+        """
+        Get the frame size the chain produces
+
+        Args:
+            size (tuple): Input (width, height)
+
+        Returns:
+            tuple: Output (width, height)
+        """
+        for effect in self.effects:
+            size = effect.output_size(size)
+        return size
+
+    def apply(self, frames):
+        """
+        Run every effect over a batch of frames
+
+        Args:
+            frames (numpy.ndarray): uint8 array of shape (N, H, W, 3)
+
+        Returns:
+            numpy.ndarray: Transformed batch
+        """
+        for effect in self.effects:
+            frames = effect.apply(frames)
+        return frames
+
+    def describe(self):
+        """
+        Describe the chain for cache keys
+
+        Returns:
+            list: Effect descriptions in order
+        """
+        return [effect.describe() for effect in self.effects]
+
+
+def plan_chain(specs, size):
+    """
+    Reorder a chain to downscale first and hand the leading downscale to the decoder
+
+    Every downscaling resize is moved in front of the pointwise effects that
+    precede it, so those effects run on the smaller frames. For linear
+    effects such as grayscale the result is identical up to rounding; for
+    curves (lut) it is a close approximation. A downscale that ends up first
+    is dropped from the chain and returned as a decode size, so ffmpeg
+    scales while decoding and full-resolution frames never reach Python.
+
+    Args:
+        specs (list): Effect names or spec dicts
+        size (tuple): Source (width, height)
+
+    Returns:
+        tuple: (decode (width, height) or None, effect specs to run on decoded frames)
+    """
+    specs = normalize_effects(specs or DEFAULT_EFFECTS)
+    effects = EffectChain(specs).effects
+    steps = list(zip(specs, effects))
+
+    # Size each resize would see; pointwise effects never change it, so moving
+    # a resize past them keeps it a downscale
+    def is_downscale(position):
+        current = size
+        for _, effect in steps[:position]:
+            current = effect.output_size(current)
+        target = steps[position][1].output_size(current)
+        return target[0] * target[1] < current[0] * current[1]
+
+    for position in range(1, len(steps)):
+        if not isinstance(steps[position][1], Resize) or not is_downscale(position):
+            continue
+        while position > 0 and steps[position - 1][1].pointwise:
+            steps[position - 1], steps[position] = steps[position], steps[position - 1]
+            position -= 1
+
+    decode_size = None
+    if steps and isinstance(steps[0][1], Resize) and is_downscale(0):
+        decode_size = steps[0][1].output_size(size)
+        steps = steps[1:]
+
+    return decode_size, [spec for spec, _ in steps]
@@ -0,0 +1,95 @@
+"""
+Encoder Profiles Module
+Named x264 settings for intermediates and deliverables, with encoder threads matched to the worker count
+"""
+
+import multiprocessing
+
+
+# preset/crf trade encode speed against size and quality; tune is optional
+PROFILES = {
+    # Split segments that are decoded again right away: encode as fast as
+    # possible at near-lossless quality and keep them cheap to decode
+    'fast-intermediate': {'codec': 'libx264', 'preset': 'ultrafast', 'crf': 12, 'tune': 'fastdecode'},
+    'preview': {'codec': 'libx264', 'preset': 'veryfast', 'crf': 28},
+    # libx264's defaults, as used before profiles existed
+    'standard': {'codec': 'libx264', 'preset': 'medium', 'crf': 23},
+    'archival': {'codec': 'libx264', 'preset': 'slow', 'crf': 16},
+}
+
+# Encoding time of each profile relative to 'standard', for sizing task timeouts
+ENCODE_COST = {'fast-intermediate': 0.3, 'preview': 0.5, 'standard': 1.0, 'archival': 3.0}
+
+DEFAULT_PROFILE = 'standard'
+INTERMEDIATE_PROFILE = 'fast-intermediate'
+
+
+def get_profile(name):
+    """
+    Look up an encoder profile
+
+    Args:
+        name (str): Profile name from PROFILES
+
+    Returns:
+        dict: Profile settings
+
+    Raises:
+        RuntimeError: If the profile does not exist
+    """
+    if name not in PROFILES:
+        raise RuntimeError(f"Unknown encoder profile '{name}' (available: {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+
+def threads_per_encoder(concurrent_encoders):
+    """
+    Split the CPU cores between encoders running at the same time
+
+    Args:
+        concurrent_encoders (int): Number of encoders running concurrently
+
+    Returns:
+        int: Threads each encoder may use (at least 1)
+    """
+    return max(1, multiprocessing.cpu_count() // max(1, concurrent_encoders))
+
+
+def encoder_args(name, threads=None):
+    """
+    Build keyword arguments for write_videofile / FFMPEG_VideoWriter
+
+    Args:
+        name (str): Profile name from PROFILES
+        threads (int): Encoder threads (defaults to every core, for a lone encoder)
+
+    Returns:
+        dict: codec, preset, threads and ffmpeg_params
+    """
+    profile = get_profile(name)
+    ffmpeg_params = ["-crf", str(profile['crf'])]
+    if profile.get('tune'):
+        ffmpeg_params += ["-tune", profile['tune']]
+    return {
+        'codec': profile['codec'],
+        'preset': profile['preset'],
+        'threads': threads or multiprocessing.cpu_count(),
+        'ffmpeg_params': ffmpeg_params
+    }
+
+
+def encoder_cli_args(name, threads=None):
+    """
+    Build ffmpeg command line options for encoding the video stream with a profile
+
+    Args:
+        name (str): Profile name from PROFILES
+        threads (int): Encoder threads (defaults to every core, for a lone encoder)
+
+    Returns:
+        list: Options such as ["-c:v", "libx264", "-preset", ..., "-crf", ...]
+    """
+    args = encoder_args(name, threads)
+    return [
+        "-c:v", args['codec'], "-preset", args['preset'], "-threads", str(args['threads'])
+    ] + args['ffmpeg_params']
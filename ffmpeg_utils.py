@@ -0,0 +1,264 @@
+"""
+FFmpeg Utilities Module
+Thin wrappers around the ffmpeg/ffprobe binaries for operations that do not need decoding
+"""
+
+import os
+import re
+import bisect
+import shutil
+import subprocess
+
+from moviepy.config import FFMPEG_BINARY
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+
+# Tolerance (seconds) when comparing a boundary against a keyframe timestamp
+KEYFRAME_TOLERANCE = 0.01
+
+
+def get_ffprobe_binary():
+    """
+    Locate the ffprobe binary if one is installed
+
+    Returns:
+        str: Path to ffprobe, or None when only ffmpeg is available
+    """
+    return shutil.which("ffprobe")
+
+
+def run_ffmpeg(args):
+    """
+    Run ffmpeg with the given arguments
+
+    Args:
+        args (list): Command line arguments passed after the binary
+
+    Returns:
+        subprocess.CompletedProcess: Finished process with captured output
+
+    Raises:
+        RuntimeError: If ffmpeg exits with a non-zero status
+    """
+    cmd = [FFMPEG_BINARY, "-hide_banner", "-nostdin", "-y"] + list(args)
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stderr.strip()[-500:]}")
+    return proc
+
+
+def probe_keyframes(input_path):
+    """
+    List the presentation timestamps of the keyframes in the first video stream
+
+    Uses ffprobe's packet flags when available (no decoding); otherwise falls
+    back to ffmpeg decoding only the keyframes through the showinfo filter.
+
+    Args:
+        input_path (str): Path to input video file
+
+    Returns:
+        list: Sorted keyframe times in seconds (empty if probing failed)
+    """
+    ffprobe = get_ffprobe_binary()
+    times = []
+
+    try:
+        if ffprobe:
+            proc = subprocess.run(
+                [ffprobe, "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0",
+                 input_path],
+                capture_output=True, text=True, check=True
+            )
+            for line in proc.stdout.splitlines():
+                fields = line.strip().split(",")
+                if len(fields) >= 2 and "K" in fields[1] and fields[0] not in ("", "N/A"):
+                    times.append(float(fields[0]))
+        else:
+            proc = subprocess.run(
+                [FFMPEG_BINARY, "-hide_banner", "-nostdin", "-nostats",
+                 "-skip_frame", "nokey", "-i", input_path,
+                 "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-"],
+                capture_output=True, text=True, check=True
+            )
+            times = [float(t) for t in re.findall(r"pts_time:\s*([-\d.]+)", proc.stderr)]
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return []
+
+    return sorted(set(times))
+
+
+def snap_to_keyframe(time_point, keyframes):
+    """
+    Find the keyframe closest to a time point
+
+    Args:
+        time_point (float): Desired boundary in seconds
+        keyframes (list): Sorted keyframe times in seconds
+
+    Returns:
+        float: Nearest keyframe time (time_point itself if there are none)
+    """
+    if not keyframes:
+        return time_point
+    return min(keyframes, key=lambda k: abs(k - time_point))
+
+
+def is_keyframe(time_point, keyframes):
+    """
+    Check whether a time point falls on a keyframe
+
+    Args:
+        time_point (float): Time in seconds
+        keyframes (list): Sorted keyframe times in seconds
+
+    Returns:
+        bool: True if a keyframe lies within KEYFRAME_TOLERANCE of time_point
+    """
+    return any(abs(k - time_point) <= KEYFRAME_TOLERANCE for k in keyframes)
+
+
+def stream_copy_segment(input_path, start, end, output_path):
+    """
+    Cut a time range out of a video without re-encoding
+
+    The start must be a keyframe for the cut to be exact: ffmpeg seeks to the
+    keyframe at or before it and copies packets up to the end time.
+
+    Args:
+        input_path (str): Path to input video file
+        start (float): Segment start in seconds
+        end (float): Segment end in seconds
+        output_path (str): Path for the segment file
+    """
+    run_ffmpeg([
+        "-ss", f"{start:.6f}", "-i", input_path,
+        "-t", f"{end - start:.6f}",
+        "-map", "0:v:0", "-map", "0:a?",
+        "-c", "copy", "-avoid_negative_ts", "make_zero",
+        output_path
+    ])
+
+
+def keyframe_before(time_point, keyframes):
+    """
+    Find the last keyframe at or before a time point
+
+    Args:
+        time_point (float): Time in seconds
+        keyframes (list): Sorted keyframe times in seconds
+
+    Returns:
+        float: Keyframe time (0 if there is none before time_point)
+    """
+    index = bisect.bisect_right(keyframes, time_point + KEYFRAME_TOLERANCE)
+    return keyframes[index - 1] if index else 0.0
+
+
+def encode_segment(input_path, start, end, output_path, video_args, seek_point=None):
+    """
+    Cut a time range out of a video and re-encode it, for boundaries that are not keyframes
+
+    Given the keyframe at or before start, the demuxer jumps straight to it and
+    only the frames between it and start are decoded and dropped.
+
+    Args:
+        input_path (str): Path to input video file
+        start (float): Segment start in seconds
+        end (float): Segment end in seconds
+        output_path (str): Path for the segment file
+        video_args (list): Video encoder options (see encoder_profiles.encoder_cli_args)
+        seek_point (float): Keyframe at or before start (defaults to start)
+    """
+    seek_point = start if seek_point is None else min(seek_point, start)
+    run_ffmpeg([
+        "-ss", f"{seek_point:.6f}", "-i", input_path,
+        "-ss", f"{start - seek_point:.6f}", "-t", f"{end - start:.6f}",
+        "-map", "0:v:0", "-map", "0:a?"
+    ] + list(video_args) + [
+        "-c:a", "aac", "-movflags", "+faststart",
+        output_path
+    ])
+
+
+def probe_stream_params(input_path):
+    """
+    Describe the codec parameters that must match for lossless concatenation
+
+    Args:
+        input_path (str): Path to video file
+
+    Returns:
+        list: One tuple of codec parameters per stream (empty if probing failed)
+    """
+    ffprobe = get_ffprobe_binary()
+
+    try:
+        if ffprobe:
+            fields = ("codec_type,codec_name,profile,pix_fmt,width,height,"
+                      "r_frame_rate,time_base,sample_rate,channels,sample_fmt")
+            proc = subprocess.run(
+                [ffprobe, "-v", "error", "-show_entries", f"stream={fields}",
+                 "-of", "csv=p=0", input_path],
+                capture_output=True, text=True, check=True
+            )
+            return [tuple(line.strip().split(",")) for line in proc.stdout.splitlines() if line.strip()]
+
+        # ffmpeg exits non-zero when no output is given, but still prints the stream info
+        proc = subprocess.run(
+            [FFMPEG_BINARY, "-hide_banner", "-nostdin", "-i", input_path],
+            capture_output=True, text=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return []
+
+    params = []
+    for line in proc.stderr.splitlines():
+        match = re.search(r"Stream #\d+:\d+\S*: (\w+): (.*)", line)
+        if not match:
+            continue
+        # Bitrate and disposition legitimately differ between segments
+        details = re.sub(r",?\s*\d+ kb/s", "", match.group(2))
+        details = re.sub(r"\s*\((default|forced)\)", "", details)
+        params.append((match.group(1), details.strip()))
+    return params
+
+
+def concat_stream_copy(segment_paths, output_path):
+    """
+    Join segments with the concat demuxer without re-encoding
+
+    All segments must share the same codec parameters (see probe_stream_params).
+
+    Args:
+        segment_paths (list): Ordered segment file paths
+        output_path (str): Path for the joined video
+    """
+    list_path = f"{output_path}.concat.txt"
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    try:
+        run_ffmpeg([
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-map", "0", "-c", "copy", "-movflags", "+faststart",
+            output_path
+        ])
+    finally:
+        os.remove(list_path)
+
+
+def probe_duration(input_path):
+    """
+    Read a video's duration from its container metadata
+
+    Args:
+        input_path (str): Path to video file
+
+    Returns:
+        float: Duration in seconds
+    """
+    return ffmpeg_parse_infos(input_path)["duration"]
@@ -0,0 +1,299 @@
+"""
+File Server Module
+Local HTTP endpoint streaming published videos straight from disk, with range requests
+"""
+
+import os
+import re
+import secrets
+import threading
+import mimetypes
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+# Address the endpoint listens on, and the base URL browsers should use when it
+# sits behind a proxy (defaults to http://<host the browser reached the app on>:<port>).
+# Files are only served under unguessable tokens, so listening on every interface
+# exposes nothing but published outputs; on a loopback address only browsers on
+# this machine can follow the links
+DEFAULT_HOST = os.environ.get("RENDER_FILE_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.environ.get("RENDER_FILE_PORT", "8502"))
+PUBLIC_URL = os.environ.get("RENDER_FILE_URL")
+
+# Bytes per write when sendfile is unavailable
+COPY_CHUNK_SIZE = 1024 * 1024
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+
+def parse_range(header, size):
+    """
+    Parse a single-range HTTP Range header
+
+    Args:
+        header (str): Range header value, e.g. "bytes=100-199", "bytes=100-" or "bytes=-500"
+        size (int): File size in bytes
+
+    Returns:
+        tuple: Inclusive (start, end) byte offsets, or None to send the whole file
+            (no header, or a form that is not a single byte range)
+
+    Raises:
+        ValueError: If the range lies outside the file
+    """
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if not match or match.groups() == ("", ""):
+        return None
+
+    first, last = match.groups()
+    if first == "":
+        # Suffix range: the last N bytes
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+
+    if start >= size or start > end:
+        raise ValueError(f"unsatisfiable range {header!r} for {size} bytes")
+    return start, end
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    """Serves published files only, at /<token>/<file name>; every other path is a 404"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def log_message(self, format, *args):
+        """Keep range requests from a seeking video player out of the server log"""
+
+    def _resolve(self, url_path):
+        """
+        Map a URL path to a published file
+
+        Args:
+            url_path (str): Percent-encoded URL path
+
+        Returns:
+            str: File path, or None if the token is unknown or the file is gone
+        """
+        token = urllib.parse.unquote(url_path).lstrip("/").split("/", 1)[0]
+        path = self.server.published.get(token)
+        if path is None or not os.path.isfile(path):
+            return None
+        return path
+
+    def _serve(self, send_body):
+        """Answer a GET or HEAD with the whole file or the requested byte range"""
+        url = urllib.parse.urlsplit(self.path)
+        path = self._resolve(url.path)
+        if path is None:
+            self.send_error(404)
+            return
+
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            try:
+                byte_range = parse_range(self.headers.get("Range"), size)
+            except ValueError:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            start, end = byte_range or (0, size - 1)
+            self.send_response(206 if byte_range else 200)
+            self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            if byte_range:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            if "download" in urllib.parse.parse_qs(url.query):
+                self.send_header("Content-Disposition", 'attachment; filename="processed_video.mp4"')
+            self.end_headers()
+
+            if send_body:
+                try:
+                    self._send_file(f, start, end - start + 1)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Players drop connections when the user seeks
+                    self.close_connection = True
+
+    def _send_file(self, f, offset, length):
+        """
+        Copy a byte range of a file to the client, kernel-to-socket when possible
+
+        Args:
+            f (file): Open file
+            offset (int): First byte to send
+            length (int): Number of bytes to send
+        """
+        try:
+            while length > 0:
+                sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, length)
+                if sent == 0:
+                    return
+                offset += sent
+                length -= sent
+            return
+        except (AttributeError, OSError) as e:
+            if isinstance(e, (BrokenPipeError, ConnectionResetError)):
+                raise
+
+        # sendfile is unavailable (e.g. on some platforms); copy in bounded chunks
+        f.seek(offset)
+        while length > 0:
+            chunk = f.read(min(COPY_CHUNK_SIZE, length))
+            if not chunk:
+                return
+            self.wfile.write(chunk)
+            length -= len(chunk)
+
+
+class FileServer:
+    """
+    Background HTTP server exposing individually published files to the browser
+
+    Nothing is reachable until it is published: each published file gets a
+    random token, and its URL is /<token>/<file name>. Job databases, uploads
+    and scratch files are never published, so they are never served.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """
+        Initialize FileServer and start serving on a daemon thread
+
+        Args:
+            host (str): Interface to listen on
+            port (int): Port to listen on; if it is taken, a free port is used instead
+        """
+        try:
+            self.httpd = ThreadingHTTPServer((host, port), _FileHandler)
+        except OSError:
+            self.httpd = ThreadingHTTPServer((host, 0), _FileHandler)
+        self.httpd.daemon_threads = True
+        # Token -> path of every published file
+        self.httpd.published = {}
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.host, self.port = self.httpd.server_address[:2]
+
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="file-server", daemon=True)
+        self._thread.start()
+
+    def publish(self, path):
+        """
+        Make one file downloadable under a token that cannot be guessed
+
+        Publishing the same file again returns the same token.
+
+        Args:
+            path (str): File to serve
+
+        Returns:
+            str: Token of the file
+        """
+        path = os.path.realpath(path)
+        with self._lock:
+            # Forget files that were deleted without being unpublished
+            for gone in [known for known in self._tokens if not os.path.exists(known)]:
+                self.httpd.published.pop(self._tokens.pop(gone), None)
+            if path not in self._tokens:
+                token = secrets.token_urlsafe(24)
+                self._tokens[path] = token
+                self.httpd.published[token] = path
+            return self._tokens[path]
+
+    def unpublish(self, path):
+        """
+        Withdraw the tokens of a file, or of every file below a directory
+
+        Args:
+            path (str): Published file, or a directory such as a job's working directory
+        """
+        path = os.path.realpath(path)
+        with self._lock:
+            for known in list(self._tokens):
+                if known == path or known.startswith(path + os.sep):
+                    self.httpd.published.pop(self._tokens.pop(known), None)
+
+    def reachable_from(self, browser_host):
+        """
+        Check whether a browser can follow this server's links
+
+        Args:
+            browser_host (str): Host name the browser reached the app on (None if unknown)
+
+        Returns:
+            bool: False when the server only listens on loopback and the browser is
+                on another machine (or its host is unknown)
+        """
+        return bool(PUBLIC_URL) or self.host not in LOOPBACK_HOSTS or browser_host in LOOPBACK_HOSTS
+
+    def url_for(self, path, download=False, browser_host=None):
+        """
+        Publish a file and get the URL serving it
+
+        Args:
+            path (str): File to serve
+            download (bool): Ask the browser to save the file rather than display it
+            browser_host (str): Host name the browser reached the app on, used for the
+                link unless RENDER_FILE_URL is set (defaults to the listening address)
+
+        Returns:
+            str: URL of the file
+        """
+        if PUBLIC_URL:
+            base_url = PUBLIC_URL.rstrip("/")
+        else:
+            host = browser_host or self.host
+            if host in ("0.0.0.0", "::", ""):
+                host = "localhost"
+            base_url = f"http://{f'[{host}]' if ':' in host else host}:{self.port}"
+        token = self.publish(path)
+        url = f"{base_url}/{token}/{urllib.parse.quote(os.path.basename(path))}"
+        return f"{url}?download=1" if download else url
+
+    def stop(self):
+        """Stop serving and close the listening socket"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def unpublish(path):
+    """
+    Withdraw a file's or directory's tokens from the running file server, if any
+
+    Args:
+        path (str): Published file or a directory containing published files
+    """
+    with _servers_lock:
+        servers = list(_servers.values())
+    for server in servers:
+        server.unpublish(path)
+
+
+def get_file_server():
+    """
+    Return the process-wide file server, starting it on first use
+
+    Returns:
+        FileServer: Running file server
+    """
+    with _servers_lock:
+        if 'default' not in _servers:
+            _servers['default'] = FileServer()
+        return _servers['default']
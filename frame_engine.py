@@ -0,0 +1,147 @@
+"""
+Frame Engine Module
+Batched, in-place NumPy frame transforms used instead of moviepy's per-frame effects
+"""
+
+import os
+import math
+
+import numpy as np
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+
+# Fixed-point precision of the luma coefficients (Q16)
+LUMA_SHIFT = 16
+
+# Default number of frames transformed per batch
+DEFAULT_BATCH_SIZE = 32
+
+
+class GrayscaleKernel:
+    """Fixed-point luma conversion applied in place to batches of uint8 RGB frames"""
+
+    def __init__(self, rgb_weights=(1, 1, 1)):
+        """
+        Initialize GrayscaleKernel
+
+        Args:
+            rgb_weights (tuple): Relative channel weights, normalised to sum to one
+                (the same convention as moviepy's BlackAndWhite effect)
+        """
+        total = float(sum(rgb_weights))
+        scale = 1 << LUMA_SHIFT
+        # Round up so that a white pixel maps back to 255 after the shift
+        self.coefficients = [np.uint32(math.ceil(w * scale / total)) for w in rgb_weights]
+        self._acc = None
+        self._tmp = None
+
+    def _scratch(self, shape):
+        """
+        Return uint32 work buffers for the given frame shape, reusing them when possible
+
+        Args:
+            shape (tuple): Batch shape without the channel axis
+
+        Returns:
+            tuple: (accumulator, temporary) arrays of that shape
+        """
+        if self._acc is None or self._acc.shape != shape:
+            self._acc = np.empty(shape, dtype=np.uint32)
+            self._tmp = np.empty(shape, dtype=np.uint32)
+        return self._acc, self._tmp
+
+    def apply(self, frames):
+        """
+        Convert frames to grayscale in place
+
+        Args:
+            frames (numpy.ndarray): uint8 array of shape (N, H, W, 3) or (H, W, 3)
+
+        Returns:
+            numpy.ndarray: The same array, now holding the luma in every channel
+        """
+        acc, tmp = self._scratch(frames.shape[:-1])
+        cr, cg, cb = self.coefficients
+
+        np.multiply(frames[..., 0], cr, out=acc)
+        np.multiply(frames[..., 1], cg, out=tmp)
+        acc += tmp
+        np.multiply(frames[..., 2], cb, out=tmp)
+        acc += tmp
+        acc >>= LUMA_SHIFT
+
+        np.copyto(frames, acc[..., np.newaxis], casting='unsafe')
+        return frames
+
+
+def iter_frame_batches(clip, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Yield a clip's frames in fixed-size batches
+
+    The same (batch_size, H, W, 3) buffer is refilled for every batch, so the
+    consumer must finish with a batch before requesting the next one.
+
+    Args:
+        clip (VideoClip): Clip to read frames from
+        batch_size (int): Maximum number of frames per batch
+
+    Yields:
+        numpy.ndarray: uint8 view of the buffer holding the next 1..batch_size frames
+    """
+    width, height = clip.size
+    buffer = np.empty((batch_size, height, width, 3), dtype=np.uint8)
+    count = 0
+
+    for frame in clip.iter_frames(dtype="uint8"):
+        buffer[count] = frame[..., :3]
+        count += 1
+        if count == batch_size:
+            yield buffer
+            count = 0
+
+    if count:
+        yield buffer[:count]
+
+
+def write_clip_batched(clip, output_file, transform, batch_size=DEFAULT_BATCH_SIZE,
+                       size=None, encoder=None):
+    """
+    Encode a clip after running a batched in-place transform over its frames
+
+    Audio is written the same way moviepy's write_videofile does it, so the
+    output is interchangeable with segments produced by the moviepy path.
+
+    Args:
+        clip (VideoClip): Source clip
+        output_file (str): Path for the encoded video
+        transform (callable): Function taking an (N, H, W, 3) uint8 batch and returning
+            the transformed batch (usually the same array, modified in place)
+        batch_size (int): Number of frames transformed per call
+        size (tuple): Output (width, height) when the transform changes the frame
+            size (defaults to the clip's size)
+        encoder (dict): FFMPEG_VideoWriter settings such as codec, preset, threads and
+            ffmpeg_params (see encoder_profiles.encoder_args); defaults to libx264
+
+    Returns:
+        str: Path to the encoded video
+    """
+    audiofile = None
+    audio_codec = None
+    if clip.audio is not None:
+        name, _ = os.path.splitext(os.path.basename(output_file))
+        audiofile = os.path.join(os.path.dirname(output_file), f"{name}TEMP_MPY_wvf_snd.mp3")
+        clip.audio.write_audiofile(audiofile, 44100, 4, 2000, "libmp3lame", logger=None)
+        audio_codec = "copy"
+
+    try:
+        with FFMPEG_VideoWriter(output_file, size or clip.size, clip.fps,
+                                audiofile=audiofile, audio_codec=audio_codec,
+                                **(encoder or {'codec': 'libx264'})) as writer:
+            for batch in iter_frame_batches(clip, batch_size):
+                for frame in transform(batch):
+                    writer.write_frame(frame)
+    finally:
+        if audiofile and os.path.exists(audiofile):
+            os.remove(audiofile)
+
+    return output_file
@@ -0,0 +1,286 @@
+"""
+Frame Pipeline Module
+Frame-level decode -> effect -> encode pipeline over a shared-memory ring buffer
+"""
+
+import os
+import time
+import queue
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+from moviepy import VideoFileClip
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+from effects import EffectChain, DECODER_SCALE_ALGORITHM, plan_chain
+from encoder_profiles import DEFAULT_PROFILE, encoder_args
+from ffmpeg_utils import run_ffmpeg
+
+
+# Ring buffer slots per effect worker
+SLOTS_PER_WORKER = 4
+
+# Seconds to wait on a queue before checking that the child processes are alive
+POLL_INTERVAL = 1.0
+
+
+def _attach_slots(shm_name, num_slots, slot_bytes):
+    """
+    Map the ring buffer into the current process
+
+    Args:
+        shm_name (str): Name of the shared memory block
+        num_slots (int): Number of frame slots in the ring
+        slot_bytes (int): Size of one slot, enough for an input or an output frame
+
+    Returns:
+        tuple: (SharedMemory handle, uint8 array of shape (num_slots, slot_bytes))
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    slots = np.ndarray((num_slots, slot_bytes), dtype=np.uint8, buffer=shm.buf)
+    return shm, slots
+
+
+def _frame_view(slots, slot, frame_shape):
+    """
+    View the start of a slot as a frame
+
+    Args:
+        slots (numpy.ndarray): Ring buffer from _attach_slots
+        slot (int): Slot index
+        frame_shape (tuple): (height, width, 3)
+
+    Returns:
+        numpy.ndarray: uint8 frame backed by the slot's memory
+    """
+    return slots[slot, :int(np.prod(frame_shape))].reshape(frame_shape)
+
+
+def _decode_frames(input_path, shm_name, num_slots, slot_bytes, frame_shape, free_slots, ready,
+                   num_workers, decode_size=None):
+    """
+    Decoder process: fill free slots with frames in presentation order
+
+    Args:
+        input_path (str): Path to input video file
+        shm_name (str): Name of the shared memory block
+        num_slots (int): Number of frame slots in the ring
+        slot_bytes (int): Size of one slot in bytes
+        frame_shape (tuple): Decoded (height, width, 3)
+        free_slots (Queue): Slot indices ready to be filled
+        ready (Queue): Receives (frame index, slot) for the effect workers
+        num_workers (int): Number of effect workers to send a stop marker to
+        decode_size (tuple): Optional (width, height) ffmpeg scales frames to while decoding
+    """
+    shm, slots = _attach_slots(shm_name, num_slots, slot_bytes)
+    clip = VideoFileClip(
+        input_path, audio=False, target_resolution=decode_size,
+        resize_algorithm=DECODER_SCALE_ALGORITHM
+    )
+
+    try:
+        for idx, frame in enumerate(clip.iter_frames(dtype="uint8")):
+            slot = free_slots.get()
+            _frame_view(slots, slot, frame_shape)[:] = frame[..., :3]
+            ready.put((idx, slot))
+    finally:
+        clip.close()
+        for _ in range(num_workers):
+            ready.put(None)
+        del slots
+        shm.close()
+
+
+def _transform_frames(shm_name, num_slots, slot_bytes, frame_shape, effects, ready, transformed):
+    """
+    Effect worker process: run the effect chain on frames inside their slot
+
+    The result is written back to the start of the same slot; when the chain
+    changes the frame size the encoder reads it with the output shape.
+
+    Args:
+        shm_name (str): Name of the shared memory block
+        num_slots (int): Number of frame slots in the ring
+        slot_bytes (int): Size of one slot in bytes
+        frame_shape (tuple): Decoded (height, width, 3)
+        effects (list): Effect specs (see effects.EffectChain)
+        ready (Queue): Decoded (frame index, slot) items, None to stop
+        transformed (Queue): Receives (frame index, slot) once the frame is done
+    """
+    shm, slots = _attach_slots(shm_name, num_slots, slot_bytes)
+    chain = EffectChain(effects)
+
+    try:
+        while True:
+            item = ready.get()
+            if item is None:
+                break
+            frame = _frame_view(slots, item[1], frame_shape)
+            result = chain.apply(frame[np.newaxis])[0]
+            in_place = result.shape == frame.shape and result.ctypes.data == frame.ctypes.data
+            if not in_place:
+                # A resized, cropped or new frame goes back to the start of the slot;
+                # copy first because it may alias the slot's memory
+                result = np.array(result)
+                _frame_view(slots, item[1], result.shape)[:] = result
+            transformed.put(item)
+    finally:
+        transformed.put(None)
+        del slots
+        shm.close()
+
+
+def _get_checked(q, processes):
+    """
+    Block on a queue, failing instead of hanging if a child process crashed
+
+    Args:
+        q (Queue): Queue to read from
+        processes (list): Child processes feeding the queue
+
+    Returns:
+        object: Next item from the queue
+
+    Raises:
+        RuntimeError: If a child process exited with an error
+    """
+    while True:
+        try:
+            return q.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            for proc in processes:
+                if proc.exitcode not in (None, 0):
+                    raise RuntimeError(f"Frame pipeline process {proc.name} exited with code {proc.exitcode}")
+
+
+def run_frame_pipeline(input_path, output_path, workers, progress_callback=None, effects=None,
+                       encoder_profile=DEFAULT_PROFILE):
+    """
+    Render a video through a decoder process, N effect workers and an in-order encoder
+
+    Frames never leave the shared ring buffer: the decoder writes each frame
+    into a free slot, an effect worker transforms it in place, and the encoder
+    (this process) writes slots to ffmpeg in frame order and recycles them.
+
+    Args:
+        input_path (str): Path to input video file
+        output_path (str): Path for the rendered video
+        workers (int): Number of effect worker processes
+        progress_callback (callable): Optional callback for progress updates
+        effects (list): Effect specs (defaults to grayscale only); every effect must
+            be per-frame, since workers finish frames out of order
+        encoder_profile (str): Encoder profile (see encoder_profiles.PROFILES)
+
+    Returns:
+        dict: Pipeline stats (frames, time, fps, workers)
+
+    Raises:
+        RuntimeError: If the chain contains an effect that is not per-frame
+    """
+    probe = VideoFileClip(input_path)
+    width, height = probe.size
+    fps = probe.fps
+    expected_frames = max(1, int(probe.duration * fps))
+    has_audio = probe.audio is not None
+    probe.close()
+
+    # Downscale first, in the decoder when the chain allows it
+    decode_size, effects = plan_chain(effects, (width, height))
+    if decode_size:
+        width, height = decode_size
+
+    chain = EffectChain(effects)
+    if not chain.per_frame:
+        raise RuntimeError("The frame pipeline only runs per-frame effects; temporal effects "
+                           "need frames in order")
+
+    frame_shape = (height, width, 3)
+    out_width, out_height = chain.output_size((width, height))
+    out_shape = (out_height, out_width, 3)
+    slot_bytes = max(height * width, out_height * out_width) * 3
+    num_slots = workers * SLOTS_PER_WORKER
+    shm = shared_memory.SharedMemory(create=True, size=num_slots * slot_bytes)
+
+    free_slots = multiprocessing.Queue()
+    ready = multiprocessing.Queue()
+    transformed = multiprocessing.Queue()
+    for slot in range(num_slots):
+        free_slots.put(slot)
+
+    processes = [multiprocessing.Process(
+        target=_decode_frames, name="decoder",
+        args=(input_path, shm.name, num_slots, slot_bytes, frame_shape, free_slots, ready, workers,
+              decode_size)
+    )]
+    processes += [
+        multiprocessing.Process(
+            target=_transform_frames, name=f"effect-{i}",
+            args=(shm.name, num_slots, slot_bytes, frame_shape, effects, ready, transformed)
+        )
+        for i in range(workers)
+    ]
+
+    video_path = f"{output_path}.video.mp4" if has_audio else output_path
+    slots = np.ndarray((num_slots, slot_bytes), dtype=np.uint8, buffer=shm.buf)
+    start = time.time()
+    written = 0
+
+    try:
+        for proc in processes:
+            proc.start()
+
+        # Reorder buffer: frame index -> slot, for frames finished out of order
+        pending = {}
+        finished_workers = 0
+        # The decoder and the effect workers keep their own cores busy
+        encoder = encoder_args(encoder_profile, max(1, multiprocessing.cpu_count() - workers - 1))
+        with FFMPEG_VideoWriter(video_path, (out_width, out_height), fps, **encoder) as writer:
+            while finished_workers < workers:
+                item = _get_checked(transformed, processes)
+                if item is None:
+                    finished_workers += 1
+                    continue
+                pending[item[0]] = item[1]
+
+                while written in pending:
+                    slot = pending.pop(written)
+                    writer.write_frame(_frame_view(slots, slot, out_shape))
+                    free_slots.put(slot)
+                    written += 1
+                    if progress_callback:
+                        progress_callback(min(1.0, written / expected_frames))
+
+        for proc in processes:
+            proc.join()
+            if proc.exitcode != 0:
+                raise RuntimeError(f"Frame pipeline process {proc.name} exited with code {proc.exitcode}")
+    finally:
+        for proc in processes:
+            if proc.is_alive():
+                proc.terminate()
+        del slots
+        shm.close()
+        shm.unlink()
+
+    if has_audio:
+        try:
+            run_ffmpeg([
+                "-i", video_path, "-i", input_path,
+                "-map", "0:v:0", "-map", "1:a:0",
+                "-c:v", "copy", "-c:a", "aac", "-shortest",
+                output_path
+            ])
+        finally:
+            os.remove(video_path)
+
+    elapsed = time.time() - start
+    if progress_callback:
+        progress_callback(1.0)
+
+    return {
+        'frames': written,
+        'time': elapsed,
+        'fps': written / elapsed if elapsed > 0 else 0,
+        'workers': workers
+    }
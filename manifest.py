@@ -0,0 +1,138 @@
+"""
+Manifest Module
+Per-job checkpoint of segment boundaries, outputs and checksums, so interrupted renders resume
+"""
+
+import os
+import json
+import threading
+
+from result_cache import ResultCache
+from workspace import atomic_output
+
+
+MANIFEST_NAME = "manifest.json"
+
+# Outputs recorded for each segment
+STAGES = ('split', 'processed')
+
+
+class RenderManifest:
+    """
+    JSON checkpoint listing every segment of a render and its finished outputs
+
+    Each segment has its (start, end) boundaries and, per stage, a status,
+    the output path and the output's SHA-256. The file is rewritten
+    atomically after every update, so a crash leaves the last consistent
+    state. A fingerprint of the input and render settings guards against
+    reusing outputs of a different render.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize RenderManifest, loading the file if it exists
+
+        Args:
+            path (str): Path of the manifest file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = self._load()
+
+    def _load(self):
+        """Read the manifest file, or start empty if it is missing or unreadable"""
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {'fingerprint': None, 'segments': []}
+
+    def _save(self):
+        """Write the manifest atomically (caller holds the lock)"""
+        with atomic_output(self.path) as partial_path:
+            with open(partial_path, "w") as f:
+                json.dump(self.data, f, indent=1)
+
+    def matches(self, fingerprint, boundaries):
+        """
+        Check whether the manifest belongs to the same input, settings and segments
+
+        Args:
+            fingerprint (str): Key of the input and render settings
+            boundaries (list): (start, end) of each segment
+
+        Returns:
+            bool: True if outputs recorded here can be reused
+        """
+        recorded = [[segment['start'], segment['end']] for segment in self.data['segments']]
+        return (self.data['fingerprint'] == fingerprint
+                and recorded == [list(boundary) for boundary in boundaries])
+
+    def reset(self, fingerprint, boundaries):
+        """
+        Start a new manifest with every segment pending
+
+        Args:
+            fingerprint (str): Key of the input and render settings
+            boundaries (list): (start, end) of each segment
+        """
+        with self._lock:
+            self.data = {
+                'fingerprint': fingerprint,
+                'segments': [
+                    {'index': idx, 'start': start, 'end': end,
+                     **{stage: {'status': 'pending'} for stage in STAGES}}
+                    for idx, (start, end) in enumerate(boundaries)
+                ]
+            }
+            self._save()
+
+    def record(self, idx, stage, path, checksum):
+        """
+        Mark a segment's output as finished
+
+        Args:
+            idx (int): Segment index
+            stage (str): "split" or "processed"
+            path (str): Output file
+            checksum (str): SHA-256 of the output
+        """
+        with self._lock:
+            self.data['segments'][idx][stage] = {'status': 'done', 'path': path, 'checksum': checksum}
+            self._save()
+
+    def verified_output(self, idx, stage):
+        """
+        Get a finished output that is still intact
+
+        Args:
+            idx (int): Segment index
+            stage (str): "split" or "processed"
+
+        Returns:
+            str: Output path, or None if the output is pending, missing or corrupt
+                (its checksum no longer matches)
+        """
+        with self._lock:
+            entry = dict(self.data['segments'][idx][stage])
+        if entry['status'] != 'done' or not os.path.isfile(entry['path']):
+            return None
+        if ResultCache.file_hash(entry['path']) != entry['checksum']:
+            return None
+        return entry['path']
+
+    def counts(self):
+        """
+        Count finished outputs per stage
+
+        Returns:
+            dict: Number of segments whose output is done, by stage, plus the total
+        """
+        with self._lock:
+            segments = self.data['segments']
+            counts = {
+                stage: sum(segment[stage]['status'] == 'done' for segment in segments)
+                for stage in STAGES
+            }
+            counts['total'] = len(segments)
+            return counts
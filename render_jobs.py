@@ -0,0 +1,561 @@
+"""
+Render Jobs Module
+Background render jobs with persistent status in SQLite, decoupled from the Streamlit script run
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import sqlite3
+import threading
+import traceback
+import contextlib
+
+from video_processor import VideoProcessor, DEFAULT_SEGMENT_TIMEOUT
+from result_cache import ResultCache
+from ffmpeg_utils import probe_duration
+from workspace import create_workspace
+from encoder_profiles import DEFAULT_PROFILE
+from effects import EFFECTS
+from broker import get_broker
+from file_server import unpublish
+
+
+JOBS_DIR = "render_jobs"
+DB_PATH = os.path.join(JOBS_DIR, "jobs.db")
+
+# Minimum interval between progress writes for one job, in seconds
+PROGRESS_WRITE_INTERVAL = 0.5
+
+# Uploads are copied and hashed this many bytes at a time
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+# Jobs that stopped before finishing; their input and intermediates are kept to resume from
+RESUMABLE_STATUSES = ('failed', 'interrupted')
+
+# Threads rendering in this process, by job id
+_threads = {}
+_threads_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _database():
+    """
+    Open a connection to the job database, creating the schema if needed
+
+    Commits on success and always closes the connection.
+
+    Yields:
+        sqlite3.Connection: Connection with row access by column name
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            stage TEXT,
+            progress TEXT NOT NULL DEFAULT '{}',
+            settings TEXT NOT NULL,
+            input_name TEXT,
+            input_path TEXT,
+            input_hash TEXT,
+            queues TEXT,
+            work_dir TEXT,
+            output_path TEXT,
+            result TEXT,
+            error TEXT,
+            owner TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    # Databases created before a column existed get it added in place
+    columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+    for column in ('input_hash', 'queues', 'work_dir', 'owner'):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _update_job(job_id, **fields):
+    """
+    Update columns of a job row (dict values are stored as JSON)
+
+    Args:
+        job_id (str): Job id
+        **fields: Column values to set
+    """
+    fields['updated_at'] = time.time()
+    for key, value in fields.items():
+        if isinstance(value, dict):
+            fields[key] = json.dumps(value)
+    assignments = ", ".join(f"{key} = ?" for key in fields)
+    with _database() as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+def _row_to_job(row):
+    """
+    Convert a database row to a job dict
+
+    Args:
+        row (sqlite3.Row): Job row
+
+    Returns:
+        dict: Job with JSON columns decoded
+    """
+    job = dict(row)
+    for key in ('progress', 'settings', 'result', 'queues'):
+        job[key] = json.loads(job[key]) if job[key] else None
+    return job
+
+
+def job_directory(job_id):
+    """
+    Get the working directory of a job
+
+    Args:
+        job_id (str): Job id
+
+    Returns:
+        str: Directory holding the job's input, intermediates and output
+    """
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def create_render_job(input_name, settings, owner=None):
+    """
+    Register a new render job and reserve its working directory
+
+    The caller writes the input video to the returned path (usually with
+    save_upload), then calls start_render_job.
+
+    Args:
+        input_name (str): Original file name of the input video
+        settings (dict): Render settings (see the app's render_sidebar)
+        owner (str): Token of the browser session that created the job; get_job and
+            list_jobs given this token are the only way to find the job again
+
+    Returns:
+        tuple: (job id, path where the input video should be written)
+    """
+    job_id = uuid.uuid4().hex[:12]
+    os.makedirs(job_directory(job_id), exist_ok=True)
+    input_path = os.path.join(job_directory(job_id), f"input_{os.path.basename(input_name)}")
+    now = time.time()
+
+    with _database() as conn:
+        conn.execute(
+            "INSERT INTO jobs (id, status, settings, input_name, input_path, owner, created_at, updated_at) "
+            "VALUES (?, 'created', ?, ?, ?, ?, ?, ?)",
+            (job_id, json.dumps(settings), input_name, input_path, owner, now, now)
+        )
+    return job_id, input_path
+
+
+def save_upload(job_id, stream, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Stream an uploaded video into the job's directory, hashing it on the way
+
+    The data is copied in fixed-size chunks, so memory use does not grow
+    with the file size, and lands under a temporary name that is renamed
+    into place only once complete. On failure the partial file and the job
+    are removed. The SHA-256 is stored with the job and reused as the
+    result cache's source hash, so the input is never read twice.
+
+    Args:
+        job_id (str): Job id from create_render_job
+        stream (file-like): Binary stream positioned at the start of the upload
+        chunk_size (int): Bytes copied per read
+
+    Returns:
+        str: Hex SHA-256 of the upload
+    """
+    input_path = get_job(job_id)['input_path']
+    partial_path = f"{input_path}.part"
+    digest = hashlib.sha256()
+
+    try:
+        with open(partial_path, "wb") as f:
+            for chunk in iter(lambda: stream.read(chunk_size), b""):
+                digest.update(chunk)
+                f.write(chunk)
+        os.replace(partial_path, input_path)
+    except BaseException:
+        delete_job(job_id)
+        raise
+
+    _update_job(job_id, input_hash=digest.hexdigest())
+    return digest.hexdigest()
+
+
+def save_effect_file(job_id, effect, stream, extension=".png"):
+    """
+    Store a file an effect reads (e.g. an overlay image) in the job's directory
+
+    Web users upload such files rather than naming paths on the server, so a
+    job only ever reads files that were handed to it. Every spec of the
+    effect in the job's settings is pointed at the stored copy.
+
+    Args:
+        job_id (str): Job id from create_render_job
+        effect (str): Effect name, e.g. "overlay"
+        stream (file-like): Binary stream of the upload
+        extension (str): File extension to store the upload under
+
+    Returns:
+        str: Path of the stored file
+    """
+    job = get_job(job_id)
+    path = os.path.join(job_directory(job_id), f"effect_{effect}{extension}")
+    with open(path, "wb") as f:
+        shutil.copyfileobj(stream, f, UPLOAD_CHUNK_SIZE)
+
+    settings = job['settings']
+    for spec in settings.get('effects') or []:
+        if spec['name'] == effect:
+            spec.update({param: path for param in EFFECTS[effect].files})
+    _update_job(job_id, settings=settings)
+    return path
+
+
+def delete_job(job_id):
+    """
+    Remove a job's row, its whole working directory and its scratch directory
+
+    Args:
+        job_id (str): Job id
+    """
+    job = get_job(job_id)
+    if job and job['work_dir']:
+        shutil.rmtree(job['work_dir'], ignore_errors=True)
+    # Its output's download links must die with it
+    unpublish(job_directory(job_id))
+    shutil.rmtree(job_directory(job_id), ignore_errors=True)
+    with _database() as conn:
+        conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+
+def _discard_scratch(job_id, keep):
+    """
+    Delete everything in a job's directory except the files to keep
+
+    Args:
+        job_id (str): Job id
+        keep (set): Paths to keep (e.g. the final output)
+    """
+    work_dir = job_directory(job_id)
+    keep = {os.path.abspath(path) for path in keep}
+    for name in os.listdir(work_dir):
+        path = os.path.join(work_dir, name)
+        if os.path.abspath(path) in keep:
+            continue
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+
+def start_render_job(job_id):
+    """
+    Run a created job on a background thread
+
+    Args:
+        job_id (str): Job id
+    """
+    thread = threading.Thread(target=_run_render_job, args=(job_id,), name=f"render-{job_id}", daemon=True)
+    # Register the thread first so recover_interrupted_jobs never sees a queued job without one
+    with _threads_lock:
+        _threads[job_id] = thread
+    _update_job(job_id, status='queued')
+    thread.start()
+
+
+def can_resume(job):
+    """
+    Check whether a job that stopped early can be resumed
+
+    Args:
+        job (dict): Job from get_job
+
+    Returns:
+        bool: True if the job failed or was interrupted and its input is still there
+    """
+    return job['status'] in RESUMABLE_STATUSES and os.path.isfile(job['input_path'])
+
+
+def resume_render_job(job_id):
+    """
+    Restart a failed or interrupted job, reusing the segments it already finished
+
+    Segments recorded in the job's manifest are verified against their
+    checksums; only missing or corrupt ones are split or processed again.
+
+    Args:
+        job_id (str): Job id
+
+    Raises:
+        RuntimeError: If the job cannot be resumed
+    """
+    job = get_job(job_id)
+    if job is None or not can_resume(job):
+        raise RuntimeError(f"Job {job_id} cannot be resumed")
+    _update_job(job_id, error=None, queues=None)
+    start_render_job(job_id)
+
+
+def get_job(job_id, owner=None):
+    """
+    Read a job's persistent state
+
+    Args:
+        job_id (str): Job id
+        owner (str): If given, only return the job if it was created with this owner token
+
+    Returns:
+        dict: Job fields, or None if the id is unknown (or belongs to another owner)
+    """
+    with _database() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None or (owner is not None and row['owner'] != owner):
+        return None
+    return _row_to_job(row)
+
+
+def list_jobs(owner, limit=20):
+    """
+    List the most recent jobs of one owner
+
+    Args:
+        owner (str): Owner token the jobs were created with (see create_render_job)
+        limit (int): Maximum number of jobs
+
+    Returns:
+        list: Job dicts, newest first
+    """
+    with _database() as conn:
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE owner = ? ORDER BY created_at DESC LIMIT ?", (owner, limit)
+        ).fetchall()
+    return [_row_to_job(row) for row in rows]
+
+
+def recover_interrupted_jobs():
+    """
+    Mark active jobs that no thread in this process is running as interrupted
+
+    Called on start-up: after a server restart the rendering threads are
+    gone, but their rows still say queued/running.
+
+    Returns:
+        int: Number of jobs marked interrupted
+    """
+    with _threads_lock:
+        alive = {job_id for job_id, thread in _threads.items() if thread.is_alive()}
+
+    with _database() as conn:
+        rows = conn.execute(
+            f"SELECT id FROM jobs WHERE status IN ({', '.join('?' * len(ACTIVE_STATUSES))})",
+            ACTIVE_STATUSES
+        ).fetchall()
+
+    orphaned = [row['id'] for row in rows if row['id'] not in alive]
+    for job_id in orphaned:
+        _update_job(job_id, status='interrupted', error='Server restarted while the job was running')
+    return len(orphaned)
+
+
+def _progress_reporter(job_id, progress, stage):
+    """
+    Build a progress callback that persists a stage's progress at a bounded rate
+
+    Args:
+        job_id (str): Job id
+        progress (dict): Per-stage progress, shared across stages of the job
+        stage (str): Stage name
+
+    Returns:
+        callable: Callback taking a fraction between 0 and 1
+    """
+    last_write = [0.0]
+
+    def report(fraction):
+        progress[stage] = fraction
+        now = time.time()
+        if fraction >= 1.0 or now - last_write[0] >= PROGRESS_WRITE_INTERVAL:
+            last_write[0] = now
+            _update_job(job_id, stage=stage, progress=progress)
+
+    report(0.0)
+    return report
+
+
+def _queue_reporter(job_id):
+    """
+    Build a callback that persists a streaming job's per-stage queue depths at a bounded rate
+
+    Args:
+        job_id (str): Job id
+
+    Returns:
+        callable: Callback taking a dict of queue depths by stage
+    """
+    last_write = [0.0]
+
+    def report(depths):
+        now = time.time()
+        if not any(depths.values()) or now - last_write[0] >= PROGRESS_WRITE_INTERVAL:
+            last_write[0] = now
+            _update_job(job_id, queues=depths)
+
+    return report
+
+
+def _run_baseline(job_id, processor, segments, baseline, progress):
+    """
+    Measure or estimate the sequential baseline of a job
+
+    Args:
+        job_id (str): Job id
+        processor (VideoProcessor): Processor that split the video
+        segments (list): Segment paths or time ranges
+        baseline (str): "full", "sampled" or "skip"
+        progress (dict): Per-stage progress of the job
+
+    Returns:
+        dict: seq_time (None when skipped), plus seq_estimate for a sampled baseline
+    """
+    if baseline == 'full':
+        _, seq_time = processor.process_sequential(
+            segments, _progress_reporter(job_id, progress, 'sequential')
+        )
+        return {'seq_time': seq_time}
+    if baseline == 'sampled':
+        estimate = processor.estimate_sequential(
+            segments, progress_callback=_progress_reporter(job_id, progress, 'sequential')
+        )
+        return {'seq_estimate': estimate, 'seq_time': estimate['time']}
+    return {'seq_time': None}
+
+
+def _run_render_job(job_id):
+    """
+    Split, process and stitch one job, persisting progress and results
+
+    Args:
+        job_id (str): Job id
+    """
+    job = get_job(job_id)
+    settings = job['settings']
+    work_dir = job_directory(job_id)
+    final_output = os.path.join(work_dir, "final_output.mp4")
+    progress = {}
+    result = {}
+    processor = None
+    finished = False
+
+    try:
+        # Intermediates go to a private scratch directory (tmpfs when available);
+        # only the input and the final output live in the job directory. A resumed
+        # job picks up its previous scratch directory and the manifest in it
+        resume = bool(job['work_dir']) and os.path.isdir(job['work_dir'])
+        scratch_dir = job['work_dir'] if resume else create_workspace(prefix=f"job_{job_id}_")
+        _update_job(job_id, status='running', work_dir=scratch_dir)
+        processor = VideoProcessor(
+            settings['segment_duration'],
+            split_mode=settings['split_mode'],
+            grayscale_engine=settings['grayscale_engine'],
+            cache=ResultCache() if settings['use_cache'] else None,
+            priority=settings['priority'],
+            work_dir=scratch_dir,
+            effects=settings.get('effects'),
+            output_height=settings.get('output_height'),
+            encoder_profile=settings.get('encoder_profile', DEFAULT_PROFILE),
+            resume=resume,
+            segment_timeout=settings.get('segment_timeout', DEFAULT_SEGMENT_TIMEOUT) or None,
+            broker=get_broker() if settings.get('distributed') else None
+        )
+        if job['input_hash']:
+            processor.source_path = job['input_path']
+            processor.source_hash = job['input_hash']
+
+        baseline = settings.get('baseline', 'full')
+        if processor.fetch_cached_output(job['input_path'], final_output):
+            result.update(cached=True, duration=probe_duration(final_output))
+        elif settings.get('pipeline') == 'streaming':
+            # Split, process and stitch overlap; the baseline reuses the split segments
+            stream = processor.process_streaming(
+                job['input_path'], final_output,
+                {stage: _progress_reporter(job_id, progress, stage)
+                 for stage in ('split', 'parallel', 'stitch')},
+                queue_callback=_queue_reporter(job_id)
+            )
+            segments = stream['segments']
+            result.update(
+                duration=stream['duration'], segments=len(segments), par_time=stream['par_time'],
+                workers=stream['workers'], stitch_method=stream['stitch_method'],
+                pipeline_time=stream['time'], stage_times=stream['stage_times'],
+                queue_peaks=stream['queue_peaks'], segment_stats=processor.segment_stats,
+                cache_hits=processor.cache_hits['process']
+            )
+            if processor.resuming:
+                baseline = 'skip'
+            result.update(_run_baseline(job_id, processor, segments, baseline, progress))
+        else:
+            segments, duration = processor.split_video(
+                job['input_path'], _progress_reporter(job_id, progress, 'split')
+            )
+            result.update(duration=duration, segments=len(segments))
+            if processor.resuming:
+                baseline = 'skip'
+            result.update(_run_baseline(job_id, processor, segments, baseline, progress))
+
+            par_results, result['par_time'], result['workers'] = processor.process_parallel(
+                segments, _progress_reporter(job_id, progress, 'parallel')
+            )
+            result['segment_stats'] = processor.segment_stats
+            result['cache_hits'] = processor.cache_hits['process']
+
+            report_stitch = _progress_reporter(job_id, progress, 'stitch')
+            result['stitch_method'] = processor.stitch_segments(par_results, final_output)
+            report_stitch(1.0)
+
+        if not result.get('cached'):
+            processor.store_output(job['input_path'], final_output)
+            result['resumed'] = processor.resumed if processor.resuming else None
+            # Timings of a resumed run only cover the redone segments, so the
+            # comparisons are skipped along with the baseline
+            if (settings.get('compare_frame_pipeline') and processor.effect_chain.per_frame
+                    and not processor.resuming):
+                _, result['frame_time'], result['frame_workers'] = processor.process_frame_pipeline(
+                    job['input_path'],
+                    os.path.join(processor.work_dir, "frame_pipeline_output.mp4"),
+                    _progress_reporter(job_id, progress, 'frame_pipeline')
+                )
+                result['frame_fps'] = processor.frame_pipeline_stats['fps']
+
+        _update_job(job_id, status='done', output_path=final_output, result=result)
+        finished = True
+    except Exception as e:
+        _update_job(job_id, status='failed', error=f"{e}\n{traceback.format_exc()}")
+    finally:
+        # The input and intermediates are only needed while rendering; a failed
+        # job keeps them so it can be resumed
+        if finished:
+            processor.cleanup()
+            _discard_scratch(job_id, keep={final_output})
+            _update_job(job_id, work_dir=None)
+        with _threads_lock:
+            _threads.pop(job_id, None)
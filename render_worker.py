@@ -0,0 +1,303 @@
+"""
+Render Worker
+Pulls segment jobs from a coordinator's broker, renders them on this host and pushes the results back
+
+Usage:
+    RENDER_BROKER_AUTHKEY=secret python render_worker.py coordinator:8503 --slots 8
+"""
+
+import os
+import sys
+import time
+import queue
+import shutil
+import socket
+import argparse
+import importlib
+import threading
+import multiprocessing
+
+from broker import connect_broker, AUTHKEY
+from scheduler import get_scheduler
+from worker_pool import shutdown_pool
+from workspace import create_workspace
+from encoder_profiles import threads_per_encoder
+
+
+# Seconds to wait for a result before asking the broker for new tasks again
+POLL_INTERVAL = 0.5
+
+
+def resolve_function(name):
+    """
+    Import a function from its "module:qualname" name
+
+    Args:
+        name (str): e.g. "video_processor:VideoProcessor._run_timed_job"
+
+    Returns:
+        callable: The function
+    """
+    module_name, _, qualname = name.partition(":")
+    target = importlib.import_module(module_name)
+    for attribute in qualname.split("."):
+        target = getattr(target, attribute)
+    return target
+
+
+def _heartbeat(broker, worker_id, slots, interval, stop, log):
+    """
+    Send heartbeats until stopped, registering again if the broker gave up on this worker
+
+    Args:
+        broker (BaseProxy): Broker proxy
+        worker_id (str): Worker name
+        slots (int): Segments rendered at once
+        interval (float): Seconds between heartbeats
+        stop (threading.Event): Set when the worker shuts down
+        log (callable): Receives human-readable progress lines
+    """
+    while not stop.wait(interval):
+        try:
+            if not broker.heartbeat(worker_id):
+                log(f"[worker] {worker_id}: broker lost track of this worker, registering again")
+                broker.register(worker_id, slots)
+        except (OSError, EOFError) as e:
+            log(f"[worker] {worker_id}: heartbeat failed: {e}")
+
+
+def _download(read, size, path):
+    """
+    Fetch a file from the broker in chunks
+
+    Args:
+        read (callable): Returns the chunk at a byte offset, e.g. a bound broker.fetch
+        size (int): File size in bytes
+        path (str): Local path to write
+    """
+    with open(path, "wb") as f:
+        while f.tell() < size:
+            chunk = read(f.tell())
+            if not chunk:
+                raise RuntimeError(f"Download of {os.path.basename(path)} ended early")
+            f.write(chunk)
+
+
+def _download_assets(broker, lease, scratch_dir):
+    """
+    Fetch the files a leased task's effects read and point the effects at the copies
+
+    Args:
+        broker (BaseProxy): Broker proxy
+        lease (dict): Lease from the broker
+        scratch_dir (str): Directory for the copies
+
+    Returns:
+        tuple: (task options with local file paths, list of downloaded paths)
+    """
+    options = dict(lease['options'])
+    effects = [dict(spec) for spec in options.get('effects') or []]
+    paths = []
+    for number, asset in enumerate(lease['assets']):
+        path = os.path.join(scratch_dir, f"{lease['token']}_asset{number}_{asset['name']}")
+        paths.append(path)
+        _download(
+            lambda offset, number=number: broker.fetch_asset(lease['token'], number, offset),
+            asset['size'], path
+        )
+        effects[asset['effect']][asset['param']] = path
+    if effects:
+        options['effects'] = effects
+    return options, paths
+
+
+def _fail_lease(broker, token, error, log):
+    """
+    Report a lease this worker cannot finish, so the broker retries or fails the task
+
+    A lease the broker already gave up on is ignored by it.
+
+    Args:
+        broker (BaseProxy): Broker proxy
+        token (int): Lease token
+        error (Exception): Why the lease cannot be finished
+        log (callable): Receives human-readable progress lines
+    """
+    try:
+        broker.fail(token, f"{type(error).__name__}: {error}")
+    except (OSError, EOFError) as e:
+        log(f"[worker] lease {token}: could not report the failure, {e}")
+
+
+def _discard_files(scratch_dir, token):
+    """
+    Delete every file downloaded or rendered for a lease
+
+    Args:
+        scratch_dir (str): Worker scratch directory
+        token (int): Lease token
+    """
+    for name in os.listdir(scratch_dir):
+        if name.startswith(f"{token}_"):
+            os.remove(os.path.join(scratch_dir, name))
+
+
+def _upload(broker, token, path, chunk_size):
+    """
+    Push a finished output to the broker in chunks
+
+    Args:
+        broker (BaseProxy): Broker proxy
+        token (int): Lease token
+        path (str): Local output file
+        chunk_size (int): Bytes per upload call
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            chunk = f.read(chunk_size)
+            broker.upload(token, offset, chunk)
+            offset += len(chunk)
+            if len(chunk) < chunk_size:
+                return
+
+
+def run_worker(address, authkey=AUTHKEY, slots=None, work_dir=None, log=print, stop=None):
+    """
+    Render segments for a broker until stopped
+
+    Leased tasks run on this host's own supervised scheduler, so the
+    segment timeout, worker recycling and warm pool all apply here too;
+    retries are left to the broker, which may hand a failed segment to
+    another worker.
+
+    Args:
+        address (str): Broker address as "host:port"
+        authkey (str): Shared secret (defaults to RENDER_BROKER_AUTHKEY)
+        slots (int): Segments rendered at once (defaults to the CPU count)
+        work_dir (str): Parent of the worker's scratch directory (defaults to the
+            scratch root chosen by workspace.default_scratch_root)
+        log (callable): Receives human-readable progress lines
+        stop (threading.Event): Optional event that stops the worker when set
+
+    Returns:
+        int: Number of segments rendered
+    """
+    slots = slots or multiprocessing.cpu_count()
+    stop = stop or threading.Event()
+    host = socket.gethostname()
+    worker_id = f"{host}:{os.getpid()}"
+    broker = connect_broker(address, authkey)
+    settings = broker.register(worker_id, slots)
+    scheduler = get_scheduler(slots)
+    threads = threads_per_encoder(slots)
+    scratch_dir = create_workspace(work_dir, prefix="render_worker_")
+    finished = queue.Queue()
+    active = {}
+    rendered = 0
+
+    threading.Thread(
+        target=_heartbeat, args=(broker, worker_id, slots, settings['heartbeat_interval'], stop, log),
+        name="worker-heartbeat", daemon=True
+    ).start()
+    log(f"[worker] {worker_id}: rendering up to {slots} segments at once for {address}")
+
+    try:
+        while not stop.is_set():
+            # Keep every slot busy
+            while len(active) < slots:
+                lease = broker.lease(worker_id)
+                if lease is None:
+                    break
+                token = lease['token']
+                input_path = os.path.join(scratch_dir, f"{token}_in_{lease['input_name']}")
+                output_path = os.path.join(scratch_dir, f"{token}_out_{lease['output_name']}")
+                try:
+                    _download(lambda offset: broker.fetch(token, offset), lease['size'], input_path)
+                    options, asset_paths = _download_assets(broker, lease, scratch_dir)
+                except (RuntimeError, OSError) as e:
+                    # Includes errors the broker raised remotely, e.g. a missing input
+                    log(f"[worker] segment {lease['index']}: dropped, {type(e).__name__}: {e}")
+                    _discard_files(scratch_dir, token)
+                    _fail_lease(broker, token, e, log)
+                    continue
+                active[token] = (lease, [input_path, output_path] + asset_paths)
+                options['threads'] = threads
+                scheduler.submit(
+                    resolve_function(lease['func']),
+                    [(lease['index'], (input_path, output_path, options))],
+                    on_result=lambda stats, error, token=token: finished.put((token, stats, error)),
+                    timeout=lease['timeout']
+                )
+
+            try:
+                token, stats, error = finished.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            lease, paths = active.pop(token)
+            output_path = paths[1]
+            try:
+                if error is not None:
+                    cause = error.__cause__ or error
+                    log(f"[worker] segment {lease['index']}: failed, {type(cause).__name__}: {cause}")
+                    broker.fail(token, f"{type(cause).__name__}: {cause}")
+                else:
+                    _upload(broker, token, output_path, settings['chunk_size'])
+                    broker.complete(token, dict(
+                        stats, pid=f"{host}:{stats['pid']}", worker=worker_id, reported_at=time.time()
+                    ))
+                    rendered += 1
+                    log(f"[worker] segment {lease['index']}: done in {stats['duration']:.2f}s")
+            except (RuntimeError, OSError) as e:
+                # The broker gave the segment to another worker meanwhile, or the
+                # upload failed; a lease that is still valid is retried elsewhere
+                log(f"[worker] segment {lease['index']}: result discarded, {type(e).__name__}: {e}")
+                _fail_lease(broker, token, e, log)
+            finally:
+                _discard_files(scratch_dir, token)
+    finally:
+        stop.set()
+        try:
+            broker.unregister(worker_id)
+        except (OSError, EOFError):
+            pass
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    return rendered
+
+
+def main(argv=None):
+    """
+    Command line entry point
+
+    Args:
+        argv (list): Arguments (defaults to sys.argv[1:])
+
+    Returns:
+        int: Process exit code
+    """
+    parser = argparse.ArgumentParser(
+        description="Render segments handed out by a coordinator's broker. "
+                    "The shared secret is read from RENDER_BROKER_AUTHKEY."
+    )
+    parser.add_argument("broker", help="Broker address as host:port")
+    parser.add_argument("--slots", type=int, default=multiprocessing.cpu_count(),
+                        help="Segments rendered at once")
+    parser.add_argument("--work-dir", help="Parent directory for downloaded and rendered segments")
+    args = parser.parse_args(argv)
+
+    try:
+        run_worker(args.broker, slots=args.slots, work_dir=args.work_dir)
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(f"[worker] {e}", file=sys.stderr)
+        return 1
+    finally:
+        shutdown_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Result Cache Module
+On-disk, content-addressed cache of processed segments and final outputs with LRU eviction
+"""
+
+import os
+import json
+import shutil
+import hashlib
+
+from workspace import atomic_output
+
+
+DEFAULT_CACHE_DIR = "render_cache"
+
+# Default size bound for the cache directory (2 GB)
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# Read size used when hashing files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class ResultCache:
+    """Size-bounded cache mapping a content key to a rendered video file"""
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Initialize ResultCache
+
+        Args:
+            root (str): Directory holding the cached files
+            max_bytes (int): Total size above which least recently used entries are evicted
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def file_hash(path):
+        """
+        Compute the SHA-256 of a file's contents
+
+        Args:
+            path (str): Path to the file
+
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(**parts):
+        """
+        Build a cache key from everything that determines a result
+
+        Args:
+            **parts: JSON-serialisable values (input hash, boundaries, effect, encoder, ...)
+
+        Returns:
+            str: Hex digest identifying the result
+        """
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        """Path of the cache file for a key"""
+        return os.path.join(self.root, f"{key}.mp4")
+
+    def get(self, key, dest_path):
+        """
+        Copy a cached result to dest_path if present
+
+        Args:
+            key (str): Cache key
+            dest_path (str): Where the cached file should be placed
+
+        Returns:
+            bool: True on a cache hit
+        """
+        entry = self._entry_path(key)
+        if not os.path.exists(entry):
+            return False
+        try:
+            # Readers of dest_path never see a partial copy
+            with atomic_output(dest_path) as partial_path:
+                shutil.copyfile(entry, partial_path)
+            # Mark as recently used for LRU eviction
+            os.utime(entry)
+        except FileNotFoundError:
+            # Evicted by another job in the meantime
+            return False
+        return True
+
+    def put(self, key, src_path):
+        """
+        Store a result file under a key, then evict old entries if over budget
+
+        Args:
+            key (str): Cache key
+            src_path (str): Rendered file to store
+        """
+        # Each put copies to its own partial file, so render-job threads
+        # storing the same key at once never write into one another's copy
+        with atomic_output(self._entry_path(key)) as partial_path:
+            shutil.copyfile(src_path, partial_path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for name in os.listdir(self.root):
+            # Skip partial copies (see workspace.atomic_output) that a put is still writing
+            if not name.endswith(".mp4") or name.startswith("."):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.root, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.root, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove every cached entry"""
+        if os.path.exists(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
@@ -0,0 +1,638 @@
+"""
+Scheduler Module
+Process-wide segment scheduler shared by every render job and Streamlit session
+"""
+
+import os
+import time
+import queue
+import signal
+import threading
+import itertools
+import statistics
+import multiprocessing
+from collections import deque
+
+from worker_pool import (
+    get_pool, get_start_notices, notify_started, worker_pids, shutdown_pool, CANCEL_SIGNAL
+)
+
+
+# Named priority levels; higher values are dispatched first
+PRIORITIES = {'low': -1, 'normal': 0, 'high': 1}
+
+# Seconds between supervision passes (timeouts, lost workers, retries, stragglers)
+WATCHDOG_INTERVAL = 0.5
+
+# Extra seconds past a task's timeout before its worker is killed; the worker's
+# own timer normally stops the task first
+TIMEOUT_GRACE = 10.0
+
+# Seconds a running task's worker may be missing before the task counts as lost
+# (a worker recycled right after returning its result is briefly missing too)
+WORKER_LOST_GRACE = 2.0
+
+# Retry delays double from RETRY_BACKOFF up to RETRY_BACKOFF_MAX seconds
+RETRY_BACKOFF = 1.0
+RETRY_BACKOFF_MAX = 30.0
+
+# A task is a straggler once it runs STRAGGLER_FACTOR times longer than the
+# median finished task of its job (and at least MIN_STRAGGLER_SECONDS);
+# stragglers are only duplicated once SPECULATION_MIN_SAMPLES tasks finished
+STRAGGLER_FACTOR = 2.0
+MIN_STRAGGLER_SECONDS = 5.0
+SPECULATION_MIN_SAMPLES = 3
+
+# Once SPECULATION_MIN_SAMPLES tasks finished, an attempt may also run up to
+# TIMEOUT_MEDIAN_FACTOR times the job's median before it times out, so a
+# timeout sized too small for this machine stretches to what the job really takes
+TIMEOUT_MEDIAN_FACTOR = 10.0
+
+
+class TaskFailedError(RuntimeError):
+    """A task failed on every attempt it was allowed"""
+
+
+class AttemptCancelled(RuntimeError):
+    """An attempt was abandoned because another attempt of its task finished first"""
+
+
+def _run_attempt(func, args, token, timeout):
+    """
+    Run one attempt of a task inside a worker
+
+    Announces the attempt to the scheduler (so the worker can be found if it
+    hangs), stops the task with TimeoutError once the timeout expires, and
+    with AttemptCancelled when the scheduler sends CANCEL_SIGNAL.
+
+    Args:
+        func (callable): Task function
+        args (object): Task argument
+        token (int): Attempt id
+        timeout (float): Seconds the attempt may run, or None
+
+    Returns:
+        object: Return value of func(args)
+    """
+    timed = bool(timeout) and hasattr(signal, "setitimer")
+
+    def expire(signum, frame):
+        raise TimeoutError(f"Timed out after {timeout:.0f}s")
+
+    def cancel(signum, frame):
+        raise AttemptCancelled("Another attempt of the task finished first")
+
+    # Listen for cancellation before the scheduler learns which worker this is
+    if CANCEL_SIGNAL:
+        previous_cancel = signal.signal(CANCEL_SIGNAL, cancel)
+    notify_started(token)
+    if timed:
+        previous = signal.signal(signal.SIGALRM, expire)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(args)
+    finally:
+        if timed:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+        if CANCEL_SIGNAL:
+            signal.signal(CANCEL_SIGNAL, previous_cancel)
+
+
+class _Task:
+    """One task of a job, across all of its attempts"""
+
+    def __init__(self, args):
+        self.args = args
+        self.attempts = []
+        self.failures = 0
+        self.speculated = False
+        self.done = False
+
+
+class _Attempt:
+    """One run of a task on a worker"""
+
+    def __init__(self, token, job, task, speculative):
+        self.token = token
+        self.job = job
+        self.task = task
+        self.speculative = speculative
+        self.started_at = time.time()
+        self.timeout = job.attempt_timeout(task)
+        self.pid = None
+        self.missing_since = None
+        self.running = True
+        self.cancelled = False
+
+
+class _Job:
+    """Book-keeping for one submitted job"""
+
+    def __init__(self, job_id, func, args_list, priority, on_result, timeout=None, retries=0,
+                 speculative=False, label=None):
+        self.job_id = job_id
+        self.func = func
+        self.queued = deque(_Task(args) for args in args_list)
+        self.priority = priority
+        self.on_result = on_result
+        self.timeout = timeout
+        self.retries = retries
+        self.speculative = speculative
+        self.label = label
+        self.running = 0
+        self.total = len(args_list)
+        self.cancelled = False
+        # (ready time, task) of failed tasks waiting out their backoff
+        self.retrying = []
+        # Durations of finished tasks, for spotting stragglers
+        self.durations = []
+
+    def attempt_timeout(self, task):
+        """
+        Seconds the next attempt of a task may run
+
+        Args:
+            task (_Task): Task about to be started
+
+        Returns:
+            float: Seconds, or None for no limit
+        """
+        timeout = self.timeout(task.args) if callable(self.timeout) else self.timeout
+        if timeout and len(self.durations) >= SPECULATION_MIN_SAMPLES:
+            timeout = max(timeout, TIMEOUT_MEDIAN_FACTOR * statistics.median(self.durations))
+        return timeout
+
+
+class JobHandle:
+    """Handle returned by RenderScheduler.submit for following a job's tasks"""
+
+    def __init__(self, scheduler, job_id, total):
+        """
+        Initialize JobHandle
+
+        Args:
+            scheduler (RenderScheduler): Scheduler the job was submitted to
+            job_id (int): Scheduler-assigned job id
+            total (int): Number of tasks in the job
+        """
+        self.scheduler = scheduler
+        self.job_id = job_id
+        self.total = total
+        self._job = None
+        self._results = queue.Queue()
+
+    def _put(self, result, error):
+        """Default result sink: queue the outcome for as_completed"""
+        self._results.put((result, error))
+
+    def as_completed(self):
+        """
+        Yield task results in completion order
+
+        Yields:
+            object: Return value of each task
+
+        Raises:
+            TaskFailedError: The first task that failed on every attempt; the job's
+                remaining tasks are cancelled
+        """
+        done = 0
+        while done < self.total:
+            result, error = self._results.get()
+            done += 1
+            if error is not None:
+                self.cancel()
+                raise error
+            yield result
+
+    def extend(self, args_list):
+        """
+        Add tasks to the job after it was submitted, e.g. as their inputs become ready
+
+        Args:
+            args_list (list): One argument per new task
+        """
+        self.total += self.scheduler.extend(self._job, args_list)
+
+    def cancel(self):
+        """Drop this job's tasks that have not been dispatched yet, and any added later"""
+        self._job.cancelled = True
+        self.scheduler.cancel(self.job_id)
+
+
+class RenderScheduler:
+    """
+    Global queue of segment tasks from every job, dispatched onto one worker pool
+
+    Concurrency is capped at the pool size, so tasks wait here rather than in
+    the pool's FIFO queue and the next task can always be chosen by policy:
+    highest priority first, then the job with the fewest running tasks (fair
+    share), then the oldest job. Because any free worker takes the next task
+    from any job, workers left idle by one job steal its peers' remaining
+    segments instead of waiting.
+
+    Tasks are supervised: an attempt that runs past its job's timeout is
+    stopped (its worker is killed if it does not respond), a failed or lost
+    attempt is retried after an exponential backoff, and when workers would
+    otherwise sit idle a straggler of a speculative job is started a second
+    time; the first result wins and the other attempt is cancelled.
+    """
+
+    def __init__(self, workers=None):
+        """
+        Initialize RenderScheduler
+
+        Args:
+            workers (int): Concurrent tasks (defaults to the CPU count)
+        """
+        self.workers = workers or multiprocessing.cpu_count()
+        self._pool = get_pool(self.workers)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._attempts = {}
+        # Timed-out attempts failed before their worker was known, by token: each
+        # keeps its worker slot until the worker is killed or the attempt returns
+        self._orphans = {}
+        self._running = 0
+        self._ids = itertools.count(1)
+        self._tokens = itertools.count(1)
+        self.counters = {'retried': 0, 'timed_out': 0, 'lost': 0, 'speculated': 0, 'cancelled': 0}
+        self._notices = get_start_notices(self.workers)
+        self._closed = threading.Event()
+
+        threading.Thread(
+            target=self._read_start_notices, args=(self._notices,),
+            name="scheduler-notices", daemon=True
+        ).start()
+        threading.Thread(target=self._watch, name="scheduler-watchdog", daemon=True).start()
+
+    def submit(self, func, args_list, priority=0, on_result=None, timeout=None, retries=0,
+               speculative=False, label=None):
+        """
+        Queue a job made of independent tasks
+
+        Args:
+            func (callable): Picklable function run in a worker for each task
+            args_list (list): One argument per task
+            priority (int): Higher values are dispatched first (see PRIORITIES)
+            on_result (callable): Optional callback(result, error) per task, called
+                from the pool's result thread or the watchdog; by default results are
+                collected for JobHandle.as_completed
+            timeout (float or callable): Seconds an attempt may run before it fails with
+                TimeoutError, or a function of the task's argument returning them; once
+                the job has finished a few tasks, attempts may also run for
+                TIMEOUT_MEDIAN_FACTOR times its median
+            retries (int): Further attempts allowed after a failure or timeout
+            speculative (bool): Allow a straggler to be started again on an idle worker;
+                func must be idempotent, since both attempts may finish
+            label (callable): Optional function naming a task's argument in error messages
+
+        Returns:
+            JobHandle: Handle for the submitted job
+        """
+        job_id = next(self._ids)
+        handle = JobHandle(self, job_id, len(args_list))
+        job = _Job(job_id, func, list(args_list), priority, on_result or handle._put,
+                   timeout, retries, speculative, label)
+        handle._job = job
+
+        with self._lock:
+            if job.queued:
+                self._jobs[job_id] = job
+            self._dispatch()
+        return handle
+
+    def extend(self, job, args_list):
+        """
+        Queue more tasks for a submitted job
+
+        The job keeps its place in the fair-share order even if all of its
+        earlier tasks have already finished.
+
+        Args:
+            job (_Job): Job to extend
+            args_list (list): One argument per new task
+
+        Returns:
+            int: Number of tasks added (0 if the job was cancelled)
+        """
+        with self._lock:
+            if job.cancelled:
+                return 0
+            job.queued.extend(_Task(args) for args in args_list)
+            job.total += len(args_list)
+            if job.queued:
+                self._jobs[job.job_id] = job
+            self._dispatch()
+        return len(args_list)
+
+    def cancel(self, job_id):
+        """
+        Drop a job's queued tasks and pending retries (running attempts are left to finish)
+
+        Args:
+            job_id (int): Job to cancel
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.queued.clear()
+                job.retrying.clear()
+                self._retire(job)
+
+    def status(self):
+        """
+        Snapshot of the scheduler's load
+
+        Returns:
+            dict: workers, running and queued task counts, active job count, and the
+                number of retried, timed-out, lost, speculative and cancelled attempts
+                so far
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'running': self._running,
+                'queued': sum(len(job.queued) + len(job.retrying) for job in self._jobs.values()),
+                'jobs': len(self._jobs),
+                **self.counters
+            }
+
+    def close(self):
+        """Stop the scheduler's supervision threads (its pool is shut down separately)"""
+        self._closed.set()
+        self._notices.put(None)
+
+    def _next_job(self):
+        """Pick the job whose task runs next (caller holds the lock)"""
+        candidates = [job for job in self._jobs.values() if job.queued]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda job: (job.priority, -job.running, -job.job_id))
+
+    def _dispatch(self):
+        """Start tasks until every worker is busy or nothing is queued (caller holds the lock)"""
+        while self._running < self.workers:
+            job = self._next_job()
+            if job is None:
+                return
+            self._start_attempt(job, job.queued.popleft())
+
+    def _start_attempt(self, job, task, speculative=False):
+        """Run an attempt of a task on the pool (caller holds the lock)"""
+        attempt = _Attempt(next(self._tokens), job, task, speculative)
+        task.attempts.append(attempt)
+        self._attempts[attempt.token] = attempt
+        job.running += 1
+        self._running += 1
+        self._pool.apply_async(
+            _run_attempt, (job.func, task.args, attempt.token, attempt.timeout),
+            callback=lambda result, attempt=attempt: self._finish(attempt, result, None),
+            error_callback=lambda error, attempt=attempt: self._finish(attempt, None, error)
+        )
+
+    def _release(self, attempt):
+        """Stop tracking an attempt and free its worker slot (caller holds the lock)"""
+        attempt.running = False
+        self._attempts.pop(attempt.token, None)
+        attempt.task.attempts.remove(attempt)
+        attempt.job.running -= 1
+        if attempt.token not in self._orphans:
+            self._running -= 1
+
+    def _retire(self, job):
+        """Forget a job once it has nothing queued, running or waiting to retry (caller holds the lock)"""
+        if not job.queued and not job.running and not job.retrying:
+            self._jobs.pop(job.job_id, None)
+
+    def _settle(self, attempt, result, error):
+        """
+        Record the outcome of an attempt (caller holds the lock)
+
+        Args:
+            attempt (_Attempt): Finished, failed or lost attempt
+            result (object): Return value, if it succeeded
+            error (Exception): Failure, if it failed
+
+        Returns:
+            tuple: (job, result, error) to report, or None if nothing is reported yet
+                (a retry is pending or another attempt of the task is still running)
+                or any more (the task already has a result)
+        """
+        if not attempt.running:
+            return None
+        self._release(attempt)
+        job, task = attempt.job, attempt.task
+        if task.done:
+            return None
+
+        if isinstance(error, AttemptCancelled) and not attempt.cancelled:
+            # The worker got a cancellation meant for the attempt it ran before
+            if not task.attempts:
+                job.queued.appendleft(task)
+            return None
+
+        if error is None:
+            task.done = True
+            job.durations.append(time.time() - attempt.started_at)
+            # The losing attempt of a speculative race would only keep a worker busy
+            for other in task.attempts:
+                self.counters['cancelled'] += 1
+                self._cancel(other)
+            return job, result, None
+
+        task.failures += 1
+        if isinstance(error, TimeoutError):
+            self.counters['timed_out'] += 1
+        if task.attempts:
+            # A duplicate attempt is still running and may yet succeed
+            return None
+        if task.failures <= job.retries and not job.cancelled:
+            delay = min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** (task.failures - 1))
+            job.retrying.append((time.time() + delay, task))
+            self.counters['retried'] += 1
+            return None
+
+        task.done = True
+        name = job.label(task.args) if job.label else "Task"
+        failure = TaskFailedError(
+            f"{name} failed after {task.failures} attempt(s): {type(error).__name__}: {error}"
+        )
+        failure.__cause__ = error
+        return job, None, failure
+
+    def _finish(self, attempt, result, error):
+        """Record an attempt reported by the pool, hand out the freed worker and report the outcome"""
+        with self._lock:
+            if self._orphans.pop(attempt.token, None):
+                # An orphaned attempt returned after all, so its worker is free again
+                self._running -= 1
+            report = self._settle(attempt, result, error)
+            self._retire(attempt.job)
+            self._dispatch()
+        if report:
+            report[0].on_result(report[1], report[2])
+
+    def _read_start_notices(self, notices):
+        """Record which worker process runs each attempt, from the workers' start notices"""
+        while True:
+            notice = notices.get()
+            if notice is None:
+                return
+            token, pid = notice
+            with self._lock:
+                orphan = self._orphans.pop(token, None)
+                if orphan:
+                    # Its task has already failed; the killed worker is replaced by the pool
+                    orphan.pid = pid
+                    self._kill(orphan)
+                    self._running -= 1
+                    self._dispatch()
+                    continue
+                attempt = self._attempts.get(token)
+                if attempt:
+                    attempt.pid = pid
+                    if attempt.cancelled:
+                        self._cancel(attempt)
+
+    def _cancel(self, attempt):
+        """
+        Ask the worker running an attempt to abandon it (caller holds the lock)
+
+        If the worker is not known yet, it is signalled once its start notice
+        arrives. The abandoned attempt reports AttemptCancelled, which is ignored.
+        """
+        attempt.cancelled = True
+        if CANCEL_SIGNAL and attempt.pid and attempt.pid in worker_pids(self.workers):
+            try:
+                os.kill(attempt.pid, CANCEL_SIGNAL)
+            except OSError:
+                pass
+
+    def _kill(self, attempt):
+        """Kill the worker running an attempt; the pool replaces it (caller holds the lock)"""
+        if attempt.pid and attempt.pid in worker_pids(self.workers):
+            try:
+                os.kill(attempt.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def _watch(self):
+        """Supervise running attempts every WATCHDOG_INTERVAL seconds"""
+        while not self._closed.wait(WATCHDOG_INTERVAL):
+            with self._lock:
+                reports = self._supervise()
+                self._dispatch()
+            for job, result, error in reports:
+                job.on_result(result, error)
+
+    def _supervise(self):
+        """
+        Fail hung and lost attempts, requeue due retries and duplicate stragglers
+
+        Called with the lock held.
+
+        Returns:
+            list: (job, result, error) outcomes to report
+        """
+        now = time.time()
+        reports = []
+        live = worker_pids(self.workers) if self._attempts else set()
+
+        for attempt in list(self._attempts.values()):
+            job = attempt.job
+            if attempt.timeout and now - attempt.started_at > attempt.timeout + TIMEOUT_GRACE:
+                # The worker's own timer did not stop the task (e.g. stuck in native code)
+                if attempt.pid is None:
+                    # No start notice yet, so there is no worker to kill; the task fails
+                    # now but its slot stays taken until the notice arrives
+                    self._orphans[attempt.token] = attempt
+                else:
+                    self._kill(attempt)
+                error = TimeoutError(f"Timed out after {attempt.timeout:.0f}s; worker killed")
+            elif attempt.pid is not None and attempt.pid not in live:
+                attempt.missing_since = attempt.missing_since or now
+                if now - attempt.missing_since < WORKER_LOST_GRACE:
+                    continue
+                self.counters['lost'] += 1
+                error = RuntimeError(f"Worker process {attempt.pid} exited while running the task")
+            else:
+                continue
+            report = self._settle(attempt, None, error)
+            self._retire(job)
+            if report:
+                reports.append(report)
+
+        for job in list(self._jobs.values()):
+            due = [item for item in job.retrying if item[0] <= now]
+            for item in due:
+                job.retrying.remove(item)
+                job.queued.appendleft(item[1])
+
+        idle = self.workers - self._running
+        if idle > 0 and not any(job.queued for job in self._jobs.values()):
+            for attempt in self._stragglers(now)[:idle]:
+                attempt.task.speculated = True
+                self.counters['speculated'] += 1
+                self._start_attempt(attempt.job, attempt.task, speculative=True)
+
+        return reports
+
+    def _stragglers(self, now):
+        """
+        Find running attempts worth duplicating, longest-running first (caller holds the lock)
+
+        Args:
+            now (float): Current time
+
+        Returns:
+            list: Attempts of speculative jobs running well past their job's median
+        """
+        stragglers = []
+        for attempt in self._attempts.values():
+            job, task = attempt.job, attempt.task
+            if (not job.speculative or job.cancelled or task.speculated or task.done
+                    or len(job.durations) < SPECULATION_MIN_SAMPLES):
+                continue
+            threshold = max(MIN_STRAGGLER_SECONDS, STRAGGLER_FACTOR * statistics.median(job.durations))
+            if now - attempt.started_at > threshold:
+                stragglers.append(attempt)
+        return sorted(stragglers, key=lambda attempt: attempt.started_at)
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(workers=None):
+    """
+    Return the process-wide scheduler, creating it on first use
+
+    Args:
+        workers (int): Concurrent tasks (defaults to the CPU count); a different
+            value returns a separate scheduler on a pool of that size
+
+    Returns:
+        RenderScheduler: Shared scheduler
+    """
+    workers = workers or multiprocessing.cpu_count()
+    with _schedulers_lock:
+        if workers not in _schedulers:
+            _schedulers[workers] = RenderScheduler(workers)
+        return _schedulers[workers]
+
+
+def shutdown_schedulers():
+    """
+    Stop every scheduler and the worker pools; the next get_scheduler starts afresh
+
+    Running tasks are abandoned, so call this only between jobs, e.g. between
+    benchmark configurations whose memory would otherwise include the idle
+    pools of earlier ones.
+    """
+    with _schedulers_lock:
+        for scheduler in _schedulers.values():
+            scheduler.close()
+        _schedulers.clear()
+    shutdown_pool()
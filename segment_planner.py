@@ -0,0 +1,72 @@
+"""
+Segment Planner Module
+Chooses segment sizes from the video's cost and the number of available workers
+"""
+
+import math
+import multiprocessing
+
+
+# Segments per worker: enough slack for idle workers to pick up remaining segments
+SEGMENTS_PER_WORKER = 3
+
+# Fixed cost of a segment (worker dispatch, opening the file, encoder start-up)
+SEGMENT_OVERHEAD_SECONDS = 0.5
+
+# A segment should do at least this many times its fixed overhead in real work
+MIN_WORK_TO_OVERHEAD = 4
+
+# Rough single-core decode + effect + encode throughput
+PIXELS_PER_SECOND = 30_000_000
+
+# Never plan segments shorter than this
+MIN_SEGMENT_SECONDS = 1.0
+
+
+def keyframe_interval(keyframes):
+    """
+    Estimate the typical distance between keyframes
+
+    Args:
+        keyframes (list): Sorted keyframe times in seconds
+
+    Returns:
+        float: Median keyframe spacing in seconds (0 if unknown)
+    """
+    gaps = sorted(b - a for a, b in zip(keyframes, keyframes[1:]))
+    return gaps[len(gaps) // 2] if gaps else 0
+
+
+def auto_segment_duration(total_duration, size, fps, keyframes=None, workers=None):
+    """
+    Pick a segment duration that balances load across workers
+
+    Aims for SEGMENTS_PER_WORKER segments per worker, but never makes a segment
+    so short that its fixed overhead dominates (cheaper, low-resolution video
+    needs longer segments) or shorter than the keyframe spacing.
+
+    Args:
+        total_duration (float): Video duration in seconds
+        size (tuple): Frame size as (width, height)
+        fps (float): Frames per second
+        keyframes (list): Optional keyframe times used when cuts must land on keyframes
+        workers (int): Number of parallel workers (defaults to the CPU count)
+
+    Returns:
+        float: Segment duration in seconds
+    """
+    workers = workers or multiprocessing.cpu_count()
+    width, height = size
+
+    # Processing cost of one second of video on one core, in seconds
+    cost_per_second = max(width * height * (fps or 30) / PIXELS_PER_SECOND, 1e-6)
+    min_duration = max(
+        MIN_SEGMENT_SECONDS,
+        SEGMENT_OVERHEAD_SECONDS * MIN_WORK_TO_OVERHEAD / cost_per_second,
+        keyframe_interval(keyframes or [])
+    )
+
+    max_segments = max(1, int(total_duration // min_duration))
+    num_segments = min(workers * SEGMENTS_PER_WORKER, max_segments)
+
+    return max(MIN_SEGMENT_SECONDS, math.ceil(total_duration / num_segments * 100) / 100)
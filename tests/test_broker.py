@@ -0,0 +1,67 @@
+"""
+Broker Tests
+Leases that cannot be served or downloaded are failed and retried instead of left open
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render_worker  # noqa: E402
+from broker import SegmentBroker  # noqa: E402
+from scheduler import TaskFailedError  # noqa: E402
+
+
+def render(task):
+    """Stand-in task function; the tests never get as far as running it"""
+    raise AssertionError("should not run")
+
+
+def test_lease_of_a_missing_input_fails_the_task(tmp_path):
+    broker = SegmentBroker()
+    broker.register("worker", 1)
+    handle = broker.submit(render, [(0, (str(tmp_path / "gone.mp4"), str(tmp_path / "out.mp4"), {}))])
+
+    assert broker.lease("worker") is None
+    with pytest.raises(TaskFailedError, match="Cannot lease"):
+        list(handle.as_completed())
+    status = broker.status()
+    assert status['running'] == 0 and status['jobs'] == 0
+
+
+def test_worker_fails_a_lease_it_cannot_download(tmp_path, monkeypatch):
+    source = tmp_path / "segment_000.mp4"
+    source.write_bytes(b"segment")
+    broker = SegmentBroker()
+
+    def fetch(token, offset):
+        raise FileNotFoundError("input vanished")
+
+    monkeypatch.setattr(broker, "fetch", fetch)
+    monkeypatch.setattr(render_worker, "connect_broker", lambda address, authkey: broker)
+    handle = broker.submit(render, [(0, (str(source), str(tmp_path / "out.mp4"), {}))], retries=1)
+
+    stop = threading.Event()
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    logs = []
+    worker = threading.Thread(
+        target=render_worker.run_worker, args=("coordinator:0",),
+        kwargs={'slots': 1, 'work_dir': str(scratch), 'log': logs.append, 'stop': stop}
+    )
+    worker.start()
+    try:
+        with pytest.raises(TaskFailedError, match="input vanished"):
+            list(handle.as_completed())
+    finally:
+        stop.set()
+        worker.join(timeout=30)
+
+    assert broker.status()['retried'] == 1
+    assert broker.status()['running'] == 0
+    assert sum("dropped" in line for line in logs) == 2
+    assert not any(os.scandir(scratch))
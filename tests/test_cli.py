@@ -0,0 +1,69 @@
+"""
+CLI Tests
+Output naming and the bound on files held in scratch space during a batch
+"""
+
+import os
+import sys
+
+import pytest
+from moviepy import ColorClip
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cli import main, output_paths, run_batch  # noqa: E402
+
+
+def test_outputs_mirror_input_directories():
+    assert output_paths(["/v/a/clip.mp4", "/v/b/clip.mp4"], "out") == [
+        os.path.join("out", "a", "clip_processed.mp4"),
+        os.path.join("out", "b", "clip_processed.mp4"),
+    ]
+
+
+def test_outputs_keep_extension_when_stems_collide():
+    assert output_paths(["/v/clip.mp4", "/v/clip.mov", "/v/other.mp4"], "out") == [
+        os.path.join("out", "clip_mp4_processed.mp4"),
+        os.path.join("out", "clip_mov_processed.mp4"),
+        os.path.join("out", "other_processed.mp4"),
+    ]
+
+
+def test_repeated_inputs_get_a_counter():
+    assert output_paths(["/v/clip.mp4", "/v/clip.mp4"], "out") == [
+        os.path.join("out", "clip_processed.mp4"),
+        os.path.join("out", "clip_2_processed.mp4"),
+    ]
+
+
+@pytest.fixture(scope="module")
+def videos(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("videos")
+    paths = []
+    for number in range(3):
+        path = str(directory / f"clip{number}.mp4")
+        clip = ColorClip((64, 48), color=(40 * number, 90, 160), duration=2).with_fps(10)
+        clip.write_videofile(path, codec="libx264", audio=False, logger=None)
+        clip.close()
+        paths.append(path)
+    return paths
+
+
+def test_segment_duration_must_be_a_number(videos, capsys):
+    with pytest.raises(SystemExit):
+        main([videos[0], "--segment-duration", "long"])
+    assert "must be a number of seconds" in capsys.readouterr().err
+
+
+def test_batch_finishes_each_file_before_splitting_past_the_cap(videos, tmp_path):
+    lines = []
+    reports = run_batch(
+        videos, str(tmp_path / "out"), work_dir=str(tmp_path / "scratch"),
+        segment_duration=0.5, split_mode="reencode", workers=1, log=lines.append,
+        max_in_flight=1
+    )
+
+    assert [report['status'] for report in reports] == ['done'] * 3
+    stages = [line.split()[0] for line in lines]
+    assert stages == ["[split]", "[done]"] * 3
+    assert not os.listdir(tmp_path / "scratch")
@@ -0,0 +1,122 @@
+"""
+Effect Tests
+Chain planning and the NumPy effects against straightforward reference implementations
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from effects import Blur, EffectChain, Overlay, TemporalDenoise, effect_files, plan_chain  # noqa: E402
+
+
+def random_frames(shape, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, size=shape, dtype=np.uint8)
+
+
+def test_leading_downscale_moves_into_the_decoder():
+    decode_size, chain = plan_chain(["grayscale", {'name': 'resize', 'height': 360}], (1280, 720))
+    assert decode_size == (640, 360)
+    assert chain == [{'name': 'grayscale'}]
+
+
+def test_downscale_does_not_move_past_neighbourhood_effects():
+    specs = [{'name': 'blur', 'radius': 2}, "grayscale", {'name': 'resize', 'height': 360}]
+    decode_size, chain = plan_chain(specs, (1280, 720))
+    assert decode_size is None
+    assert [spec['name'] for spec in chain] == ['blur', 'resize', 'grayscale']
+
+
+def test_upscale_keeps_its_place():
+    decode_size, chain = plan_chain(["grayscale", {'name': 'resize', 'height': 1080}], (1280, 720))
+    assert decode_size is None
+    assert [spec['name'] for spec in chain] == ['grayscale', 'resize']
+
+
+def test_plan_keeps_output_size():
+    specs = ["grayscale", {'name': 'crop', 'width': 600}, {'name': 'resize', 'height': 240}]
+    decode_size, chain = plan_chain(specs, (1280, 720))
+    planned = EffectChain(chain).output_size(decode_size or (1280, 720))
+    assert EffectChain(specs).output_size((1280, 720)) == planned
+
+
+def reference_box_blur(frame, radius):
+    """Edge-repeating box blur, one axis at a time, rounded like Blur"""
+    width = 2 * radius + 1
+    result = frame.astype(np.int64)
+    for axis in (0, 1):
+        pad = [(radius, radius) if a == axis else (0, 0) for a in range(3)]
+        padded = np.pad(result, pad, mode="edge")
+        windows = sum(np.take(padded, np.arange(k, k + result.shape[axis]), axis=axis) for k in range(width))
+        result = (windows + width // 2) // width
+    return result.astype(np.uint8)
+
+
+@pytest.mark.parametrize("radius", [1, 3])
+def test_blur_matches_reference(radius):
+    frames = random_frames((2, 20, 24, 3))
+    expected = np.stack([reference_box_blur(frame, radius) for frame in frames])
+    assert (Blur(radius).apply(frames.copy()) == expected).all()
+
+
+def test_blur_leaves_flat_frames_unchanged():
+    frames = np.full((1, 10, 10, 3), 77, dtype=np.uint8)
+    assert (Blur(4).apply(frames.copy()) == 77).all()
+
+
+def test_denoise_is_a_running_average_across_batches():
+    frames = random_frames((4, 8, 8, 3))
+    denoise = TemporalDenoise(strength=0.5)
+    result = np.concatenate([denoise.apply(frames[:2].copy()), denoise.apply(frames[2:].copy())])
+
+    state = frames[0].astype(np.float32)
+    expected = [frames[0]]
+    for frame in frames[1:]:
+        state = 0.5 * state + 0.5 * frame
+        expected.append((state + 0.5).astype(np.uint8))
+    assert (result == np.stack(expected)).all()
+
+
+@pytest.fixture
+def overlay_image(tmp_path):
+    rgba = np.zeros((4, 6, 4), dtype=np.uint8)
+    rgba[..., 0] = 255
+    rgba[:2, :, 3] = 255
+    rgba[2:, :, 3] = 128
+    rgba[:, 0, 3] = 0
+    path = tmp_path / "logo.png"
+    Image.fromarray(rgba).save(path)
+    return str(path)
+
+
+def test_overlay_alpha_blends_at_the_bottom_right(overlay_image):
+    frames = np.full((1, 12, 16, 3), 100, dtype=np.uint8)
+    result = Overlay(overlay_image, x=-1, y=-1).apply(frames.copy())[0]
+
+    region = result[8:12, 10:16]
+    assert (region[:2, 1:] == [255, 0, 0]).all()
+    assert (region[:, 0] == 100).all()
+    half = 128 / 255
+    expected = np.array([255 * half + 100 * (1 - half), 100 * (1 - half), 100 * (1 - half)]) + 0.5
+    assert (region[2:, 1:] == expected.astype(np.uint8)).all()
+    # Nothing outside the overlay changes
+    untouched = np.ones(result.shape[:2], dtype=bool)
+    untouched[8:12, 10:16] = False
+    assert (result[untouched] == 100).all()
+
+
+def test_overlay_is_clipped_at_the_frame_edge(overlay_image):
+    frames = np.full((1, 12, 16, 3), 100, dtype=np.uint8)
+    result = Overlay(overlay_image, x=13, y=0).apply(frames.copy())[0]
+    assert (result[:2, 14:] == [255, 0, 0]).all()
+    assert (result[:, :13] == 100).all()
+
+
+def test_overlay_image_is_listed_as_a_file(overlay_image):
+    specs = [{'name': 'grayscale'}, {'name': 'overlay', 'image': overlay_image}]
+    assert effect_files(specs) == [(1, 'image', overlay_image)]
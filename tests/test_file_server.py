@@ -0,0 +1,102 @@
+"""
+File Server Tests
+Range header parsing and token-based publishing of the download endpoint
+"""
+
+import os
+import sys
+import urllib.error
+import urllib.request
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from file_server import FileServer, parse_range  # noqa: E402
+
+
+def test_no_header_sends_whole_file():
+    assert parse_range(None, 1000) is None
+    assert parse_range("", 1000) is None
+
+
+def test_closed_range():
+    assert parse_range("bytes=100-199", 1000) == (100, 199)
+
+
+def test_open_ended_range():
+    assert parse_range("bytes=100-", 1000) == (100, 999)
+
+
+def test_range_end_is_clamped_to_the_file():
+    assert parse_range("bytes=900-5000", 1000) == (900, 999)
+
+
+def test_suffix_range():
+    assert parse_range("bytes=-500", 1000) == (500, 999)
+    assert parse_range("bytes=-5000", 1000) == (0, 999)
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=1500-1600", "bytes=200-100"])
+def test_unsatisfiable_range(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1000)
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-6", "bytes=-", "items=0-10", "bytes=a-b"])
+def test_multi_range_and_malformed_headers_send_whole_file(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.fixture
+def server():
+    server = FileServer(host="127.0.0.1", port=0)
+    yield server
+    server.stop()
+
+
+def _status(url, headers=None):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, b""
+
+
+def test_only_published_files_are_served(server, tmp_path):
+    output = tmp_path / "job" / "final_output.mp4"
+    output.parent.mkdir()
+    output.write_bytes(b"0123456789")
+    (tmp_path / "jobs.db").write_bytes(b"secret")
+
+    url = server.url_for(str(output))
+    assert _status(url) == (200, b"0123456789")
+    assert _status(url, {"Range": "bytes=2-4"}) == (206, b"234")
+    assert _status(url, {"Range": "bytes=20-"})[0] == 416
+    base = f"http://127.0.0.1:{server.port}"
+    assert _status(f"{base}/jobs.db")[0] == 404
+    assert _status(f"{base}/{tmp_path}/jobs.db")[0] == 404
+    assert _status(f"{base}/not-a-token/final_output.mp4")[0] == 404
+
+
+def test_unpublishing_a_directory_withdraws_its_tokens(server, tmp_path):
+    output = tmp_path / "job" / "final_output.mp4"
+    output.parent.mkdir()
+    output.write_bytes(b"video")
+    url = server.url_for(str(output))
+    assert server.url_for(str(output)) == url
+
+    server.unpublish(str(output.parent))
+    assert _status(url)[0] == 404
+    assert server.url_for(str(output)) != url
+
+
+def test_links_use_the_browser_host(server, tmp_path):
+    output = tmp_path / "final_output.mp4"
+    output.write_bytes(b"video")
+    assert server.url_for(str(output), browser_host="render.example").startswith(
+        f"http://render.example:{server.port}/"
+    )
+    assert server.url_for(str(output), download=True).endswith("?download=1")
+    assert server.reachable_from("127.0.0.1")
+    assert not server.reachable_from("render.example")
@@ -0,0 +1,56 @@
+"""
+Frame Engine Tests
+Pixel accuracy of the fixed-point grayscale kernel against moviepy's BlackAndWhite effect
+"""
+
+import os
+import sys
+
+import numpy as np
+import pytest
+from moviepy import ImageClip
+from moviepy.video.fx.BlackAndWhite import BlackAndWhite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_engine import GrayscaleKernel  # noqa: E402
+
+
+def moviepy_grayscale(frame, rgb=None):
+    """Convert one frame with moviepy's BlackAndWhite effect"""
+    return BlackAndWhite(RGB=rgb).apply(ImageClip(frame)).get_frame(0)
+
+
+def max_difference(frame, rgb=None):
+    """Largest per-pixel difference between the kernel and BlackAndWhite on one frame"""
+    expected = moviepy_grayscale(frame.copy(), rgb).astype(np.int16)
+    kernel = GrayscaleKernel(rgb) if rgb else GrayscaleKernel()
+    actual = kernel.apply(frame.copy()).astype(np.int16)
+    return int(np.abs(actual - expected).max())
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_frames_match_black_and_white(seed):
+    frame = np.random.default_rng(seed).integers(0, 256, size=(48, 64, 3), dtype=np.uint8)
+    assert max_difference(frame) <= 1
+
+
+def test_custom_weights_match_black_and_white():
+    frame = np.random.default_rng(7).integers(0, 256, size=(48, 64, 3), dtype=np.uint8)
+    assert max_difference(frame, [0.2125, 0.7154, 0.0721]) <= 1
+
+
+@pytest.mark.parametrize("value", [0, 255])
+def test_black_and_white_endpoints_are_exact(value):
+    frame = np.full((8, 8, 3), value, dtype=np.uint8)
+    assert (GrayscaleKernel().apply(frame) == value).all()
+    assert max_difference(np.full((8, 8, 3), value, dtype=np.uint8)) == 0
+
+
+def test_batches_convert_in_place():
+    frames = np.random.default_rng(1).integers(0, 256, size=(4, 16, 16, 3), dtype=np.uint8)
+    expected = np.stack([moviepy_grayscale(frame.copy()) for frame in frames]).astype(np.int16)
+    result = GrayscaleKernel().apply(frames)
+    assert result is frames
+    assert (result[..., 0] == result[..., 1]).all() and (result[..., 1] == result[..., 2]).all()
+    assert int(np.abs(result.astype(np.int16) - expected).max()) <= 1
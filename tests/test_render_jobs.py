@@ -0,0 +1,67 @@
+"""
+Render Job Tests
+Files stored with a job and per-owner job lookup, against a throwaway job database
+"""
+
+import io
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render_jobs  # noqa: E402
+from render_jobs import create_render_job, get_job, job_directory, list_jobs, save_effect_file  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def jobs_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "render_jobs"
+    monkeypatch.setattr(render_jobs, "JOBS_DIR", str(directory))
+    monkeypatch.setattr(render_jobs, "DB_PATH", str(directory / "jobs.db"))
+    return directory
+
+
+def test_effect_file_is_stored_in_the_job_directory():
+    settings = {'effects': [{'name': 'grayscale'}, {'name': 'overlay', 'x': -10}]}
+    job_id, _ = create_render_job("clip.mp4", settings)
+
+    path = save_effect_file(job_id, 'overlay', io.BytesIO(b"png bytes"))
+
+    assert os.path.dirname(path) == job_directory(job_id)
+    with open(path, "rb") as f:
+        assert f.read() == b"png bytes"
+    effects = get_job(job_id)['settings']['effects']
+    assert effects == [{'name': 'grayscale'}, {'name': 'overlay', 'x': -10, 'image': path}]
+
+
+def test_jobs_are_listed_and_reattached_only_by_their_owner():
+    mine, _ = create_render_job("mine.mp4", {}, owner="alice-token")
+    theirs, _ = create_render_job("theirs.mp4", {}, owner="bob-token")
+
+    assert [job['id'] for job in list_jobs("alice-token")] == [mine]
+    assert list_jobs("nobody") == []
+    assert get_job(mine, owner="alice-token")['input_name'] == "mine.mp4"
+    assert get_job(theirs, owner="alice-token") is None
+    assert get_job(theirs)['owner'] == "bob-token"
+
+
+def test_databases_without_owners_are_migrated(jobs_dir):
+    jobs_dir.mkdir()
+    conn = sqlite3.connect(jobs_dir / "jobs.db")
+    conn.execute(
+        "CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT, "
+        "progress TEXT NOT NULL DEFAULT '{}', settings TEXT NOT NULL, input_name TEXT, "
+        "input_path TEXT, output_path TEXT, result TEXT, error TEXT, "
+        "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO jobs (id, status, settings, created_at, updated_at) VALUES ('old', 'done', '{}', 0, 0)")
+    conn.commit()
+    conn.close()
+
+    assert get_job("old", owner="alice-token") is None
+    assert list_jobs("alice-token") == []
+    job_id, _ = create_render_job("new.mp4", {}, owner="alice-token")
+    assert [job['id'] for job in list_jobs("alice-token")] == [job_id]
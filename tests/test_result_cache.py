@@ -0,0 +1,52 @@
+"""
+Result Cache Tests
+Concurrent puts of one key and eviction alongside puts in progress
+"""
+
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_cache import ResultCache  # noqa: E402
+
+
+def test_concurrent_puts_of_one_key_each_store_a_whole_file(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    sources = []
+    for number in range(8):
+        source = tmp_path / f"segment_{number}.mp4"
+        source.write_bytes(bytes([number]) * 256 * 1024)
+        sources.append(str(source))
+
+    errors = []
+
+    def put(source):
+        try:
+            for _ in range(5):
+                cache.put("key", source)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put, args=(source,)) for source in sources]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert os.listdir(cache.root) == ["key.mp4"]
+    data = (tmp_path / "cache" / "key.mp4").read_bytes()
+    assert len(data) == 256 * 1024 and len(set(data)) == 1
+    assert cache.get("key", str(tmp_path / "hit.mp4"))
+
+
+def test_eviction_skips_partial_copies(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=0)
+    partial = tmp_path / "cache" / ".key.partial-0123abcd.mp4"
+    partial.write_bytes(b"still being written")
+
+    cache.evict()
+
+    assert partial.exists()
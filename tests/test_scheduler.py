@@ -0,0 +1,94 @@
+"""
+Scheduler Tests
+A timed-out attempt whose worker is not known yet keeps its slot until the worker is gone
+"""
+
+import os
+import queue
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scheduler  # noqa: E402
+from scheduler import RenderScheduler, TaskFailedError  # noqa: E402
+
+
+class FakePool:
+    """Records dispatched attempts instead of running them"""
+
+    def __init__(self):
+        self.calls = []
+
+    def apply_async(self, func, args, callback, error_callback):
+        self.calls.append((args, callback, error_callback))
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+    monkeypatch.setattr(scheduler, "get_pool", lambda workers: pool)
+    monkeypatch.setattr(scheduler, "get_start_notices", lambda workers: queue.Queue())
+    monkeypatch.setattr(scheduler, "worker_pids", lambda workers: {4242})
+    # Supervision passes are run by the tests themselves
+    monkeypatch.setattr(scheduler, "WATCHDOG_INTERVAL", 3600)
+    return pool
+
+
+@pytest.fixture
+def kills(monkeypatch):
+    kills = []
+    monkeypatch.setattr(scheduler.os, "kill", lambda pid, signum: kills.append((pid, signum)))
+    return kills
+
+
+def wait_for(condition):
+    deadline = time.time() + 5
+    while not condition():
+        assert time.time() < deadline
+        time.sleep(0.01)
+
+
+def time_out_unannounced_attempt(render_scheduler):
+    """Fail the running attempt by timeout before its worker has announced itself"""
+    attempt = next(iter(render_scheduler._attempts.values()))
+    attempt.started_at -= 2 + scheduler.TIMEOUT_GRACE
+    with render_scheduler._lock:
+        reports = render_scheduler._supervise()
+        render_scheduler._dispatch()
+    return attempt, reports
+
+
+def test_slot_is_held_until_the_worker_is_killed(pool, kills):
+    render_scheduler = RenderScheduler(1)
+    try:
+        render_scheduler.submit(pow, [(2, 3), (2, 4)], timeout=1)
+        attempt, reports = time_out_unannounced_attempt(render_scheduler)
+
+        assert isinstance(reports[0][2], TaskFailedError)
+        assert render_scheduler.status()['running'] == 1
+        assert len(pool.calls) == 1 and not kills
+
+        render_scheduler._notices.put((attempt.token, 4242))
+        wait_for(lambda: len(pool.calls) == 2)
+        assert kills == [(4242, scheduler.signal.SIGKILL)]
+        assert render_scheduler.status()['running'] == 1
+    finally:
+        render_scheduler.close()
+
+
+def test_slot_is_freed_when_the_orphaned_attempt_returns(pool, kills):
+    render_scheduler = RenderScheduler(1)
+    try:
+        render_scheduler.submit(pow, [(2, 3), (2, 4)], timeout=1)
+        time_out_unannounced_attempt(render_scheduler)
+
+        _, callback, _ = pool.calls[0]
+        callback(8)
+
+        assert len(pool.calls) == 2 and not kills
+        assert render_scheduler.status()['running'] == 1
+    finally:
+        render_scheduler.close()
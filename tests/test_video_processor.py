@@ -0,0 +1,88 @@
+"""
+Video Processor Tests
+Automatic segment durations are planned for the workers that will render the segments,
+and an interrupted segment never leaves its ffmpeg reader running
+"""
+
+import os
+import sys
+import types
+
+import pytest
+from moviepy import ColorClip
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import video_processor  # noqa: E402
+from broker import SegmentBroker  # noqa: E402
+from video_processor import VideoProcessor  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def video(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("videos") / "clip.mp4")
+    clip = ColorClip((64, 48), color=(40, 90, 160), duration=2).with_fps(10)
+    clip.write_videofile(path, codec="libx264", audio=False, logger=None)
+    clip.close()
+    return path
+
+
+@pytest.fixture
+def planned_workers(monkeypatch):
+    calls = []
+
+    def auto_segment_duration(total_duration, size, fps, keyframes=None, workers=None):
+        calls.append(workers)
+        return 1.0
+
+    monkeypatch.setattr(video_processor, "auto_segment_duration", auto_segment_duration)
+    return calls
+
+
+def test_auto_duration_uses_the_local_scheduler_size(video, tmp_path, monkeypatch, planned_workers):
+    monkeypatch.setattr(video_processor, "get_scheduler", lambda max_workers: types.SimpleNamespace(workers=3))
+    processor = VideoProcessor(segment_duration="auto", split_mode="direct", work_dir=str(tmp_path))
+
+    segments, _ = processor.split_video(video)
+
+    assert planned_workers == [3]
+    assert len(segments) == 2
+
+
+def test_auto_duration_uses_the_broker_slots(video, tmp_path, monkeypatch, planned_workers):
+    broker = SegmentBroker()
+    broker.register("worker-a", 4)
+    broker.register("worker-b", 2)
+    monkeypatch.setattr(video_processor, "get_scheduler", lambda max_workers: pytest.fail("local scheduler used"))
+    processor = VideoProcessor(segment_duration="auto", split_mode="keyframe", work_dir=str(tmp_path), broker=broker)
+
+    class Planned(Exception):
+        pass
+
+    def plan_boundaries(total_duration, segment_duration, keyframes):
+        raise Planned
+
+    monkeypatch.setattr(processor, "_plan_boundaries", plan_boundaries)
+
+    with pytest.raises(Planned):
+        processor.split_video(video)
+    assert planned_workers == [6]
+
+
+def test_interrupted_segment_closes_its_reader(video, tmp_path, monkeypatch):
+    readers = []
+
+    class RecordingClip(video_processor.VideoFileClip):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            readers.append(self.reader)
+
+    def write_clip_batched(clip, output_file, transform, size=None, encoder=None):
+        raise TimeoutError("Timed out after 1s")
+
+    monkeypatch.setattr(video_processor, "VideoFileClip", RecordingClip)
+    monkeypatch.setattr(video_processor, "write_clip_batched", write_clip_batched)
+
+    with pytest.raises(TimeoutError):
+        VideoProcessor.apply_effects((video, str(tmp_path / "out.mp4"), {'effects': ["blur"]}))
+    assert readers and readers[0].proc is None
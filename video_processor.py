@@ -5,104 +5,581 @@ Handles video splitting, processing, and merging operations
 
 import os
 import time
+import queue
 import shutil
+import threading
+import itertools
 import multiprocessing
 from moviepy import VideoFileClip, concatenate_videoclips
 from moviepy.video.fx.BlackAndWhite import BlackAndWhite
 
+from frame_engine import write_clip_batched
+from effects import (
+    DEFAULT_EFFECTS, DECODER_SCALE_ALGORITHM, EffectChain, normalize_effects, plan_chain
+)
+from scheduler import get_scheduler
+from frame_pipeline import run_frame_pipeline
+from segment_planner import auto_segment_duration
+from baseline import default_sample_size, choose_sample, extrapolate
+from workspace import create_workspace, atomic_output
+from result_cache import ResultCache
+from manifest import RenderManifest, MANIFEST_NAME
+from encoder_profiles import (
+    DEFAULT_PROFILE, INTERMEDIATE_PROFILE, ENCODE_COST, get_profile, encoder_args,
+    encoder_cli_args, threads_per_encoder
+)
+from ffmpeg_utils import (
+    probe_keyframes, snap_to_keyframe, is_keyframe, keyframe_before, stream_copy_segment,
+    encode_segment, probe_stream_params, concat_stream_copy
+)
+
+
+# Seconds one attempt at a segment may run before it is stopped and retried, at
+# least; longer, larger or costlier segments get more (see _segment_timeout)
+DEFAULT_SEGMENT_TIMEOUT = 600
+
+# Timeout allowance per million source pixels in a segment, for one effect and
+# the standard encoder profile; about ten times what a single core needs, so
+# only a hung attempt runs into it
+TIMEOUT_SECONDS_PER_MEGAPIXEL = 0.5
+
+# Further attempts at a segment after a failure, timeout or worker crash
+SEGMENT_RETRIES = 2
+
 
 class VideoProcessor:
     """Main class for video processing operations"""
     
-    def __init__(self, segment_duration=10):
+    def __init__(self, segment_duration=10, split_mode="reencode", exact_boundaries=False,
+                 grayscale_engine="moviepy", cache=None, max_workers=None, priority=0,
+                 work_dir=None, effects=None, output_height=None, encoder_profile=DEFAULT_PROFILE,
+                 resume=False, segment_timeout=DEFAULT_SEGMENT_TIMEOUT, broker=None):
         """
         Initialize VideoProcessor
         
         Args:
-            segment_duration (int): Duration of each video segment in seconds
+            segment_duration (int or str): Duration of each video segment in seconds, or
+                "auto" to size segments from the video's cost and the CPU count
+            split_mode (str): "reencode" to encode every segment, "keyframe" to snap
+                boundaries to keyframes and stream-copy segments without re-encoding, or
+                "direct" to skip writing segments and let workers seek into the source
+            exact_boundaries (bool): In keyframe mode, keep the requested boundaries and
+                re-encode only the segments whose boundaries do not fall on a keyframe
+            grayscale_engine (str): "moviepy" for the BlackAndWhite effect, or "numpy" for
+                the batched fixed-point kernel in frame_engine; only affects the plain
+                grayscale chain, every other chain runs on the NumPy effect engine
+            cache (ResultCache): Optional cache reused for processed segments and final outputs
+            max_workers (int): Optional cap on parallel workers (defaults to the CPU count)
+            priority (int): Scheduling priority of this processor's segments relative to
+                other jobs sharing the scheduler (higher runs first)
+            work_dir (str): Directory for this processor's intermediates, removed by
+                cleanup(); defaults to a new unique directory under the scratch root
+                (see workspace.default_scratch_root), so concurrent jobs never share one
+            effects (list): Effect chain applied to every frame (see effects.EFFECTS),
+                as names or {'name': ..., **params} dicts; defaults to grayscale only
+            output_height (int): Optional deliverable height; the output is resized to it
+                (aspect kept), and a downscale runs first, in the decoder where possible
+            encoder_profile (str): Encoder profile for processed segments and the final
+                output (see encoder_profiles.PROFILES); split segments that need
+                re-encoding always use the fast intermediate profile
+            resume (bool): Reuse the split and processed segments recorded in work_dir's
+                manifest by an earlier run with the same input, settings and boundaries;
+                only segments that are missing or fail their checksum are redone
+            segment_timeout (float): Minimum seconds one attempt at splitting or processing
+                a segment may run before it is stopped and retried (None for no limit);
+                segments with more pixels, effects or a slower encoder profile get
+                proportionally longer
+            broker (SegmentBroker): Optional broker handing the processing tasks to
+                render workers on other hosts instead of the local pool; splitting
+                and stitching stay on this machine
+                
+        Raises:
+            RuntimeError: If a broker is combined with the "direct" split mode, which
+                would ship the whole source to a worker for every segment
         """
         self.segment_duration = segment_duration
-        self.segments_dir = "video_segments"
-        self.sequential_dir = "processed_sequential"
-        self.parallel_dir = "processed_parallel"
+        self.split_mode = split_mode
+        if broker and split_mode == "direct":
+            raise RuntimeError(
+                "Distributed rendering needs written segments; use the keyframe or reencode split mode"
+            )
+        self.exact_boundaries = exact_boundaries
+        self.grayscale_engine = grayscale_engine
+        get_profile(encoder_profile)
+        self.encoder_profile = encoder_profile
+        self.effects = normalize_effects(effects or DEFAULT_EFFECTS)
+        if output_height:
+            self.effects.append({'name': 'resize', 'height': output_height})
+        # Build once to reject unknown effects or bad parameters before any work starts
+        self.effect_chain = EffectChain(self.effects)
+        self.work_dir = work_dir or create_workspace()
+        self.segments_dir = os.path.join(self.work_dir, "video_segments")
+        self.sequential_dir = os.path.join(self.work_dir, "processed_sequential")
+        self.parallel_dir = os.path.join(self.work_dir, "processed_parallel")
+        self.segment_stats = []
+        self.frame_pipeline_stats = {}
+        self.cache = cache
+        self.max_workers = max_workers
+        self.priority = priority
+        self.cache_hits = {'process': 0, 'stitch': 0}
+        self.source_path = None
+        self.source_hash = None
+        self.boundaries = []
+        self.source_size = None
+        self.source_fps = None
+        self._cache_keys = {}
+        # Every finished segment is checkpointed here, so a later run can resume
+        self.manifest = RenderManifest(os.path.join(self.work_dir, MANIFEST_NAME))
+        self.resume = resume
+        # Set by split_video when the manifest matches; resumed counts reused segments
+        self.resuming = False
+        self.resumed = {'split': 0, 'processed': 0}
+        # Supervision of every segment task: hung or crashed attempts are retried
+        # with backoff, and stragglers may be duplicated on idle workers
+        self.segment_timeout = segment_timeout
+        self.task_options = {
+            'timeout': self._segment_timeout if segment_timeout else None,
+            'retries': SEGMENT_RETRIES,
+            'speculative': True,
+            'label': self._segment_label
+        }
+        self.broker = broker
+    
+    @staticmethod
+    def _segment_label(task):
+        """
+        Name a split or processing task in error messages
+        
+        Args:
+            task (tuple): Task argument, starting with the segment index
+            
+        Returns:
+            str: "Segment <index>"
+        """
+        return f"Segment {task[0]}"
+    
+    def _segment_timeout(self, task):
+        """
+        Size the timeout of a split or processing task from the work it does
+        
+        The allowance grows with the segment's duration, frame size and rate,
+        the encoder profile's cost and the length of the effect chain;
+        segment_timeout is only the floor.
+        
+        Args:
+            task (tuple): Task argument, starting with the segment index
+            
+        Returns:
+            float: Seconds one attempt may run
+        """
+        index = task[0]
+        if not self.source_size or not self.source_fps or index >= len(self.boundaries):
+            return self.segment_timeout
+        start, end = self.boundaries[index]
+        width, height = self.source_size
+        megapixels = (end - start) * self.source_fps * width * height / 1e6
+        cost = ENCODE_COST[self.encoder_profile] * max(1, len(self.effects))
+        return max(self.segment_timeout, TIMEOUT_SECONDS_PER_MEGAPIXEL * megapixels * cost)
     
-    def split_video(self, input_path, progress_callback=None):
+    def _task_executor(self):
+        """
+        Get where processing tasks run
+        
+        Returns:
+            RenderScheduler or SegmentBroker: The broker if one was given, else the
+                shared local scheduler
+                
+        Raises:
+            RuntimeError: If a broker was given but no render worker is connected to it
+        """
+        if self.broker:
+            if not self.broker.workers:
+                address = self.broker.status()['address']
+                raise RuntimeError(
+                    f"No render workers are connected to the broker at {address}; "
+                    f"start one with python render_worker.py {address}"
+                )
+            return self.broker
+        return get_scheduler(self.max_workers)
+    
+    def split_video(self, input_path, progress_callback=None, segment_callback=None):
         """
         Split video into segments
         
+        Segments are cut in parallel on the shared scheduler: each worker runs
+        its own ffmpeg on the source and extracts one time range. The keyframe
+        index is probed once here and handed to every worker, so each one seeks
+        straight to the keyframe before its range instead of decoding from the
+        start. In "direct" mode nothing is written: each segment is returned as
+        a (source path, start, end) time range that the processing workers read
+        straight from the original file.
+        
         Args:
             input_path (str): Path to input video file
             progress_callback (callable): Optional callback function for progress updates
-            
+            segment_callback (callable): Optional callback(index, segment) called as soon as
+                each segment is ready, in completion order; self.boundaries already
+                holds every segment's time range by then
+                
         Returns:
-            tuple: (list of segment paths, total video duration)
+            tuple: (list of segment paths or time ranges, total video duration)
         """
+        if self.cache:
+            self._hash_source(input_path)
+        
         video = VideoFileClip(input_path)
         total_duration = video.duration
+        fps = video.fps
+        self.source_size = tuple(video.size)
+        self.source_fps = fps
+        video.close()
+        
+        # Seek index shared by every split worker; only keyframe mode cuts on it
+        seek_index = probe_keyframes(input_path) if self.split_mode != "direct" else []
+        keyframes = seek_index if self.split_mode == "keyframe" else []
         
-        # Adjust segment duration for short videos
         segment_duration = self.segment_duration
-        if total_duration < segment_duration * 2:
+        if segment_duration == "auto":
+            # Balance the segments over the workers that will render them, not the local CPUs
+            workers = self.broker.workers if self.broker else get_scheduler(self.max_workers).workers
+            segment_duration = auto_segment_duration(
+                total_duration, self.source_size, fps, keyframes, workers=workers
+            )
+        elif total_duration < segment_duration * 2:
+            # Adjust segment duration for short videos
             segment_duration = max(1, int(total_duration / 4))
         
-        # Clean up and create segments directory
-        if os.path.exists(self.segments_dir):
-            shutil.rmtree(self.segments_dir)
-        os.makedirs(self.segments_dir)
+        boundaries = self._plan_boundaries(total_duration, segment_duration, keyframes)
+        self.boundaries = boundaries
+        self._start_manifest(input_path, boundaries)
+        
+        if self.split_mode == "direct":
+            segments = [(input_path, start, end) for start, end in boundaries]
+            if segment_callback:
+                for segment_num, segment in enumerate(segments):
+                    segment_callback(segment_num, segment)
+            if progress_callback:
+                progress_callback(1.0)
+            return segments, total_duration
+        
+        scheduler = get_scheduler(self.max_workers)
+        threads = threads_per_encoder(scheduler.workers)
+        segment_paths = [
+            f"{self.segments_dir}/segment_{segment_num:03d}.mp4" for segment_num in range(len(boundaries))
+        ]
+        tasks = []
+        reused = []
+        
+        for segment_num, (start, end) in enumerate(boundaries):
+            if self.resuming and self.manifest.verified_output(segment_num, 'split'):
+                reused.append({'index': segment_num, 'resumed': True})
+                continue
+            # Workers never replace an existing segment, so drop a stale one first
+            if os.path.exists(segment_paths[segment_num]):
+                os.remove(segment_paths[segment_num])
+            
+            # Stream copy is only exact when the segment starts on a keyframe;
+            # the last segment always ends at the end of the file
+            copyable = is_keyframe(start, keyframes) and (
+                end >= total_duration or is_keyframe(end, keyframes)
+            )
+            tasks.append((segment_num, input_path, start, end, {
+                "output": segment_paths[segment_num],
+                "copy": copyable,
+                "seek_point": keyframe_before(start, seek_index),
+                "threads": threads
+            }))
+        self.resumed['split'] = len(reused)
+        
+        # Split video into segments, one worker per time range, after the ones
+        # an earlier run already finished
+        handle = scheduler.submit(self._split_segment, tasks, self.priority, **self.task_options)
+        try:
+            for done, result in enumerate(itertools.chain(reused, handle.as_completed()), 1):
+                segment_num = result['index']
+                if not result.get('resumed'):
+                    self.manifest.record(
+                        segment_num, 'split', segment_paths[segment_num], result['checksum']
+                    )
+                if segment_callback:
+                    segment_callback(segment_num, segment_paths[segment_num])
+                if progress_callback:
+                    progress_callback(done / len(boundaries))
+        except BaseException:
+            handle.cancel()
+            raise
+        
+        return segment_paths, total_duration
+    
+    @staticmethod
+    def _split_segment(task):
+        """
+        Write one segment in a worker, reading the source independently
         
-        segment_paths = []
-        current_time = 0
-        segment_num = 0
-        total_segments = int(total_duration / segment_duration) + 1
+        The segment is published atomically and never replaces an existing
+        one, so a retried or duplicated attempt cannot clobber a finished segment.
+        
+        Args:
+            task (tuple): (segment index, input path, start, end, options) where options
+                hold "output" (segment path), "copy" (stream copy instead of
+                re-encoding), "seek_point" (keyframe at or before start) and
+                "threads" (encoder threads)
+                
+        Returns:
+            dict: Segment index and the SHA-256 of the written segment
+        """
+        segment_num, input_path, start, end, options = task
+        with atomic_output(options["output"], exclusive=True) as partial_path:
+            if options["copy"]:
+                stream_copy_segment(input_path, start, end, partial_path)
+            else:
+                # Decoded again right away, so favour encode speed over size
+                encode_segment(
+                    input_path, start, end, partial_path,
+                    encoder_cli_args(INTERMEDIATE_PROFILE, options["threads"]),
+                    options["seek_point"]
+                )
+        return {'index': segment_num, 'checksum': ResultCache.file_hash(options["output"])}
+    
+    def _start_manifest(self, input_path, boundaries):
+        """
+        Resume the manifest in work_dir if it matches this render, else start afresh
+        
+        Starting afresh empties the segment and parallel output directories, since
+        nothing in them can be trusted without a matching manifest.
+        
+        Args:
+            input_path (str): Path to input video file
+            boundaries (list): (start, end) of each segment
+        """
+        if self.source_hash and self.source_path == input_path:
+            source = self.source_hash
+        else:
+            stat = os.stat(input_path)
+            source = [os.path.abspath(input_path), stat.st_size, stat.st_mtime_ns]
+        fingerprint = ResultCache.make_key(
+            source=source,
+            segment_duration=self.segment_duration,
+            exact_boundaries=self.exact_boundaries,
+            **self._render_settings()
+        )
+        
+        self.resuming = self.resume and self.manifest.matches(fingerprint, boundaries)
+        self.resumed = {'split': 0, 'processed': 0}
+        if not self.resuming:
+            for directory in (self.segments_dir, self.parallel_dir):
+                if os.path.exists(directory):
+                    shutil.rmtree(directory)
+            self.manifest.reset(fingerprint, boundaries)
+        if self.split_mode != "direct":
+            os.makedirs(self.segments_dir, exist_ok=True)
+        os.makedirs(self.parallel_dir, exist_ok=True)
+    
+    def _plan_boundaries(self, total_duration, segment_duration, keyframes):
+        """
+        Compute (start, end) times for each segment
         
-        # Split video into segments
+        Args:
+            total_duration (float): Video duration in seconds
+            segment_duration (float): Target segment length in seconds
+            keyframes (list): Keyframe times; when non-empty and exact boundaries are not
+                required, each cut is moved to the nearest keyframe
+            
+        Returns:
+            list: (start, end) tuples covering the whole video
+        """
+        cuts = []
+        current_time = segment_duration
         while current_time < total_duration:
-            start = current_time
-            end = min(current_time + segment_duration, total_duration)
+            cut = current_time
+            if keyframes and not self.exact_boundaries:
+                cut = snap_to_keyframe(cut, keyframes)
+            # Drop cuts that collapse onto a previous one after snapping
+            if 0 < cut < total_duration and (not cuts or cut > cuts[-1]):
+                cuts.append(cut)
+            current_time += segment_duration
+        
+        points = [0] + cuts + [total_duration]
+        return list(zip(points[:-1], points[1:]))
+    
+    def _hash_source(self, input_path):
+        """
+        Hash the input video once per source path
+        
+        Args:
+            input_path (str): Path to input video file
             
-            chunk = video.subclipped(start, end)
-            output_file = f"{self.segments_dir}/segment_{segment_num:03d}.mp4"
-            chunk.write_videofile(output_file, codec='libx264', logger=None)
+        Returns:
+            str: SHA-256 of the input's contents
+        """
+        if self.source_path != input_path or self.source_hash is None:
+            self.source_path = input_path
+            self.source_hash = self.cache.file_hash(input_path)
+        return self.source_hash
+    
+    def _render_settings(self):
+        """
+        Describe the settings that affect rendered pixels, for cache keys
+        
+        Returns:
+            dict: Split mode, effect and encoder settings
+        """
+        return {
+            'split_mode': self.split_mode,
+            'effects': {'chain': self.effect_chain.describe(), 'engine': self.grayscale_engine},
+            'encoder': {'profile': self.encoder_profile, **get_profile(self.encoder_profile)}
+        }
+    
+    def _segment_cache_key(self, idx, segment):
+        """
+        Build the cache key of a processed segment
+        
+        Args:
+            idx (int): Segment index
+            segment (str or tuple): Segment file path or (source, start, end) time range
             
-            segment_paths.append(output_file)
+        Returns:
+            str: Cache key
+        """
+        if isinstance(segment, tuple):
+            source, start, end = segment
+            return self.cache.make_key(
+                input=self._hash_source(source), range=[start, end], **self._render_settings()
+            )
+        if self.source_hash and idx < len(self.boundaries):
+            return self.cache.make_key(
+                input=self.source_hash, range=list(self.boundaries[idx]), **self._render_settings()
+            )
+        return self.cache.make_key(input=self.cache.file_hash(segment), **self._render_settings())
+    
+    def _output_cache_key(self, input_path):
+        """
+        Build the cache key of the final output for an input video
+        
+        Args:
+            input_path (str): Path to input video file
             
-            if progress_callback:
-                progress_callback((segment_num + 1) / total_segments)
+        Returns:
+            str: Cache key
+        """
+        return self.cache.make_key(
+            input=self._hash_source(input_path),
+            segment_duration=self.segment_duration,
+            exact_boundaries=self.exact_boundaries,
+            stage='final',
+            **self._render_settings()
+        )
+    
+    def fetch_cached_output(self, input_path, output_path):
+        """
+        Reuse a previously rendered final output for the same input and settings
+        
+        Args:
+            input_path (str): Path to input video file
+            output_path (str): Path for final output video
             
-            segment_num += 1
-            current_time = end
+        Returns:
+            bool: True if output_path was filled from the cache
+        """
+        if not self.cache:
+            return False
+        hit = self.cache.get(self._output_cache_key(input_path), output_path)
+        self.cache_hits['stitch'] = int(hit)
+        return hit
+    
+    def store_output(self, input_path, output_path):
+        """
+        Add a final output to the cache
         
-        video.close()
-        return segment_paths, total_duration
+        Args:
+            input_path (str): Path to the input video it was rendered from
+            output_path (str): Path to final output video
+        """
+        if self.cache:
+            self.cache.put(self._output_cache_key(input_path), output_path)
     
     @staticmethod
-    def apply_grayscale(args):
+    def apply_effects(args):
         """
-        Apply grayscale effect to a video segment
+        Apply the effect chain to a video segment in a single decode/encode pass
         
         Args:
-            args (tuple): (input_file_path, output_file_path)
+            args (tuple): (input_file_path, output_file_path) or
+                (input_file_path, output_file_path, options) where options may hold
+                "start"/"end" times to process only that range of the input,
+                "effects" (effect specs, default grayscale only), "decode_size" to
+                have ffmpeg scale frames to (width, height) while decoding, "engine"
+                ("moviepy" or "numpy") to pick the plain grayscale implementation,
+                "profile" (encoder profile name) and "threads" (encoder threads)
             
         Returns:
             str: Path to processed output file
         """
-        input_file, output_file = args
+        input_file, output_file = args[:2]
+        options = args[2] if len(args) > 2 else {}
+        effects = normalize_effects(options.get("effects") or DEFAULT_EFFECTS)
+        encoder = encoder_args(options.get("profile", DEFAULT_PROFILE), options.get("threads"))
         
-        clip = VideoFileClip(input_file)
-        bw_clip = clip.with_effects([BlackAndWhite()])
-        bw_clip.write_videofile(output_file, codec='libx264', logger=None)
-        
-        clip.close()
-        bw_clip.close()
+        source = VideoFileClip(
+            input_file,
+            target_resolution=options.get("decode_size"),
+            resize_algorithm=DECODER_SCALE_ALGORITHM
+        )
+        # The reader's ffmpeg process must not outlive the attempt, even when a
+        # timeout or a cancellation (see scheduler._run_attempt) interrupts it
+        try:
+            clip = source
+            if options.get("start") is not None:
+                clip = source.subclipped(options["start"], options.get("end"))
+            
+            if options.get("engine") == "moviepy" and effects == DEFAULT_EFFECTS:
+                bw_clip = clip.with_effects([BlackAndWhite()])
+                try:
+                    bw_clip.write_videofile(output_file, logger=None, **encoder)
+                finally:
+                    bw_clip.close()
+                return output_file
+            
+            chain = EffectChain(effects)
+            write_clip_batched(clip, output_file, chain.apply, size=chain.output_size(clip.size),
+                               encoder=encoder)
+        finally:
+            source.close()
         
         return output_file
     
+    def _make_job(self, segment, output_file, threads=None):
+        """
+        Build the worker arguments for one segment
+        
+        Args:
+            segment (str or tuple): Segment file path, or (source path, start, end)
+                time range produced by the "direct" split mode
+            output_file (str): Path for the processed segment
+            threads (int): Encoder threads (defaults to every core, for a lone encoder)
+            
+        Returns:
+            tuple: Arguments for apply_effects
+        """
+        options = {
+            "engine": self.grayscale_engine,
+            "effects": self.effects,
+            "profile": self.encoder_profile,
+            "threads": threads
+        }
+        if self.source_size:
+            # Downscale first: on decode if possible, else before pointwise effects
+            options["decode_size"], options["effects"] = plan_chain(self.effects, self.source_size)
+        if isinstance(segment, tuple):
+            segment, options["start"], options["end"] = segment
+        return (segment, output_file, options)
+    
     def process_sequential(self, segment_paths, progress_callback=None):
         """
         Process video segments sequentially
         
         Args:
-            segment_paths (list): List of segment file paths
+            segment_paths (list): List of segment file paths or time ranges
             progress_callback (callable): Optional callback for progress updates
             
         Returns:
@@ -119,7 +596,7 @@ class VideoProcessor:
         # Process each segment one by one
         for idx, seg_path in enumerate(segment_paths):
             out_path = f"{self.sequential_dir}/processed_{idx:03d}.mp4"
-            self.apply_grayscale((seg_path, out_path))
+            self.apply_effects(self._make_job(seg_path, out_path))
             results.append(out_path)
             
             if progress_callback:
@@ -128,66 +605,466 @@ class VideoProcessor:
         total_time = time.time() - start
         return results, total_time
     
-    def process_parallel(self, segment_paths, progress_callback=None):
+    def estimate_sequential(self, segment_paths, sample_size=None, progress_callback=None):
         """
-        Process video segments in parallel using multiprocessing
+        Estimate the sequential processing time by timing a stratified sample of segments
         
         Args:
-            segment_paths (list): List of segment file paths
+            segment_paths (list): List of segment file paths or time ranges
+            sample_size (int): Segments to time (defaults to about the square root of
+                the segment count)
             progress_callback (callable): Optional callback for progress updates
             
         Returns:
-            tuple: (list of processed paths, processing time, number of workers used)
+            dict: Estimate from baseline.extrapolate (time, low, high, confidence,
+                sampled, segments, estimated)
         """
-        # Setup output directory
-        if os.path.exists(self.parallel_dir):
-            shutil.rmtree(self.parallel_dir)
-        os.makedirs(self.parallel_dir)
+        if os.path.exists(self.sequential_dir):
+            shutil.rmtree(self.sequential_dir)
+        os.makedirs(self.sequential_dir)
+        
+        num_segments = len(segment_paths)
+        sample = choose_sample(num_segments, sample_size or default_sample_size(num_segments))
+        times = []
+        durations = []
+        
+        for done, idx in enumerate(sample):
+            start, end = self.boundaries[idx]
+            out_path = f"{self.sequential_dir}/processed_{idx:03d}.mp4"
+            job_start = time.time()
+            self.apply_effects(self._make_job(segment_paths[idx], out_path))
+            times.append(time.time() - job_start)
+            durations.append(end - start)
+            
+            if progress_callback:
+                progress_callback((done + 1) / len(sample))
+        
+        return extrapolate(times, durations, self.boundaries[-1][1], num_segments)
+    
+    @staticmethod
+    def _run_timed_job(indexed_job):
+        """
+        Run one job in a worker and record when, where and how long it ran
+        
+        The output is published atomically and never replaces an existing one:
+        when a segment is retried or run twice, the first finished attempt wins.
+        
+        Args:
+            indexed_job (tuple): (segment index, apply_effects arguments)
+            
+        Returns:
+            dict: Segment stats (index, output, started_at, duration, pid, cached) and
+                the output's checksum
+        """
+        idx, job = indexed_job
+        output = job[1]
+        started_at = time.time()
+        with atomic_output(output, exclusive=True) as partial_path:
+            VideoProcessor.apply_effects((job[0], partial_path, *job[2:]))
+        duration = time.time() - started_at
+        return {
+            'index': idx,
+            'output': output,
+            'started_at': started_at,
+            'duration': duration,
+            'pid': os.getpid(),
+            'cached': False,
+            'checksum': ResultCache.file_hash(output)
+        }
+    
+    def prepare_parallel_jobs(self, segment_paths):
+        """
+        Set up the parallel output directory and build the worker jobs
+        
+        Segments already in the cache are copied into place here and returned as
+        finished stats instead of jobs. Used by process_parallel and by callers
+        that schedule jobs from several videos onto one pool.
         
-        # Prepare jobs
+        Args:
+            segment_paths (list): List of segment file paths or time ranges
+            
+        Returns:
+            tuple: (list of (index, job) pairs for _run_timed_job, list of cached segment stats)
+        """
+        threads = self._reset_parallel_dir()
         jobs = []
+        cached = []
+        
         for idx, seg_path in enumerate(segment_paths):
-            out_path = f"{self.parallel_dir}/processed_{idx:03d}.mp4"
-            jobs.append((seg_path, out_path))
+            job, stats = self._prepare_parallel_job(idx, seg_path, threads)
+            if stats:
+                cached.append(stats)
+            else:
+                jobs.append(job)
         
-        # Determine number of workers
-        cores = multiprocessing.cpu_count()
-        workers = min(cores, len(jobs))
+        return jobs, cached
+    
+    def _reset_parallel_dir(self):
+        """
+        Create the parallel output directory and reset the per-run cache state
+        
+        Outputs left in the directory are either resumed from the manifest or
+        removed before their segment is rendered again; split_video empties it
+        when not resuming.
+        
+        Returns:
+            int: Encoder threads per worker; every pool worker may be encoding at
+                once, so the cores are shared between them
+        """
+        os.makedirs(self.parallel_dir, exist_ok=True)
+        
+        self.cache_hits['process'] = 0
+        self.resumed['processed'] = 0
+        self._cache_keys = {}
+        return threads_per_encoder(get_scheduler(self.max_workers).workers)
+    
+    def _prepare_parallel_job(self, idx, segment, threads):
+        """
+        Build the worker job of one segment, or serve it from the cache
+        
+        Args:
+            idx (int): Segment index
+            segment (str or tuple): Segment file path or time range
+            threads (int): Encoder threads per worker
+            
+        Returns:
+            tuple: ((index, job) pair for _run_timed_job, None), or (None, cached
+                segment stats) if the processed segment was resumed from the manifest
+                or copied from the cache
+        """
+        out_path = f"{self.parallel_dir}/processed_{idx:03d}.mp4"
+        if self.resuming and self.manifest.verified_output(idx, 'processed'):
+            self.resumed['processed'] += 1
+            return None, {
+                'index': idx, 'output': out_path, 'started_at': time.time(),
+                'duration': 0.0, 'pid': os.getpid(), 'cached': True, 'resumed': True
+            }
+        if self.cache:
+            self._cache_keys[idx] = self._segment_cache_key(idx, segment)
+            if self.cache.get(self._cache_keys[idx], out_path):
+                self.cache_hits['process'] += 1
+                return None, {
+                    'index': idx, 'output': out_path, 'started_at': time.time(),
+                    'duration': 0.0, 'pid': os.getpid(), 'cached': True
+                }
+        # Workers never replace an existing output, so drop a stale one first
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        return (idx, self._make_job(segment, out_path, threads)), None
+    
+    def finish_parallel_job(self, stats):
+        """
+        Record a segment rendered by a worker (stores it in the cache if configured)
+        
+        The segment is checkpointed in the manifest unless it was resumed from it.
+        
+        Args:
+            stats (dict): Segment stats returned by _run_timed_job
+        """
+        if self.cache and not stats.get('cached'):
+            self.cache.put(self._cache_keys[stats['index']], stats['output'])
+        if not stats.get('resumed') and stats['index'] < len(self.boundaries):
+            checksum = stats.get('checksum') or ResultCache.file_hash(stats['output'])
+            self.manifest.record(stats['index'], 'processed', stats['output'], checksum)
+    
+    def process_parallel(self, segment_paths, progress_callback=None, segment_callback=None):
+        """
+        Process video segments in parallel using multiprocessing
+        
+        Segments are submitted to the process-wide scheduler, which shares one
+        pre-warmed pool fairly between every job and session. Segments are
+        streamed back as they finish (in any order), so progress is reported per
+        segment instead of once at the end. With a cache configured, segments
+        rendered before with the same input and settings are copied instead.
+        With a broker, segments are rendered by remote workers instead, and the
+        call returns once every segment has reported back.
         
-        # Process in parallel
+        Args:
+            segment_paths (list): List of segment file paths or time ranges
+            progress_callback (callable): Optional callback for progress updates
+            segment_callback (callable): Optional callback receiving the stats dict of each
+                finished segment (index, output, started_at, duration, pid, cached)
+            
+        Returns:
+            tuple: (list of processed paths, processing time, number of workers used)
+        """
         start = time.time()
+        jobs, cached = self.prepare_parallel_jobs(segment_paths)
+        results = [None] * len(segment_paths)
+        self.segment_stats = [None] * len(segment_paths)
+        
+        # Determine number of workers
+        executor = self._task_executor()
+        workers = max(1, min(executor.workers, len(jobs)))
         
-        with multiprocessing.Pool(processes=workers) as pool:
-            results = pool.map(self.apply_grayscale, jobs)
+        # Process in parallel, serving cached segments first
+        handle = executor.submit(
+            self._run_timed_job, jobs, self.priority, **self.task_options
+        )
+        completions = itertools.chain(cached, handle.as_completed())
+        for done, stats in enumerate(completions, 1):
+            stats['started_at'] -= start
+            self.finish_parallel_job(stats)
+            results[stats['index']] = stats['output']
+            self.segment_stats[stats['index']] = stats
+            
+            if segment_callback:
+                segment_callback(stats)
+            if progress_callback:
+                progress_callback(done / len(segment_paths))
         
         total_time = time.time() - start
         
-        if progress_callback:
-            progress_callback(1.0)
-        
         return results, total_time, workers
     
+    def process_streaming(self, input_path, output_path, progress_callbacks=None,
+                          segment_callback=None, queue_callback=None):
+        """
+        Split, process and stitch a video with the three stages overlapping
+        
+        Each segment is handed to the scheduler as soon as it is split, while
+        the next one is being split. The stitcher takes processed segments in
+        order as they arrive and checks that each can be joined losslessly, so
+        only the final container-level join waits for the last segment. The
+        run takes about as long as its slowest stage rather than the sum of
+        all three.
+        
+        Args:
+            input_path (str): Path to input video file
+            output_path (str): Path for final output video
+            progress_callbacks (dict): Optional progress callbacks for the "split",
+                "parallel" and "stitch" stages
+            segment_callback (callable): Optional callback receiving the stats dict of each
+                finished segment (index, output, started_at, duration, pid, cached)
+            queue_callback (callable): Optional callback receiving the queue depth of each
+                stage whenever it changes: segments still to split ("split"), split but
+                not yet processed ("parallel") and processed but waiting for an earlier
+                segment before they can be stitched ("stitch")
+                
+        Returns:
+            dict: segments (segment paths or time ranges), duration, processed (paths),
+                time (end to end), stage_times (busy time of each stage), par_time,
+                workers, stitch_method and queue_peaks (deepest queue of each stage)
+        """
+        callbacks = progress_callbacks or {}
+        start = time.time()
+        executor = self._task_executor()
+        threads = self._reset_parallel_dir()
+        self.segment_stats = []
+        
+        # Worker results, split progress and the end of splitting all arrive on one queue
+        events = queue.Queue()
+        handle = executor.submit(
+            self._run_timed_job, [], self.priority,
+            on_result=lambda stats, error: events.put(('processed', stats, error)),
+            **self.task_options
+        )
+        abort = threading.Event()
+        split_result = {}
+        
+        def submit_segment(idx, segment):
+            if abort.is_set():
+                raise RuntimeError("Render aborted")
+            job, stats = self._prepare_parallel_job(idx, segment, threads)
+            events.put(('split', idx, None))
+            if stats:
+                events.put(('processed', stats, None))
+            else:
+                handle.extend([job])
+        
+        def split():
+            try:
+                split_result['segments'], split_result['duration'] = self.split_video(
+                    input_path, callbacks.get('split'), submit_segment
+                )
+                split_result['time'] = time.time() - start
+                events.put(('split_done', None, None))
+            except Exception as e:
+                events.put(('split_done', None, e))
+        
+        splitter = threading.Thread(target=split, name="splitter", daemon=True)
+        splitter.start()
+        
+        split_count = 0
+        processed = 0
+        waiting = {}
+        ordered = []
+        stitch_params = None
+        lossless = True
+        stitch_time = 0.0
+        depths = {'split': 0, 'parallel': 0, 'stitch': 0}
+        peaks = dict(depths)
+        
+        try:
+            while 'segments' not in split_result or len(ordered) < len(self.boundaries):
+                kind, payload, error = events.get()
+                if error is not None:
+                    raise error
+                
+                if kind == 'split':
+                    split_count += 1
+                elif kind == 'processed':
+                    payload['started_at'] -= start
+                    self.finish_parallel_job(payload)
+                    self.segment_stats.append(payload)
+                    waiting[payload['index']] = payload['output']
+                    processed += 1
+                    if segment_callback:
+                        segment_callback(payload)
+                    if callbacks.get('parallel'):
+                        callbacks['parallel'](processed / len(self.boundaries))
+                    
+                    # Stitch every segment that is now next in order
+                    while len(ordered) in waiting:
+                        stitch_start = time.time()
+                        path = waiting.pop(len(ordered))
+                        if lossless:
+                            params = probe_stream_params(path)
+                            stitch_params = stitch_params or params
+                            lossless = bool(params) and params == stitch_params
+                        ordered.append(path)
+                        stitch_time += time.time() - stitch_start
+                        if callbacks.get('stitch'):
+                            # The final join is the last step of stitching
+                            callbacks['stitch'](0.9 * len(ordered) / len(self.boundaries))
+                
+                depths = {
+                    'split': len(self.boundaries) - split_count,
+                    'parallel': split_count - processed,
+                    'stitch': len(waiting)
+                }
+                peaks = {stage: max(peaks[stage], depth) for stage, depth in depths.items()}
+                if queue_callback:
+                    queue_callback(depths)
+        except BaseException:
+            abort.set()
+            handle.cancel()
+            raise
+        finally:
+            # Let a split in progress finish before the caller removes the workspace
+            splitter.join()
+        
+        stitch_start = time.time()
+        stitch_method = self.stitch_segments(
+            ordered, output_path, lossless=lossless, params_checked=True
+        )
+        stitch_time += time.time() - stitch_start
+        if callbacks.get('stitch'):
+            callbacks['stitch'](1.0)
+        
+        self.segment_stats.sort(key=lambda stats: stats['index'])
+        cores = executor.workers
+        par_time = self._busy_time(self.segment_stats)
+        return {
+            'segments': split_result['segments'],
+            'duration': split_result['duration'],
+            'processed': ordered,
+            'time': time.time() - start,
+            'stage_times': {
+                'split': split_result['time'],
+                'parallel': par_time,
+                'stitch': stitch_time
+            },
+            'par_time': par_time,
+            'workers': max(1, min(cores, len(ordered))),
+            'stitch_method': stitch_method,
+            'queue_peaks': peaks
+        }
+    
     @staticmethod
-    def stitch_segments(segment_paths, output_path):
+    def _busy_time(segment_stats):
+        """
+        Measure how long at least one worker was processing a segment
+        
+        Args:
+            segment_stats (list): Segment stats with started_at and duration
+            
+        Returns:
+            float: Total length of the union of the segments' run intervals, in seconds
+        """
+        busy = 0.0
+        covered_until = None
+        for stats in sorted(segment_stats, key=lambda stats: stats['started_at']):
+            begin, end = stats['started_at'], stats['started_at'] + stats['duration']
+            if covered_until is None or begin > covered_until:
+                busy += end - begin
+                covered_until = end
+            elif end > covered_until:
+                busy += end - covered_until
+                covered_until = end
+        return busy
+    
+    def process_frame_pipeline(self, input_path, output_path, progress_callback=None):
+        """
+        Process a whole video with the shared-memory frame pipeline
+        
+        Instead of one segment per worker, a decoder process fills a shared-memory
+        ring buffer, effect workers convert frames in place and this process encodes
+        them in order, so decoding, effects and encoding overlap. Always uses the
+        NumPy effect engine and needs a per-frame chain; frame counts and
+        throughput are kept in frame_pipeline_stats.
+        
+        Args:
+            input_path (str): Path to input video file
+            output_path (str): Path for the rendered video
+            progress_callback (callable): Optional callback for progress updates
+            
+        Returns:
+            tuple: (output path, processing time, number of effect workers used)
+        """
+        # The decoder and the encoder each keep a core busy
+        workers = self.max_workers or max(1, multiprocessing.cpu_count() - 2)
+        
+        with atomic_output(output_path) as partial_path:
+            self.frame_pipeline_stats = run_frame_pipeline(
+                input_path, partial_path, workers, progress_callback, self.effects,
+                self.encoder_profile
+            )
+        
+        return output_path, self.frame_pipeline_stats['time'], workers
+    
+    def stitch_segments(self, segment_paths, output_path, lossless=True, params_checked=False):
         """
         Concatenate processed video segments into final output
         
+        When every segment has identical codec parameters the segments are joined
+        at the container level with no re-encode; otherwise they are decoded and
+        re-encoded as a single clip. The output appears at output_path atomically,
+        only once it is complete.
+        
         Args:
             segment_paths (list): List of processed segment paths
             output_path (str): Path for final output video
+            lossless (bool): Try the concat demuxer before falling back to re-encoding
+            params_checked (bool): The caller already verified that every segment has
+                the same codec parameters, so they are not probed again
+            
+        Returns:
+            str: Stitch method used ("concat" or "reencode")
         """
-        clips = [VideoFileClip(p) for p in sorted(segment_paths)]
-        final = concatenate_videoclips(clips)
-        final.write_videofile(output_path, codec='libx264', logger=None)
+        ordered = sorted(segment_paths)
+        
+        with atomic_output(output_path) as partial_path:
+            if lossless and ordered:
+                params = [] if params_checked else [probe_stream_params(p) for p in ordered]
+                if params_checked or (params[0] and all(p == params[0] for p in params[1:])):
+                    try:
+                        concat_stream_copy(ordered, partial_path)
+                        return "concat"
+                    except RuntimeError:
+                        pass
+            
+            clips = [VideoFileClip(p) for p in ordered]
+            final = concatenate_videoclips(clips)
+            final.write_videofile(partial_path, logger=None, **encoder_args(self.encoder_profile))
+            
+            # Clean up
+            for clip in clips:
+                clip.close()
+            final.close()
         
-        # Clean up
-        for clip in clips:
-            clip.close()
-        final.close()
+        return "reencode"
     
     def cleanup(self):
-        """Remove temporary directories"""
-        dirs_to_remove = [self.segments_dir, self.sequential_dir, self.parallel_dir]
-        for directory in dirs_to_remove:
-            if os.path.exists(directory):
-                shutil.rmtree(directory)
+        """Remove this processor's working directory and all intermediates in it"""
+        shutil.rmtree(self.work_dir, ignore_errors=True)
@@ -0,0 +1,159 @@
+"""
+Worker Pool Module
+Long-lived multiprocessing pool shared by every VideoProcessor in the process
+"""
+
+import os
+import atexit
+import signal
+import threading
+import multiprocessing
+
+
+# Tasks a worker runs before it is replaced by a fresh process, releasing
+# memory, file handles and ffmpeg subprocesses leaked by moviepy
+MAX_TASKS_PER_CHILD = int(os.environ.get("RENDER_MAX_TASKS_PER_CHILD", "25"))
+
+# Warm pools keyed by process count
+_pools = {}
+_lock = threading.Lock()
+
+# Signal asking a worker to abandon the task it runs (see scheduler._run_attempt);
+# workers ignore it between tasks, so it can never kill one
+CANCEL_SIGNAL = getattr(signal, "SIGUSR1", None)
+
+# Per pool: queue on which workers announce the tasks they start
+_start_notices = {}
+
+# In a worker process: the queue of the pool it belongs to
+_worker_notices = None
+
+
+def _warm_up_worker(notices=None):
+    """
+    Import the heavy video dependencies once when a worker starts
+
+    Args:
+        notices (SimpleQueue): Queue for notify_started
+    """
+    global _worker_notices
+    _worker_notices = notices
+    if CANCEL_SIGNAL:
+        signal.signal(CANCEL_SIGNAL, signal.SIG_IGN)
+
+    import numpy  # noqa: F401
+    import moviepy  # noqa: F401
+    from moviepy.video.io import ffmpeg_reader, ffmpeg_writer  # noqa: F401
+    import frame_engine  # noqa: F401
+
+
+def notify_started(token):
+    """
+    Tell the parent which worker process picked up a task (called inside a worker)
+
+    Args:
+        token (object): Picklable id of the task attempt
+    """
+    if _worker_notices is not None:
+        _worker_notices.put((token, os.getpid()))
+
+
+def get_pool(processes=None):
+    """
+    Return the shared worker pool, creating and warming it on first use
+
+    The default pool has one process per CPU core and is reused across jobs,
+    Streamlit reruns and sessions, so workers import moviepy only once. Asking
+    for a specific size (e.g. when benchmarking worker counts) returns a
+    separate warm pool of that size, which is kept for reuse as well. Workers
+    are recycled after MAX_TASKS_PER_CHILD tasks, and a worker that dies is
+    replaced by the pool.
+
+    Args:
+        processes (int): Number of worker processes (defaults to the CPU count)
+
+    Returns:
+        multiprocessing.pool.Pool: Shared worker pool
+    """
+    processes = processes or multiprocessing.cpu_count()
+
+    with _lock:
+        if processes not in _pools:
+            notices = multiprocessing.SimpleQueue()
+            _pools[processes] = multiprocessing.Pool(
+                processes=processes, initializer=_warm_up_worker, initargs=(notices,),
+                maxtasksperchild=MAX_TASKS_PER_CHILD or None
+            )
+            _start_notices[processes] = notices
+        return _pools[processes]
+
+
+def get_start_notices(processes=None):
+    """
+    Get the queue on which a pool's workers announce (token, pid) as they start tasks
+
+    Args:
+        processes (int): Pool size (defaults to the CPU count)
+
+    Returns:
+        SimpleQueue: Start notices of the pool (created with the pool)
+    """
+    get_pool(processes)
+    return _start_notices[processes or multiprocessing.cpu_count()]
+
+
+def _pool_processes(pool):
+    """
+    Get a pool's current worker processes
+
+    multiprocessing.pool.Pool has no public API for its workers, so this is the
+    one place that reads its private _pool list of Process objects (kept up to
+    date as workers exit and are replaced).
+
+    Args:
+        pool (multiprocessing.pool.Pool): Worker pool
+
+    Returns:
+        list: multiprocessing.Process of each worker
+    """
+    return list(pool._pool)
+
+
+def worker_pids(processes=None):
+    """
+    List the live worker processes of a pool
+
+    Args:
+        processes (int): Pool size (defaults to the CPU count)
+
+    Returns:
+        set: PIDs of the pool's workers that are alive
+    """
+    pool = get_pool(processes)
+    return {worker.pid for worker in _pool_processes(pool) if worker.is_alive()}
+
+
+def get_pool_size():
+    """
+    Get the number of processes in the default shared pool
+
+    Returns:
+        int: Pool size, or 0 if the pool has not been started
+    """
+    cores = multiprocessing.cpu_count()
+    return cores if cores in _pools else 0
+
+
+def shutdown_pool():
+    """Stop every shared pool and wait for its workers to exit"""
+    with _lock:
+        for pool in _pools.values():
+            # Tasks whose worker was killed after hanging past its timeout never
+            # report back, so close() + join() could wait forever
+            pool.terminate()
+            pool.join()
+        _pools.clear()
+        _start_notices.clear()
+
+
+atexit.register(shutdown_pool)
@@ -0,0 +1,91 @@
+"""
+Workspace Module
+Per-job scratch directories, preferably on tmpfs, and atomic publication of outputs
+"""
+
+import os
+import uuid
+import shutil
+import tempfile
+import contextlib
+
+
+# Overrides where per-job scratch directories are created
+SCRATCH_ROOT_ENV = "RENDER_SCRATCH_DIR"
+
+# RAM-backed filesystem used for intermediates when it has room to spare
+TMPFS_ROOT = "/dev/shm"
+MIN_TMPFS_FREE_BYTES = 2 * 1024 * 1024 * 1024
+
+
+def default_scratch_root():
+    """
+    Choose the directory under which per-job scratch directories are created
+
+    Returns:
+        str: $RENDER_SCRATCH_DIR if set, else /dev/shm when it is writable and has
+            at least MIN_TMPFS_FREE_BYTES free, else the system temp directory
+    """
+    configured = os.environ.get(SCRATCH_ROOT_ENV)
+    if configured:
+        return configured
+
+    if os.path.isdir(TMPFS_ROOT) and os.access(TMPFS_ROOT, os.W_OK):
+        if shutil.disk_usage(TMPFS_ROOT).free >= MIN_TMPFS_FREE_BYTES:
+            return TMPFS_ROOT
+
+    return tempfile.gettempdir()
+
+
+def create_workspace(root=None, prefix="render_"):
+    """
+    Create a uniquely named scratch directory for one job
+
+    Args:
+        root (str): Parent directory (defaults to default_scratch_root())
+        prefix (str): Directory name prefix
+
+    Returns:
+        str: Path to the new, empty directory
+    """
+    root = root or default_scratch_root()
+    os.makedirs(root, exist_ok=True)
+    return tempfile.mkdtemp(prefix=prefix, dir=root)
+
+
+@contextlib.contextmanager
+def atomic_output(output_path, exclusive=False):
+    """
+    Write a file under a temporary name and rename it into place on success
+
+    The temporary file sits next to output_path so the rename stays on one
+    filesystem and readers never see a partially written output. It keeps
+    the extension so ffmpeg picks the same container. On error it is removed
+    and output_path is left untouched.
+
+    Args:
+        output_path (str): Final path of the file
+        exclusive (bool): Keep output_path if it already exists, so when several
+            attempts write the same output (retries, speculative duplicates) the
+            first to finish wins and later ones never replace a file in use
+
+    Yields:
+        str: Temporary path to write to
+    """
+    directory, name = os.path.split(os.path.abspath(output_path))
+    stem, ext = os.path.splitext(name)
+    os.makedirs(directory, exist_ok=True)
+    partial_path = os.path.join(directory, f".{stem}.partial-{uuid.uuid4().hex[:8]}{ext}")
+
+    try:
+        yield partial_path
+        if not exclusive:
+            os.replace(partial_path, output_path)
+        elif not os.path.exists(output_path):
+            try:
+                os.link(partial_path, output_path)
+            except FileExistsError:
+                pass
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)